@@ -0,0 +1,690 @@
+
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import struct
+import zlib
+
+import poie.datatype
+import poie.errors
+from poie.util import ts
+
+MAGIC = b"Obj\x01"
+SYNC_SIZE = 16
+
+_float = struct.Struct("<f")
+_double = struct.Struct("<d")
+
+########################### primitive readers and writers
+
+def readLong(buf, pos):
+    """Read a zig-zag encoded variable-length integer (Avro "int" or "long").
+
+    :type buf: bytes
+    :param buf: Avro binary data
+    :type pos: non-negative integer
+    :param pos: starting position in ``buf``
+    :rtype: (integer, non-negative integer)
+    :return: the value and the position after it
+    """
+
+    b = buf[pos]
+    pos += 1
+    n = b & 0x7F
+    shift = 7
+    while b & 0x80:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        shift += 7
+    return (n >> 1) ^ -(n & 1), pos
+
+def writeLong(out, n):
+    """Append a zig-zag encoded variable-length integer (Avro "int" or "long") to a bytearray."""
+    n = (n << 1) ^ (n >> 63)
+    while n & ~0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _readNull(buf, pos):
+    return None, pos
+
+def _readBoolean(buf, pos):
+    return buf[pos] != 0, pos + 1
+
+def _readFloat(buf, pos):
+    return _float.unpack_from(buf, pos)[0], pos + 4
+
+def _readDouble(buf, pos):
+    return _double.unpack_from(buf, pos)[0], pos + 8
+
+def _readBytes(buf, pos):
+    size, pos = readLong(buf, pos)
+    end = pos + size
+    return bytes(buf[pos:end]), end
+
+def _readString(buf, pos):
+    size, pos = readLong(buf, pos)
+    end = pos + size
+    return bytes(buf[pos:end]).decode("utf-8"), end
+
+def _writeNull(out, value):
+    pass
+
+def _writeBoolean(out, value):
+    out.append(1 if value else 0)
+
+def _writeFloat(out, value):
+    out += _float.pack(value)
+
+def _writeDouble(out, value):
+    out += _double.pack(value)
+
+def _writeBytes(out, value):
+    writeLong(out, len(value))
+    out += value
+
+def _writeString(out, value):
+    value = value.encode("utf-8")
+    writeLong(out, len(value))
+    out += value
+
+########################### schema compilation
+
+def compileDecoder(avroType, memo=None):
+    """Build a function that decodes Avro binary data of a given type directly into the data format of ``PFAEngine.action``.
+
+    The type is examined once, here, so decoding does no type dispatch. Unions are returned as ``None`` or tagged ``{name: value}`` (as ``poie.datatype.checkData`` would make them), strings as ``str``, and bytes and fixed as ``bytes``.
+
+    :type avroType: pypoie.datatype.AvroType
+    :param avroType: type of the encoded data (the writer's schema)
+    :type memo: dict or ``None``
+    :param memo: decoders for named types that are already being compiled (used for recursive records)
+    :rtype: callable
+    :return: function taking ``(buf, pos)`` and returning ``(value, newPos)``
+    """
+
+    if memo is None:
+        memo = {}
+
+    if isinstance(avroType, poie.datatype.AvroNull):
+        return _readNull
+    elif isinstance(avroType, poie.datatype.AvroBoolean):
+        return _readBoolean
+    elif isinstance(avroType, (poie.datatype.AvroInt, poie.datatype.AvroLong)):
+        return readLong
+    elif isinstance(avroType, poie.datatype.AvroFloat):
+        return _readFloat
+    elif isinstance(avroType, poie.datatype.AvroDouble):
+        return _readDouble
+    elif isinstance(avroType, poie.datatype.AvroBytes):
+        return _readBytes
+    elif isinstance(avroType, poie.datatype.AvroString):
+        return _readString
+
+    elif isinstance(avroType, poie.datatype.AvroFixed):
+        size = avroType.size
+        def readFixed(buf, pos):
+            end = pos + size
+            return bytes(buf[pos:end]), end
+        return readFixed
+
+    elif isinstance(avroType, poie.datatype.AvroEnum):
+        symbols = list(avroType.symbols)
+        def readEnum(buf, pos):
+            index, pos = readLong(buf, pos)
+            return symbols[index], pos
+        return readEnum
+
+    elif isinstance(avroType, poie.datatype.AvroArray):
+        readItem = compileDecoder(avroType.items, memo)
+        def readArray(buf, pos):
+            out = []
+            count, pos = readLong(buf, pos)
+            while count != 0:
+                if count < 0:
+                    count = -count
+                    size, pos = readLong(buf, pos)
+                for i in range(count):
+                    item, pos = readItem(buf, pos)
+                    out.append(item)
+                count, pos = readLong(buf, pos)
+            return out, pos
+        return readArray
+
+    elif isinstance(avroType, poie.datatype.AvroMap):
+        readValue = compileDecoder(avroType.values, memo)
+        def readMap(buf, pos):
+            out = {}
+            count, pos = readLong(buf, pos)
+            while count != 0:
+                if count < 0:
+                    count = -count
+                    size, pos = readLong(buf, pos)
+                for i in range(count):
+                    key, pos = _readString(buf, pos)
+                    out[key], pos = readValue(buf, pos)
+                count, pos = readLong(buf, pos)
+            return out, pos
+        return readMap
+
+    elif isinstance(avroType, poie.datatype.AvroRecord):
+        if avroType.fullName in memo:
+            return memo[avroType.fullName]
+        fieldReaders = []
+        def readRecord(buf, pos):
+            out = {}
+            for name, readField in fieldReaders:
+                out[name], pos = readField(buf, pos)
+            return out, pos
+        memo[avroType.fullName] = readRecord
+        for field in avroType.fields:
+            fieldReaders.append((field.name, compileDecoder(field.avroType, memo)))
+        return readRecord
+
+    elif isinstance(avroType, poie.datatype.AvroUnion):
+        branches = []
+        for t in avroType.types:
+            if isinstance(t, poie.datatype.AvroNull):
+                branches.append((None, _readNull))
+            else:
+                branches.append((t.name, compileDecoder(t, memo)))
+        def readUnion(buf, pos):
+            index, pos = readLong(buf, pos)
+            tag, readBranch = branches[index]
+            value, pos = readBranch(buf, pos)
+            if tag is None:
+                return None, pos
+            else:
+                return {tag: value}, pos
+        return readUnion
+
+    else:
+        raise poie.errors.AvroException("cannot compile a decoder for " + ts(avroType))
+
+def _promotable(writerType, readerType):
+    """Whether data of ``writerType`` can be read as ``readerType`` without looking inside named types or containers (Avro's schema resolution rules)."""
+    w, r = writerType, readerType
+    if isinstance(r, poie.datatype.AvroLong):
+        return isinstance(w, (poie.datatype.AvroInt, poie.datatype.AvroLong))
+    elif isinstance(r, poie.datatype.AvroFloat):
+        return isinstance(w, (poie.datatype.AvroInt, poie.datatype.AvroLong, poie.datatype.AvroFloat))
+    elif isinstance(r, poie.datatype.AvroDouble):
+        return isinstance(w, (poie.datatype.AvroInt, poie.datatype.AvroLong, poie.datatype.AvroFloat, poie.datatype.AvroDouble))
+    elif isinstance(r, (poie.datatype.AvroString, poie.datatype.AvroBytes)):
+        return isinstance(w, (poie.datatype.AvroString, poie.datatype.AvroBytes))
+    elif isinstance(r, (poie.datatype.AvroFixed, poie.datatype.AvroEnum, poie.datatype.AvroRecord)):
+        return type(w) is type(r) and w.name == r.name
+    elif isinstance(r, poie.datatype.AvroUnion):
+        return False
+    else:
+        return type(w) is type(r)
+
+def _defaultValue(avroType, jsonNode):
+    """Decode a record field's default (for a union, the default is of the first branch)."""
+    if isinstance(avroType, poie.datatype.AvroUnion):
+        first = avroType.types[0]
+        if isinstance(first, poie.datatype.AvroNull):
+            return None
+        return {first.name: poie.datatype.jsonDecoder(first, jsonNode)}
+    else:
+        return poie.datatype.jsonDecoder(avroType, jsonNode)
+
+def compileResolvingDecoder(writerType, readerType, memo=None):
+    """Build a function that decodes Avro binary data written with one type as another, following Avro's schema resolution rules.
+
+    Numbers are promoted (int to long, float, or double; long to float or double; float to double), strings and bytes are interchangeable, record fields are matched by name (writer fields that the reader lacks are skipped and reader fields that the writer lacks take their defaults), enum symbols are matched by name, and unions are resolved branch by branch. As with ``compileDecoder``, the types are examined once, here.
+
+    :type writerType: pypoie.datatype.AvroType
+    :param writerType: type of the encoded data (the writer's schema, from the file)
+    :type readerType: pypoie.datatype.AvroType
+    :param readerType: type of the decoded data (e.g. an engine's ``config.input``)
+    :type memo: dict or ``None``
+    :param memo: decoders for pairs of records that are already being compiled (used for recursive records)
+    :rtype: callable
+    :return: function taking ``(buf, pos)`` and returning ``(value, newPos)``
+    :raises poie.errors.AvroException: if ``writerType`` cannot be resolved to ``readerType``
+    """
+
+    if memo is None:
+        memo = {}
+
+    def incompatible():
+        return poie.errors.AvroException("writer's type {0} cannot be read as {1}".format(ts(writerType), ts(readerType)))
+
+    if writerType == readerType:
+        return compileDecoder(readerType)
+
+    if isinstance(writerType, poie.datatype.AvroUnion):
+        branches = []
+        for t in writerType.types:
+            try:
+                branches.append((compileResolvingDecoder(t, readerType, memo), None))
+            except poie.errors.AvroException as err:
+                # only an error if data of this branch are actually present
+                branches.append((compileDecoder(t), str(err)))
+        def readWriterUnion(buf, pos):
+            index, pos = readLong(buf, pos)
+            readBranch, error = branches[index]
+            if error is not None:
+                raise poie.errors.AvroException(error)
+            return readBranch(buf, pos)
+        return readWriterUnion
+
+    elif isinstance(readerType, poie.datatype.AvroUnion):
+        candidates = [t for t in readerType.types if type(t) is type(writerType) and _promotable(writerType, t)]
+        candidates += [t for t in readerType.types if t not in candidates and _promotable(writerType, t)]
+        if len(candidates) == 0:
+            raise incompatible()
+        branch = candidates[0]
+        readBranch = compileResolvingDecoder(writerType, branch, memo)
+        if isinstance(branch, poie.datatype.AvroNull):
+            return readBranch
+        tag = branch.name
+        def readIntoUnion(buf, pos):
+            value, pos = readBranch(buf, pos)
+            return {tag: value}, pos
+        return readIntoUnion
+
+    elif not _promotable(writerType, readerType):
+        raise incompatible()
+
+    elif isinstance(readerType, (poie.datatype.AvroFloat, poie.datatype.AvroDouble)) and isinstance(writerType, (poie.datatype.AvroInt, poie.datatype.AvroLong)):
+        def readLongAsFloat(buf, pos):
+            value, pos = readLong(buf, pos)
+            return float(value), pos
+        return readLongAsFloat
+
+    elif isinstance(readerType, poie.datatype.AvroString) and isinstance(writerType, poie.datatype.AvroBytes):
+        return _readString
+
+    elif isinstance(readerType, poie.datatype.AvroBytes) and isinstance(writerType, poie.datatype.AvroString):
+        return _readBytes
+
+    elif isinstance(readerType, poie.datatype.AvroFixed):
+        if writerType.size != readerType.size:
+            raise incompatible()
+        return compileDecoder(readerType)
+
+    elif isinstance(readerType, poie.datatype.AvroEnum):
+        readerSymbols = set(readerType.symbols)
+        symbols = list(writerType.symbols)
+        def readEnum(buf, pos):
+            index, pos = readLong(buf, pos)
+            symbol = symbols[index]
+            if symbol not in readerSymbols:
+                raise poie.errors.AvroException("symbol \"{0}\" is not in {1}".format(symbol, ts(readerType)))
+            return symbol, pos
+        return readEnum
+
+    elif isinstance(readerType, poie.datatype.AvroArray):
+        readItem = compileResolvingDecoder(writerType.items, readerType.items, memo)
+        def readArray(buf, pos):
+            out = []
+            count, pos = readLong(buf, pos)
+            while count != 0:
+                if count < 0:
+                    count = -count
+                    size, pos = readLong(buf, pos)
+                for i in range(count):
+                    item, pos = readItem(buf, pos)
+                    out.append(item)
+                count, pos = readLong(buf, pos)
+            return out, pos
+        return readArray
+
+    elif isinstance(readerType, poie.datatype.AvroMap):
+        readValue = compileResolvingDecoder(writerType.values, readerType.values, memo)
+        def readMap(buf, pos):
+            out = {}
+            count, pos = readLong(buf, pos)
+            while count != 0:
+                if count < 0:
+                    count = -count
+                    size, pos = readLong(buf, pos)
+                for i in range(count):
+                    key, pos = _readString(buf, pos)
+                    out[key], pos = readValue(buf, pos)
+                count, pos = readLong(buf, pos)
+            return out, pos
+        return readMap
+
+    elif isinstance(readerType, poie.datatype.AvroRecord):
+        key = (writerType.fullName, readerType.fullName)
+        if key in memo:
+            return memo[key]
+        fieldReaders = []
+        defaults = []
+        def readRecord(buf, pos):
+            out = {}
+            for name, readField in fieldReaders:
+                if name is None:
+                    skipped, pos = readField(buf, pos)
+                else:
+                    out[name], pos = readField(buf, pos)
+            for name, default in defaults:
+                out[name] = default
+            return out, pos
+        memo[key] = readRecord
+        readerFields = dict((f.name, f) for f in readerType.fields)
+        writerNames = set()
+        for field in writerType.fields:
+            writerNames.add(field.name)
+            if field.name in readerFields:
+                fieldReaders.append((field.name, compileResolvingDecoder(field.avroType, readerFields[field.name].avroType, memo)))
+            else:
+                fieldReaders.append((None, compileDecoder(field.avroType)))
+        for field in readerType.fields:
+            if field.name not in writerNames:
+                if not field.schema.has_default:
+                    raise poie.errors.AvroException("writer's type {0} has no field \"{1}\" and {2} has no default for it".format(ts(writerType), field.name, ts(readerType)))
+                defaults.append((field.name, _defaultValue(field.avroType, field.default)))
+        return readRecord
+
+    else:
+        # the same primitive or a promotion that the writer's decoder already produces (int to long, float to double)
+        return compileDecoder(writerType)
+
+def _matcher(avroType):
+    """Predicate for choosing an untagged union branch by the Python type of the value."""
+    if isinstance(avroType, poie.datatype.AvroNull):
+        return lambda x: x is None
+    elif isinstance(avroType, poie.datatype.AvroBoolean):
+        return lambda x: x is True or x is False
+    elif isinstance(avroType, (poie.datatype.AvroInt, poie.datatype.AvroLong)):
+        return lambda x: isinstance(x, int) and x is not True and x is not False
+    elif isinstance(avroType, (poie.datatype.AvroFloat, poie.datatype.AvroDouble)):
+        return lambda x: isinstance(x, (int, float)) and x is not True and x is not False
+    elif isinstance(avroType, poie.datatype.AvroString):
+        return lambda x: isinstance(x, str)
+    elif isinstance(avroType, poie.datatype.AvroEnum):
+        symbols = set(avroType.symbols)
+        return lambda x: isinstance(x, str) and x in symbols
+    elif isinstance(avroType, poie.datatype.AvroBytes):
+        return lambda x: isinstance(x, bytes)
+    elif isinstance(avroType, poie.datatype.AvroFixed):
+        size = avroType.size
+        return lambda x: isinstance(x, bytes) and len(x) == size
+    elif isinstance(avroType, poie.datatype.AvroArray):
+        return lambda x: isinstance(x, (list, tuple))
+    elif isinstance(avroType, poie.datatype.AvroMap):
+        return lambda x: isinstance(x, dict)
+    elif isinstance(avroType, poie.datatype.AvroRecord):
+        names = set(f.name for f in avroType.fields)
+        return lambda x: isinstance(x, dict) and names.issubset(x)
+    else:
+        return lambda x: False
+
+def compileEncoder(avroType, memo=None):
+    """Build a function that encodes engine output of a given type as Avro binary data.
+
+    Union values may be tagged (``{name: value}``) or bare, as ``PFAEngine.action`` returns either.
+
+    :type avroType: pypoie.datatype.AvroType
+    :param avroType: type of the data to encode
+    :type memo: dict or ``None``
+    :param memo: encoders for named types that are already being compiled (used for recursive records)
+    :rtype: callable
+    :return: function taking ``(out, value)`` that appends the encoded ``value`` to the bytearray ``out``
+    """
+
+    if memo is None:
+        memo = {}
+
+    if isinstance(avroType, poie.datatype.AvroNull):
+        return _writeNull
+    elif isinstance(avroType, poie.datatype.AvroBoolean):
+        return _writeBoolean
+    elif isinstance(avroType, (poie.datatype.AvroInt, poie.datatype.AvroLong)):
+        return writeLong
+    elif isinstance(avroType, poie.datatype.AvroFloat):
+        return _writeFloat
+    elif isinstance(avroType, poie.datatype.AvroDouble):
+        return _writeDouble
+    elif isinstance(avroType, poie.datatype.AvroBytes):
+        return _writeBytes
+    elif isinstance(avroType, poie.datatype.AvroString):
+        return _writeString
+
+    elif isinstance(avroType, poie.datatype.AvroFixed):
+        size = avroType.size
+        def writeFixed(out, value):
+            if len(value) != size:
+                raise poie.errors.AvroException("{0} does not match schema {1}".format(repr(value), ts(avroType)))
+            out += value
+        return writeFixed
+
+    elif isinstance(avroType, poie.datatype.AvroEnum):
+        indexes = dict((x, i) for i, x in enumerate(avroType.symbols))
+        def writeEnum(out, value):
+            writeLong(out, indexes[value])
+        return writeEnum
+
+    elif isinstance(avroType, poie.datatype.AvroArray):
+        writeItem = compileEncoder(avroType.items, memo)
+        def writeArray(out, value):
+            if len(value) > 0:
+                writeLong(out, len(value))
+                for item in value:
+                    writeItem(out, item)
+            out.append(0)
+        return writeArray
+
+    elif isinstance(avroType, poie.datatype.AvroMap):
+        writeValue = compileEncoder(avroType.values, memo)
+        def writeMap(out, value):
+            if len(value) > 0:
+                writeLong(out, len(value))
+                for k, v in value.items():
+                    _writeString(out, k)
+                    writeValue(out, v)
+            out.append(0)
+        return writeMap
+
+    elif isinstance(avroType, poie.datatype.AvroRecord):
+        if avroType.fullName in memo:
+            return memo[avroType.fullName]
+        fieldWriters = []
+        def writeRecord(out, value):
+            for name, writeField in fieldWriters:
+                writeField(out, value[name])
+        memo[avroType.fullName] = writeRecord
+        for field in avroType.fields:
+            fieldWriters.append((field.name, compileEncoder(field.avroType, memo)))
+        return writeRecord
+
+    elif isinstance(avroType, poie.datatype.AvroUnion):
+        branches = []
+        byTag = {}
+        for i, t in enumerate(avroType.types):
+            branch = (i, compileEncoder(t, memo), _matcher(t))
+            branches.append(branch)
+            byTag[t.name] = branch
+        def writeUnion(out, value):
+            if isinstance(value, dict) and len(value) == 1:
+                (tag, tagged), = value.items()
+                if tag in byTag:
+                    index, writeBranch, matches = byTag[tag]
+                    writeLong(out, index)
+                    writeBranch(out, tagged)
+                    return
+            for index, writeBranch, matches in branches:
+                if matches(value):
+                    writeLong(out, index)
+                    writeBranch(out, value)
+                    return
+            raise poie.errors.AvroException("{0} does not match schema {1}".format(repr(value), ts(avroType)))
+        return writeUnion
+
+    else:
+        raise poie.errors.AvroException("cannot compile an encoder for " + ts(avroType))
+
+########################### Avro container files
+
+def _readStreamLong(inputStream):
+    n = 0
+    shift = 0
+    while True:
+        b = inputStream.read(1)
+        if len(b) == 0:
+            raise EOFError
+        b = b[0]
+        n |= (b & 0x7F) << shift
+        shift += 7
+        if not b & 0x80:
+            return (n >> 1) ^ -(n & 1)
+
+def _decompress(codec, data):
+    if codec == "null":
+        return data
+    elif codec == "deflate":
+        return zlib.decompress(data, -15)
+    else:
+        raise poie.errors.AvroException("unsupported Avro codec: " + codec)
+
+class AvroDataFileReader(object):
+    """Iterates over the records of an Avro container file, decoding each block with a decoder compiled by ``compileDecoder``.
+
+    Blocks are read and decompressed whole, then decoded in a tight loop; nothing is dispatched on type at runtime.
+    """
+
+    def __init__(self, inputStream, avroType=None):
+        """:type inputStream: binary file-like object
+        :param inputStream: Avro container file, positioned at its beginning
+        :type avroType: pypoie.datatype.AvroType or ``None``
+        :param avroType: the expected type (e.g. an engine's ``config.input``); if it differs from the file's schema, data are resolved to it (see ``compileResolvingDecoder``); ``None`` decodes with the file's schema
+        :raises poie.errors.AvroException: if the file's schema cannot be resolved to ``avroType``
+        """
+
+        self.inputStream = inputStream
+        if inputStream.read(4) != MAGIC:
+            raise poie.errors.AvroException("not an Avro container file")
+
+        metadata = {}
+        count = _readStreamLong(inputStream)
+        while count != 0:
+            if count < 0:
+                count = -count
+                _readStreamLong(inputStream)
+            for i in range(count):
+                key = inputStream.read(_readStreamLong(inputStream)).decode("utf-8")
+                metadata[key] = inputStream.read(_readStreamLong(inputStream))
+            count = _readStreamLong(inputStream)
+        self.metadata = metadata
+        self.sync = inputStream.read(SYNC_SIZE)
+
+        self.codec = metadata.get("avro.codec", b"null").decode("utf-8")
+        self.writerType = poie.datatype.jsonToAvroType(metadata["avro.schema"].decode("utf-8"))
+        if avroType is None or avroType == self.writerType:
+            self.avroType = self.writerType
+            self.decoder = compileDecoder(self.avroType)
+        else:
+            self.avroType = avroType
+            self.decoder = compileResolvingDecoder(self.writerType, avroType)
+
+    def blocks(self):
+        """Generator of lists of decoded records, one list per block."""
+        decoder = self.decoder
+        while True:
+            try:
+                count = _readStreamLong(self.inputStream)
+            except EOFError:
+                return
+            size = _readStreamLong(self.inputStream)
+            buf = _decompress(self.codec, self.inputStream.read(size))
+            if self.inputStream.read(SYNC_SIZE) != self.sync:
+                raise poie.errors.AvroException("Avro container file has a corrupted block (sync marker mismatch)")
+            out = [None] * count
+            pos = 0
+            for i in range(count):
+                out[i], pos = decoder(buf, pos)
+            yield out
+
+    def __iter__(self):
+        for block in self.blocks():
+            for datum in block:
+                yield datum
+
+    def close(self):
+        self.inputStream.close()
+
+class AvroDataFileWriter(object):
+    """Writes Avro container files with an encoder compiled by ``compileEncoder``.
+
+    Has the same ``append``, ``flush``, and ``close`` interface as ``avro.datafile.DataFileWriter``.
+    """
+
+    def __init__(self, outputStream, avroType, codec="null", syncInterval=64000):
+        """:type outputStream: binary file-like object
+        :param outputStream: where to write the file
+        :type avroType: pypoie.datatype.AvroType
+        :param avroType: type of the records (e.g. an engine's ``config.output``)
+        :type codec: string
+        :param codec: "null" or "deflate"
+        :type syncInterval: positive integer
+        :param syncInterval: approximate number of uncompressed bytes per block
+        """
+
+        if codec not in ("null", "deflate"):
+            raise poie.errors.AvroException("unsupported Avro codec: " + codec)
+        self.outputStream = outputStream
+        self.avroType = avroType
+        self.codec = codec
+        self.syncInterval = syncInterval
+        self.encoder = compileEncoder(avroType)
+        self.sync = os.urandom(SYNC_SIZE)
+        self.buffer = bytearray()
+        self.count = 0
+
+        header = bytearray(MAGIC)
+        metadata = {"avro.schema": json.dumps(avroType.schema.to_json()).encode("utf-8"), "avro.codec": codec.encode("utf-8")}
+        writeLong(header, len(metadata))
+        for key, value in metadata.items():
+            _writeString(header, key)
+            _writeBytes(header, value)
+        header.append(0)
+        header += self.sync
+        outputStream.write(bytes(header))
+
+    def append(self, datum):
+        self.encoder(self.buffer, datum)
+        self.count += 1
+        if len(self.buffer) >= self.syncInterval:
+            self.flush()
+
+    def flush(self):
+        if self.count > 0:
+            data = bytes(self.buffer)
+            if self.codec == "deflate":
+                compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+                data = compressor.compress(data) + compressor.flush()
+            block = bytearray()
+            writeLong(block, self.count)
+            writeLong(block, len(data))
+            self.outputStream.write(bytes(block))
+            self.outputStream.write(data)
+            self.outputStream.write(self.sync)
+            self.buffer = bytearray()
+            self.count = 0
+        self.outputStream.flush()
+
+    def close(self):
+        self.flush()
+        self.outputStream.close()
@@ -0,0 +1,193 @@
+
+# Copyright (C) 2021 Data Mining Group
+# 
+# This file is part of POIE
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import os
+import time
+
+from poie.genpy import PFAEngine
+
+formats = {".pfa": "json", ".json": "json", ".yml": "yaml", ".yaml": "yaml", ".ppfa": "prettypfa", ".pmml": "pmml", ".xml": "pmml"}
+
+def documentFormat(fileName):
+    """Determine the format of a document from its file name extension.
+
+    :type fileName: string
+    :param fileName: name of the file
+    :rtype: string or ``None``
+    :return: "json", "yaml", "prettypfa", "pmml", or ``None`` if the extension is not recognized
+    """
+    return formats.get(os.path.splitext(fileName)[1].lower())
+
+def findDocuments(paths):
+    """Expand a list of files and directories into a sorted list of document file names.
+
+    Directories are searched recursively for files whose extensions are recognized by ``documentFormat``; files named explicitly are always included.
+
+    :type paths: list of strings
+    :param paths: files and directories
+    :rtype: list of strings
+    :return: file names
+    """
+    out = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for fileName in sorted(filenames):
+                    if documentFormat(fileName) is not None:
+                        out.append(os.path.join(dirpath, fileName))
+        else:
+            out.append(path)
+    return out
+
+class ValidationResult(object):
+    """Outcome of reading and compiling one document."""
+
+    def __init__(self, fileName, format, error, readTime, compileTime, codeSize):
+        """Creates a ``ValidationResult``; normally only called by ``validateDocument``.
+
+        :type fileName: string
+        :param fileName: name of the file
+        :type format: string or ``None``
+        :param format: format it was read as (see ``documentFormat``)
+        :type error: string or ``None``
+        :param error: exception type and message if reading or compiling failed, ``None`` if it succeeded
+        :type readTime: number or ``None``
+        :param readTime: seconds spent reading the document into an abstract syntax tree
+        :type compileTime: number or ``None``
+        :param compileTime: seconds spent type-checking, generating code, and initializing one engine
+        :type codeSize: integer or ``None``
+        :param codeSize: number of characters of generated Python code
+        """
+        self.fileName = fileName
+        self.format = format
+        self.error = error
+        self.readTime = readTime
+        self.compileTime = compileTime
+        self.codeSize = codeSize
+
+    @property
+    def success(self):
+        """``True`` if the document was read and compiled without errors."""
+        return self.error is None
+
+    def jsonNode(self):
+        """Represent this result as Pythonized JSON."""
+        return {"fileName": self.fileName, "format": self.format, "success": self.success, "error": self.error, "readTime": self.readTime, "compileTime": self.compileTime, "codeSize": self.codeSize}
+
+    def __repr__(self):
+        return "ValidationResult({0}, {1})".format(repr(self.fileName), "ok" if self.success else repr(self.error))
+
+def readDocument(fileName, format, readerOptions=None):
+    """Read a document as a PFA abstract syntax tree, without checking it.
+
+    :type fileName: string
+    :param fileName: name of the file
+    :type format: string
+    :param format: "json", "yaml", "prettypfa", or "pmml"
+    :type readerOptions: dict of option strings or ``None``
+    :param readerOptions: PMML-to-PFA conversion options (see ``poie.pmml.reader.pmmlToAst``); ignored for the other formats
+    :rtype: pypoie.pfaast.EngineConfig
+    :return: PFA abstract syntax tree
+    """
+    if format == "json":
+        import poie.reader
+        with open(fileName) as stream:
+            return poie.reader.jsonToAst(stream.read())
+    elif format == "yaml":
+        import poie.reader
+        with open(fileName) as stream:
+            return poie.reader.yamlToAst(stream.read())
+    elif format == "prettypfa":
+        import poie.prettypfa
+        with open(fileName) as stream:
+            return poie.prettypfa.ast(stream.read(), check=False)
+    elif format == "pmml":
+        from poie.pmml.reader import pmmlToAst
+        return pmmlToAst(fileName, readerOptions)
+    else:
+        raise ValueError("unrecognized document format for {0}".format(fileName))
+
+def validateDocument(fileName, options=None, version=None, readerOptions=None):
+    """Read and compile one document, capturing any error.
+
+    :type fileName: string
+    :param fileName: name of the file
+    :type options: dict of Pythonized JSON
+    :param options: options that override those found in the PFA document
+    :type version: string
+    :param version: PFA version number as a "major.minor.release" string
+    :type readerOptions: dict of option strings or ``None``
+    :param readerOptions: PMML-to-PFA conversion options, such as ``{"reader.streaming": True}``
+    :rtype: pypoie.batch.ValidationResult
+    :return: timing, error, and generated-code size
+    """
+    format = documentFormat(fileName)
+    readTime = None
+    compileTime = None
+    codeSize = None
+    try:
+        startTime = time.time()
+        engineConfig = readDocument(fileName, format, readerOptions)
+        readTime = time.time() - startTime
+
+        startTime = time.time()
+        engine, = PFAEngine.fromAst(engineConfig, options, version)
+        compileTime = time.time() - startTime
+        codeSize = len(engine.generatedCode)
+
+    except Exception as err:
+        return ValidationResult(fileName, format, "{0}: {1}".format(err.__class__.__name__, str(err)), readTime, compileTime, codeSize)
+
+    else:
+        return ValidationResult(fileName, format, None, readTime, compileTime, codeSize)
+
+def _validateDocument(args):
+    return validateDocument(*args)
+
+def validateDocuments(fileNames, options=None, version=None, processes=None, chunksize=1, readerOptions=None):
+    """Read and compile many documents across a pool of processes.
+
+    Results are yielded in the order of ``fileNames`` as soon as each is available. Each worker keeps its own type and signature caches for the documents it handles, and PrettyPFA parse tables are shared through the on-disk cache (see ``poie.prettypfa.parseTableDirectory``).
+
+    :type fileNames: list of strings
+    :param fileNames: names of the files (see ``findDocuments``)
+    :type options: dict of Pythonized JSON
+    :param options: options that override those found in the PFA documents
+    :type version: string
+    :param version: PFA version number as a "major.minor.release" string
+    :type processes: positive integer or ``None``
+    :param processes: number of worker processes; ``None`` for the number of CPUs, ``1`` to validate in this process
+    :type chunksize: positive integer
+    :param chunksize: number of documents sent to a worker at a time
+    :type readerOptions: dict of option strings or ``None``
+    :param readerOptions: PMML-to-PFA conversion options, such as ``{"reader.streaming": True}``
+    :rtype: generator of pypoie.batch.ValidationResult
+    :return: one result per document
+    """
+    tasks = [(fileName, options, version, readerOptions) for fileName in fileNames]
+    if processes == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _validateDocument(task)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for result in pool.imap(_validateDocument, tasks, chunksize):
+                yield result
+        finally:
+            pool.terminate()
+            pool.join()
@@ -16,6 +16,8 @@
 
 import json
 import math
+import threading
+import weakref
 
 import avro.io
 import avro.schema
@@ -99,12 +101,22 @@ def jsonNodeToAvroType(x):
 def schemaToAvroType(schema):
     """Convert an avro.schema into a poie.datatype.AvroType.
 
+    The result is interned (see ``internType``) and remembered on the schema object, so converting the same schema again is an attribute lookup.
+
     :type schema: avro.schema.Schema
     :param schema: schema object from the Avro library
     :rtype: pypoie.datatype.AvroType
     :return: AvroType object
     """
 
+    try:
+        return schema._poieAvroType
+    except AttributeError:
+        out = internType(_schemaToAvroType(schema))
+        schema._poieAvroType = out
+        return out
+
+def _schemaToAvroType(schema):
     if schema.type == "null":
         return AvroNull()
     elif schema.type == "boolean":
@@ -146,6 +158,85 @@ def schemaToAvroType(schema):
         out._schema = schema
         return out
 
+def canonicalJson(schema):
+    """Serialize an avro.schema as JSON with sorted keys, without recursion.
+
+    Named types (records, enums, and fixed) are written out in full the first time they are visited and by name after that, as avro.schema's ``to_json`` does, so recursive types are fine. The traversal keeps its own stack, so arbitrarily deep types (such as long chains of records) are fine, too.
+
+    :type schema: avro.schema.Schema
+    :param schema: schema to serialize
+    :rtype: string
+    :return: JSON text that is equal for structurally equal schemas
+    """
+
+    out = []
+    visitedNames = set()
+    # each item is (True, text to write) or (False, schema, field, or Pythonized JSON to serialize)
+    stack = [(False, schema)]
+    while len(stack) > 0:
+        isText, x = stack.pop()
+        if isText:
+            out.append(x)
+            continue
+
+        if isinstance(x, avro.schema.NamedSchema):
+            if x.fullname in visitedNames:
+                out.append(json.dumps(x.fullname))
+                continue
+            visitedNames.add(x.fullname)
+
+        if isinstance(x, avro.schema.UnionSchema):
+            x = x.schemas
+        elif isinstance(x, avro.schema.PrimitiveSchema) and len(x.props) == 1:
+            x = x.fullname
+        elif isinstance(x, (avro.schema.Schema, avro.schema.Field)):
+            x = x.props
+
+        if isinstance(x, dict):
+            items = [(True, "{")]
+            for i, key in enumerate(sorted(x)):
+                items.append((True, ("" if i == 0 else ", ") + json.dumps(key) + ": "))
+                items.append((False, x[key]))
+            items.append((True, "}"))
+            stack.extend(reversed(items))
+        elif isinstance(x, (list, tuple)):
+            items = [(True, "[")]
+            for i, item in enumerate(x):
+                if i > 0:
+                    items.append((True, ", "))
+                items.append((False, item))
+            items.append((True, "]"))
+            stack.extend(reversed(items))
+        else:
+            out.append(json.dumps(x))
+
+    return "".join(out)
+
+_internTable = weakref.WeakValueDictionary()
+_internLock = threading.Lock()
+
+def internType(avroType):
+    """Return the canonical instance of a type, so that equal types are the same Python object.
+
+    Interned types compare by identity (``x == y`` is ``x is y`` if both are interned) and their ``canonicalId`` and hash are computed only once. The table holds types weakly, so types that are no longer used anywhere are dropped.
+
+    :type avroType: pypoie.datatype.AvroType
+    :param avroType: type to intern
+    :rtype: pypoie.datatype.AvroType
+    :return: the canonical instance that is equal to ``avroType``
+    """
+
+    if avroType._interned or isinstance(avroType, ExceptionType):
+        return avroType
+    key = avroType.canonicalId
+    with _internLock:
+        out = _internTable.get(key)
+        if out is None:
+            avroType._interned = True
+            _internTable[key] = avroType
+            out = avroType
+    return out
+
 def avroTypeToSchema(avroType):
     """Convert a poie.datatype.AvroType into an avro.schema.
 
@@ -173,20 +264,49 @@ class AvroType(Type):
         """Return "name" of this type, which is used as a key in tagged unions."""
         return None
 
+    _interned = False
+
+    @property
+    def canonicalId(self):
+        """Structural identifier of the type: its JSON form with sorted keys (see ``canonicalJson``), computed once per instance.
+
+        Two types are equal if and only if their ``canonicalId`` strings are equal. Once it has been computed, the type can't be given a different schema (see ``__setattr__``).
+        """
+        try:
+            return self._canonicalId
+        except AttributeError:
+            self._canonicalId = canonicalJson(self.schema)
+            return self._canonicalId
+
+    def __setattr__(self, name, value):
+        """Refuse to replace the schema of a type whose ``canonicalId`` has been computed.
+
+        The ``canonicalId``, the hash, and interning (see ``internType``) are derived from the schema once, so a type is immutable from then on; build a new type instead. The avro.schema object itself is shared with other types and must not be modified either.
+        """
+        if name == "_schema" and hasattr(self, "_canonicalId"):
+            raise TypeError("cannot replace the schema of {0} after its canonicalId has been computed; build a new type instead".format(self.__class__.__name__))
+        super(AvroType, self).__setattr__(name, value)
+
     def __eq__(self, other):
         """Return ``True`` if the two types are equal."""
-        if isinstance(other, AvroType):
-            return self.schema == other.schema
+        if self is other:
+            return True
+        elif isinstance(other, AvroType):
+            if self._interned and other._interned:
+                return False
+            return self.canonicalId == other.canonicalId
         elif isinstance(other, AvroPlaceholder):
-            return self.schema == other.avroType.schema
+            return self == other.avroType
         else:
             return False
 
     def __hash__(self):
-        """Return a unique hash of the type."""
-        """TDH Changed it to a str but the number is non-unquie"""
-        """TODO - use somethng other than a hash"""
-        return hash(str(self.schema))
+        """Return a hash of the type, consistent with equality."""
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(self.canonicalId)
+            return self._hash
 
     def _recordFieldsOkay(self, other, memo, checkRecord):
         for xf in self.fields:
@@ -397,6 +517,9 @@ class AvroBytes(AvroRaw):
     def name(self):
         return "bytes"
 
+for _primitive in (AvroNull, AvroBoolean, AvroInt, AvroLong, AvroFloat, AvroDouble, AvroBytes):
+    _primitive._canonicalId = canonicalJson(_primitive._schema)
+
 class AvroFixed(AvroRaw, AvroCompiled):
     """Avro "fixed" type for fixed-length byte arrays."""
     def __init__(self, size, name=None, namespace=None):
@@ -437,6 +560,8 @@ class AvroString(AvroIdentifier):
     def name(self):
         return "string"
 
+AvroString._canonicalId = canonicalJson(AvroString._schema)
+
 class AvroEnum(AvroIdentifier, AvroCompiled):
     """Avro "enum" type for a small collection of string-labeled values."""
     def __init__(self, symbols, name=None, namespace=None):
@@ -701,6 +826,7 @@ class ForwardDeclarationParser(object):
     def __init__(self):
         self.names = avro.schema.Names()
         self.lookupTable = {}
+        self.avroTypeCache = {}
 
     def contains(self, original):
         return original in self.lookupTable
@@ -712,32 +838,105 @@ class ForwardDeclarationParser(object):
     def compiledTypes(self):
         return [x for x in self.lookupTable if isinstance(x, (AvroFixed, AvroRecord, AvroEnum))]
 
+    @staticmethod
+    def _dependencies(obj, namespace, defines, references):
+        """Collect the full names that an Avro type in Pythonized JSON defines and the names that it refers to (with each possible namespace)."""
+        if isinstance(obj, str):
+            if obj not in ("null", "boolean", "int", "long", "float", "double", "bytes", "string"):
+                references.add(obj)
+                if namespace and "." not in obj:
+                    references.add(namespace + "." + obj)
+
+        elif isinstance(obj, (list, tuple)):
+            for x in obj:
+                ForwardDeclarationParser._dependencies(x, namespace, defines, references)
+
+        elif isinstance(obj, dict):
+            t = obj.get("type")
+            if t in ("record", "error", "enum", "fixed") and isinstance(obj.get("name"), str):
+                name = obj["name"]
+                if "." not in name:
+                    space = obj.get("namespace", namespace)
+                    if space:
+                        name = space + "." + name
+                defines.add(name)
+                if t in ("record", "error"):
+                    for field in obj.get("fields", []):
+                        if isinstance(field, dict):
+                            ForwardDeclarationParser._dependencies(field.get("type"), name.rpartition(".")[0], defines, references)
+            elif t == "array":
+                ForwardDeclarationParser._dependencies(obj.get("items"), namespace, defines, references)
+            elif t == "map":
+                ForwardDeclarationParser._dependencies(obj.get("values"), namespace, defines, references)
+            else:
+                ForwardDeclarationParser._dependencies(t, namespace, defines, references)
+
+    @staticmethod
+    def _dependencyOrder(jsonStrings, objs):
+        """Order the type strings so that each one comes after the strings that define the names it uses (cycles are left in input order)."""
+        definedBy = {}
+        references = {}
+        for jsonString in jsonStrings:
+            if jsonString not in references:
+                defines = set()
+                references[jsonString] = set()
+                ForwardDeclarationParser._dependencies(objs[jsonString], None, defines, references[jsonString])
+                for name in defines:
+                    definedBy.setdefault(name, jsonString)
+
+        ordered = []
+        state = {}
+        for root in jsonStrings:
+            if root in state:
+                continue
+            state[root] = False
+            stack = [(root, iter(references[root]))]
+            while len(stack) > 0:
+                jsonString, refs = stack[-1]
+                for name in refs:
+                    dependency = definedBy.get(name)
+                    if dependency is not None and dependency not in state:
+                        state[dependency] = False
+                        stack.append((dependency, iter(references[dependency])))
+                        break
+                else:
+                    stack.pop()
+                    state[jsonString] = True
+                    ordered.append(jsonString)
+        return ordered
+
     def parse(self, jsonStrings):
+        objs = dict((x, json.loads(x)) for x in set(jsonStrings))
+        ordered = self._dependencyOrder(jsonStrings, objs)
+
         schemae = {}
         unresolvedSize = -1
         lastUnresolvedSize = -1
         errorMessages = {}
 
+        # in dependency order, everything resolves in the first pass; further passes only happen for types that can't be resolved (to report them)
         while unresolvedSize != 0:
-            for jsonString in jsonStrings:
+            for jsonString in ordered:
                 if jsonString not in schemae:
-                    obj = json.loads(jsonString)
+                    obj = objs[jsonString]
 
                     if isinstance(obj, str) and self.names.has_name(obj, None):
                         gotit = self.names.get_name(obj, None)
                         schemae[jsonString] = gotit
                     else:
-                        oldnames = dict(self.names.names)
+                        numNames = len(self.names.names)
 
                         try:
                             gotit = avro.schema.make_avsc_object(obj, self.names)
                         except avro.schema.SchemaParseException as err:
-                            self.names.names = oldnames
+                            # names are only ever added, in order; forget the ones added by the failed attempt
+                            for name in list(self.names.names)[numNames:]:
+                                del self.names.names[name]
                             errorMessages[jsonString] = str(err)
                         else:
                             schemae[jsonString] = gotit
 
-            unresolved = [x for x in jsonStrings if x not in schemae]
+            unresolved = [x for x in ordered if x not in schemae]
             unresolvedSize = len(unresolved)
 
             if unresolvedSize == lastUnresolvedSize:
@@ -748,6 +947,7 @@ class ForwardDeclarationParser(object):
 
         result = dict((x, schemaToAvroType(schemae[x])) for x in jsonStrings)
         self.lookupTable.update(result)
+        self.avroTypeCache = {}
         return result
 
     def getSchema(self, description):
@@ -758,8 +958,38 @@ class ForwardDeclarationParser(object):
             return result.avroType
 
     def getAvroType(self, description):
+        """Look up a type by name or by a description that uses only previously parsed names.
+
+        Library functions call this at runtime on every record, so results are cached by description (strings as-is, Pythonized JSON in canonical form).
+
+        :type description: string or Pythonized JSON
+        :param description: type name, JSON string, or Pythonized JSON
+        :rtype: pypoie.datatype.AvroType or ``None``
+        :return: the type or ``None`` if the description is not recognized
+        """
+        if isinstance(description, str):
+            key = description
+        else:
+            try:
+                key = (None, json.dumps(description, sort_keys=True))
+            except (TypeError, ValueError):
+                return self._getAvroType(description)
+        try:
+            return self.avroTypeCache[key]
+        except KeyError:
+            out = self._getAvroType(description)
+            if out is not None:
+                self.avroTypeCache[key] = out
+            return out
+
+    def _getAvroType(self, description):
         if isinstance(description, str):
-            if self.names.has_name(description, None):
+            try:
+                isName = self.names.has_name(description, None)
+            except avro.schema.InvalidName:
+                # a JSON string, handled below
+                isName = False
+            if isName:
                 return schemaToAvroType(self.names.get_name(description, None))
             elif description == "null":
                 return AvroNull()
@@ -804,7 +1034,7 @@ class ForwardDeclarationParser(object):
             elif description.get("type") == "array" and "items" in description:
                 return AvroArray(self.getAvroType(description["items"]))
             elif description.get("type") == "map" and "values" in description:
-                return AvroArray(self.getAvroType(description["values"]))
+                return AvroMap(self.getAvroType(description["values"]))
             elif description.get("type") in ("fixed", "enum", "record"):
                 if self.names.has_name(description.get("name"), description.get("namespace")):
                     return schemaToAvroType(self.names.get_name(description.get("name"), description.get("namespace")))
@@ -957,6 +1187,136 @@ def jsonDecoder(avroType, value):
         raise Exception
     raise poie.errors.AvroException("{0} does not match schema {1}".format(json.dumps(value), ts(avroType)))
 
+def compileJsonDecoder(avroType, memo=None):
+    """Build a function that decodes JSON objects of one poie.datatype.AvroType, equivalent to ``jsonDecoder(avroType, value)``.
+
+    ``jsonDecoder`` re-examines the type (and rebuilds field and union-member lists) for every value it visits; the compiled function does that once, which matters for large cell and pool initializers.
+
+    :type avroType: pypoie.datatype.AvroType
+    :param avroType: how we want to interpret the JSON
+    :type memo: dict or ``None``
+    :param memo: decoders for records that are already being compiled (used for recursive records)
+    :rtype: callable
+    :return: function from a JSON object in Python encoding to an object ready for PFAEngine.action
+    """
+
+    if memo is None:
+        memo = {}
+
+    def fail(value):
+        raise poie.errors.AvroException("{0} does not match schema {1}".format(json.dumps(value), ts(avroType)))
+
+    if isinstance(avroType, AvroNull):
+        def decode(value):
+            if value is None:
+                return value
+            fail(value)
+
+    elif isinstance(avroType, AvroBoolean):
+        def decode(value):
+            if value is True or value is False:
+                return value
+            fail(value)
+
+    elif isinstance(avroType, (AvroInt, AvroLong)):
+        def decode(value):
+            try:
+                return int(value)
+            except (ValueError, TypeError):
+                fail(value)
+
+    elif isinstance(avroType, (AvroFloat, AvroDouble)):
+        def decode(value):
+            try:
+                return float(value)
+            except (ValueError, TypeError):
+                fail(value)
+
+    elif isinstance(avroType, AvroBytes):
+        def decode(value):
+            if isinstance(value, str):
+                return bytes(value.encode())
+            if isinstance(value, bytes):
+                return value
+            fail(value)
+
+    elif isinstance(avroType, AvroFixed):
+        size = avroType.size
+        def decode(value):
+            if isinstance(value, str):
+                out = bytes(value.encode())
+                if len(out) == size:
+                    return out
+            fail(value)
+
+    elif isinstance(avroType, AvroString):
+        def decode(value):
+            if isinstance(value, str):
+                return value
+            fail(value)
+
+    elif isinstance(avroType, AvroEnum):
+        symbols = set(avroType.symbols)
+        def decode(value):
+            if isinstance(value, str) and value in symbols:
+                return value
+            fail(value)
+
+    elif isinstance(avroType, AvroArray):
+        decodeItem = compileJsonDecoder(avroType.items, memo)
+        def decode(value):
+            if isinstance(value, (list, tuple)):
+                return [decodeItem(x) for x in value]
+            fail(value)
+
+    elif isinstance(avroType, AvroMap):
+        decodeValue = compileJsonDecoder(avroType.values, memo)
+        def decode(value):
+            if isinstance(value, dict):
+                return dict((k, decodeValue(v)) for k, v in value.items())
+            fail(value)
+
+    elif isinstance(avroType, AvroRecord):
+        if avroType.fullName in memo:
+            return memo[avroType.fullName]
+        fields = []
+        def decode(value):
+            if isinstance(value, dict):
+                out = {}
+                for name, decodeField, default, isNull in fields:
+                    if name in value:
+                        out[name] = decodeField(value[name])
+                    elif default is not None:
+                        out[name] = decodeField(default)
+                    elif isNull:
+                        out[name] = None
+                    else:
+                        fail(value)
+                return out
+            fail(value)
+        memo[avroType.fullName] = decode
+        for field in avroType.fields:
+            fieldType = field.avroType
+            fields.append((field.name, compileJsonDecoder(fieldType, memo), field.default, isinstance(fieldType, AvroNull)))
+
+    elif isinstance(avroType, AvroUnion):
+        types = avroType.types
+        hasNull = any(isinstance(x, AvroNull) for x in types)
+        decoders = dict((x.name, compileJsonDecoder(x, memo)) for x in types)
+        def decode(value):
+            if isinstance(value, dict) and len(value) == 1:
+                (tag, val), = value.items()
+                if tag in decoders:
+                    return {tag: decoders[tag](val)}
+            elif value is None and hasNull:
+                return None
+            fail(value)
+
+    else:
+        raise Exception
+
+    return decode
+
 def jsonEncoder(avroType, value, tagged=True):
     """Encode an object as JSON, given poie.datatype.AvroType.
 
@@ -17,17 +17,20 @@
 # limitations under the License.
 
 import base64
+import collections
 import json
 import math
 import threading
 import time
 import random
 import struct
+import weakref
 
 from avro.datafile import DataFileReader, DataFileWriter
 from avro.io import DatumReader, DatumWriter
 
 from poie.errors import *
+import poie.avrocodec
 import poie.pfaast
 import poie.datatype
 import poie.fcn
@@ -42,6 +45,7 @@ import poie.version
 from poie.pfaast import EngineConfig
 from poie.pfaast import Cell as AstCell
 from poie.pfaast import Pool as AstPool
+from poie.pfaast import DecodedInit
 from poie.pfaast import FcnDef
 from poie.pfaast import FcnRef
 from poie.pfaast import FcnRefFill
@@ -93,7 +97,6 @@ from poie.pfaast import ArrayIndex
 from poie.pfaast import MapIndex
 from poie.pfaast import RecordIndex
 
-from poie.pmml.reader import pmmlToAst
 
 class GeneratePython(poie.pfaast.Task):
     """A ``poie.pfaast.Task`` for turning PFA into executable Python."""
@@ -296,11 +299,7 @@ class GeneratePython(poie.pfaast.Task):
 
             out.append("""
     def pooldel(self, name, item):
-        p = self.pools[name]
-        try:
-            del p.value[item]
-        except KeyError:
-            pass
+        self.pools[name].delete(item)
         return None
 """)
 
@@ -383,13 +382,13 @@ class GeneratePython(poie.pfaast.Task):
             return "update(state, scope, {0}, [{1}], {2}, 2002, 2003, \"attr-to\", {3})".format(context.expr, self.reprPath(context.path), context.to, repr(context.pos))
 
         elif isinstance(context, CellGet.Context):
-            return "get(self.cells[{0}].value, [{1}], 2004, 2005, \"cell\", {2})".format(repr(context.cell), self.reprPath(context.path), repr(context.pos))
+            return "self.cells[{0}].get([{1}], 2004, 2005, \"cell\", {2})".format(repr(context.cell), self.reprPath(context.path), repr(context.pos))
 
         elif isinstance(context, CellTo.Context):
             return "self.cells[{0}].update(state, scope, [{1}], {2}, 2006, 2007, \"cell-to\", {3})".format(repr(context.cell), self.reprPath(context.path), context.to, repr(context.pos))
 
         elif isinstance(context, PoolGet.Context):
-            return "get(self.pools[{0}].value, [{1}], 2008, 2009, \"pool\", {2})".format(repr(context.pool), self.reprPath(context.path), repr(context.pos))
+            return "self.pools[{0}].get([{1}], 2008, 2009, \"pool\", {2})".format(repr(context.pool), self.reprPath(context.path), repr(context.pos))
 
         elif isinstance(context, PoolTo.Context):
             return "self.pools[{0}].update(state, scope, [{1}], {2}, {3}, 2010, 2011, \"pool-to\", {4})".format(repr(context.pool), self.reprPath(context.path), context.to, context.init, repr(context.pos))
@@ -503,12 +502,115 @@ class ExecutionState(object):
         if self.timeout > 0 and (time.time() - self.startTime) * 1000 > self.timeout:
             raise PFATimeoutException("exceeded timeout of {0} milliseconds".format(self.timeout))
 
+class ReadWriteLock(object):
+    """Lock that admits any number of concurrent readers or exactly one writer.
+
+    Writers are preferred: once a writer is waiting, new readers wait until it has finished. A thread that holds the write lock may also read (so that a cell-to or pool-to updater can look at its own cell or pool).
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writer = None
+        self.writersWaiting = 0
+
+    def acquireRead(self):
+        me = threading.current_thread()
+        self.condition.acquire()
+        try:
+            if self.writer is not me:
+                while self.writer is not None or self.writersWaiting > 0:
+                    self.condition.wait()
+            self.readers += 1
+        finally:
+            self.condition.release()
+
+    def releaseRead(self):
+        self.condition.acquire()
+        try:
+            self.readers -= 1
+            if self.readers == 0:
+                self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+    def acquire(self):
+        """Acquire the write lock (same interface as ``threading.Lock``)."""
+        me = threading.current_thread()
+        self.condition.acquire()
+        try:
+            self.writersWaiting += 1
+            while self.writer is not None or self.readers > 0:
+                self.condition.wait()
+            self.writersWaiting -= 1
+            self.writer = me
+        finally:
+            self.condition.release()
+
+    def release(self):
+        """Release the write lock (same interface as ``threading.Lock``)."""
+        self.condition.acquire()
+        try:
+            self.writer = None
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+
+class LockStripes(object):
+    """Fixed set of locks shared by all keys of the shared pools (and all shared cells) of a ``poie.genpy.SharedState``.
+
+    Each key is mapped onto one of ``numStripes`` locks by its hash, so the number of locks does not grow with the number of distinct pool keys and no global lock is needed to find a key's lock. Two keys on the same stripe are serialized, which is harmless because a cell-to or pool-to updater cannot itself modify persistent state (see ``checkForDeadlock``).
+
+    If ``readerWriter`` is ``True``, the stripes are ``poie.genpy.ReadWriteLock`` objects and reads of shared cells and pools wait for writers; otherwise, reads are lock-free and see the last completed update (updates never modify values in place). In reader/writer mode, two updaters that each read the other's cell or pool can deadlock, so it should only be used when updaters do not read other shared state.
+    """
+
+    defaultStripes = 64
+
+    def __init__(self, numStripes=None, readerWriter=False):
+        """:type numStripes: positive integer or ``None``
+        :param numStripes: number of locks; ``None`` for ``LockStripes.defaultStripes``
+        :type readerWriter: bool
+        :param readerWriter: if ``True``, use reader/writer locks and lock reads as well as writes
+        """
+
+        if numStripes is None:
+            numStripes = self.defaultStripes
+        if not isinstance(numStripes, int) or numStripes < 1:
+            raise ValueError("numStripes must be a positive integer")
+        self.numStripes = numStripes
+        self.readerWriter = readerWriter
+        self.stripes = [self.newLock() for i in range(numStripes)]
+
+    def newLock(self):
+        """Create a lock of the kind used by these stripes (``threading.Lock`` or ``poie.genpy.ReadWriteLock``)."""
+        if self.readerWriter:
+            return ReadWriteLock()
+        else:
+            return threading.Lock()
+
+    def index(self, key):
+        """Get the index of the stripe responsible for ``key``."""
+        return hash(key) % self.numStripes
+
+    def stripe(self, key):
+        """Get the lock responsible for ``key``."""
+        return self.stripes[self.index(key)]
+
+    def __repr__(self):
+        return "LockStripes({0}{1})".format(self.numStripes, ", readerWriter" if self.readerWriter else "")
+
 class SharedState(object):
     """Represents the state of all shared cells and pools at runtime."""
 
-    def __init__(self):
+    def __init__(self, numStripes=None, readerWriter=False):
+        """:type numStripes: positive integer or ``None``
+        :param numStripes: number of locks shared by all keys of shared pools; ``None`` for ``poie.genpy.LockStripes.defaultStripes``
+        :type readerWriter: bool
+        :param readerWriter: if ``True``, reads of shared cells and pools wait for concurrent updates to finish
+        """
         self.cells = {}
         self.pools = {}
+        self.lockManager = LockStripes(numStripes, readerWriter)
 
     def __repr__(self):
         return "SharedState({0} cells, {1} pools)".format(len(self.cells), len(self.pools))
@@ -523,11 +625,22 @@ class PersistentStorageItem(object):
         self.source = source
 
 class Cell(PersistentStorageItem):
-    """Represents the state of a cell at runtime."""
+    """Represents the state of a cell at runtime.
 
-    def __init__(self, value, shared, rollback, source):
+    ``version`` is incremented whenever the cell is updated, so that each engine instance's ``PFAEngine.writeSnapshot`` can write only what changed since its own last checkpoint.
+    """
+
+    def __init__(self, value, shared, rollback, source, lockManager=None):
         if shared:
-            self.lock = threading.Lock()
+            if lockManager is None:
+                self.lock = threading.Lock()
+                self.readerWriter = False
+            else:
+                self.lock = lockManager.newLock()
+                self.readerWriter = lockManager.readerWriter
+        else:
+            self.readerWriter = False
+        self.version = 0
         super(Cell, self).__init__(value, shared, rollback, source)
 
     def __repr__(self):
@@ -536,18 +649,60 @@ class Cell(PersistentStorageItem):
             contents = contents[:27] + "..."
         return "Cell(" + ("shared, " if self.shared else "") + ("rollback, " if self.rollback else "") + contents + ")"
 
+    def get(self, path, arrayErrCode, mapErrCode, fcnName, pos):
+        if self.readerWriter:
+            self.lock.acquireRead()
+            try:
+                return get(self.value, path, arrayErrCode, mapErrCode, fcnName, pos)
+            finally:
+                self.lock.releaseRead()
+        else:
+            return get(self.value, path, arrayErrCode, mapErrCode, fcnName, pos)
+
     def update(self, state, scope, path, to, arrayErrCode, mapErrCode, fcnName, pos):
         result = None
         if self.shared:
             self.lock.acquire()
-            self.value = update(state, scope, self.value, path, to, arrayErrCode, mapErrCode, fcnName, pos)
-            result = self.value
-            self.lock.release()
+            try:
+                self.value = update(state, scope, self.value, path, to, arrayErrCode, mapErrCode, fcnName, pos)
+                result = self.value
+                self.version += 1
+            finally:
+                self.lock.release()
         else:
             self.value = update(state, scope, self.value, path, to, arrayErrCode, mapErrCode, fcnName, pos)
             result = self.value
+            self.version += 1
         return result
 
+    def checkpoint(self):
+        """Get the value and version of the cell as one consistent pair.
+
+        :rtype: (any, int)
+        :return: current value and ``version``
+        """
+        if self.shared:
+            self.lock.acquire()
+            try:
+                return self.value, self.version
+            finally:
+                self.lock.release()
+        else:
+            return self.value, self.version
+
+    def restore(self, value):
+        """Replace the value of the cell from a snapshot, counting it as an update."""
+        if self.shared:
+            self.lock.acquire()
+            try:
+                self.value = value
+                self.version += 1
+            finally:
+                self.lock.release()
+        else:
+            self.value = value
+            self.version += 1
+
     def maybeSaveBackup(self):
         if self.rollback:
             self.oldvalue = self.value
@@ -557,12 +712,29 @@ class Cell(PersistentStorageItem):
             self.value = self.oldvalue
 
 class Pool(PersistentStorageItem):
-    """Represents the state of a pool at runtime."""
+    """Represents the state of a pool at runtime.
 
-    def __init__(self, value, shared, rollback, source):
+    Changes are logged per lock stripe (a private pool has one stripe): ``changes[i]`` maps each key on stripe ``i`` that has been updated or deleted to the ``sequences[i]`` number of its last change, in order of those changes, and is only modified while holding stripe ``i``'s lock, so that recording a change never serializes updates on different stripes. Each engine instance's ``PFAEngine.writeSnapshot`` finds the keys that changed since its own last checkpoint (a ``mark``, one sequence number per stripe); a change is dropped from the logs once every instance that uses the pool has checkpointed past it (see ``checkpointed``).
+
+    If ``borrowed`` is ``True``, ``value`` (and the items held back by ``deferDecoding``) are shared with other instances of the engine or with its ``EngineConfig``, because the pool is never written by the PFA document; ``own`` must be called before modifying them in any other way than decoding.
+    """
+
+    def __init__(self, value, shared, rollback, source, lockManager=None):
         if shared:
-            self.locklock = threading.Lock()
-            self.locks = {}
+            if lockManager is None:
+                lockManager = LockStripes()
+            self.locks = lockManager
+            self.readerWriter = lockManager.readerWriter
+            numStripes = lockManager.numStripes
+        else:
+            self.readerWriter = False
+            numStripes = 1
+        self.changes = [collections.OrderedDict() for i in range(numStripes)]
+        self.sequences = [0] * numStripes
+        self.checkpoints = weakref.WeakKeyDictionary()
+        self.checkpointsLock = threading.Lock()
+        self.undecoded = None
+        self.borrowed = False
         super(Pool, self).__init__(value, shared, rollback, source)
 
     def __repr__(self):
@@ -571,35 +743,227 @@ class Pool(PersistentStorageItem):
             contents = contents[:27] + "..."
         return "Pool(" + ("shared, " if self.shared else "") + ("rollback, " if self.rollback else "") + contents + ")"
 
-    def update(self, state, scope, path, to, init, arrayErrCode, mapErrCode, fcnName, pos):
-        result = None
+    def deferDecoding(self, undecoded, decoder):
+        """Hold items back as JSON, decoding each one when its key is first accessed (the "pool.init.lazy" option).
 
-        head, tail = path[0], path[1:]
+        :type undecoded: dict from string to Pythonized JSON
+        :param undecoded: initial items that have not been decoded yet
+        :type decoder: callable
+        :param decoder: decoder for one item (see ``poie.datatype.compileJsonDecoder``)
+        """
+        self.undecoded = undecoded
+        self.decoder = decoder
+
+    def stripeLock(self, index):
+        """Get the lock of stripe ``index``, or ``None`` if the pool is not shared."""
+        if self.shared:
+            return self.locks.stripes[index]
+        else:
+            return None
+
+    def recordChange(self, key):
+        """Record that ``key`` has been updated or deleted (called while holding its stripe lock, if shared)."""
+        index = self.locks.index(key) if self.shared else 0
+        changes = self.changes[index]
+        sequence = self.sequences[index] + 1
+        changes[key] = sequence
+        changes.move_to_end(key)
+        # the new sequence number is only visible to mark after the change is in the log
+        self.sequences[index] = sequence
+
+    def mark(self):
+        """Get the current sequence number of each stripe, as a checkpoint that covers every change recorded so far.
+
+        :rtype: tuple of int
+        :return: one sequence number per stripe
+        """
+        return tuple(self.sequences)
 
+    def changedSince(self, mark):
+        """Find the keys that have been updated or deleted since a checkpoint.
+
+        :type mark: tuple of int
+        :param mark: ``mark`` at the checkpoint
+        :rtype: (list of strings, tuple of int)
+        :return: changed keys (oldest change first within each stripe) and the current ``mark``, to pass to the next call
+        """
+        keys = []
+        newMark = []
+        for index, changes in enumerate(self.changes):
+            lock = self.stripeLock(index)
+            if lock is not None:
+                lock.acquire()
+            try:
+                stripeKeys = []
+                for key in reversed(changes):
+                    if changes[key] <= mark[index]:
+                        break
+                    stripeKeys.append(key)
+                stripeKeys.reverse()
+                keys.extend(stripeKeys)
+                newMark.append(self.sequences[index])
+            finally:
+                if lock is not None:
+                    lock.release()
+        return keys, tuple(newMark)
+
+    def checkpointed(self, owner, mark):
+        """Record that ``owner`` (an engine instance) has seen every change up to ``mark`` and drop the changes that every owner has seen.
+
+        Owners are held by weak reference, so an instance that is garbage-collected no longer holds back the logs.
+
+        :type owner: ``poie.genpy.PFAEngine``
+        :param owner: engine instance whose checkpoint this is
+        :type mark: tuple of int
+        :param mark: sequence number of each stripe at the checkpoint (see ``mark``)
+        """
+        self.checkpointsLock.acquire()
+        try:
+            self.checkpoints[owner] = mark
+            oldest = [min(x) for x in zip(*self.checkpoints.values())]
+        finally:
+            self.checkpointsLock.release()
+
+        for index, changes in enumerate(self.changes):
+            if len(changes) == 0 or next(iter(changes.values())) > oldest[index]:
+                continue
+            lock = self.stripeLock(index)
+            if lock is not None:
+                lock.acquire()
+            try:
+                while len(changes) > 0 and next(iter(changes.values())) <= oldest[index]:
+                    changes.popitem(last=False)
+            finally:
+                if lock is not None:
+                    lock.release()
+
+    def own(self):
+        """Copy ``value`` and any items that have not been decoded yet if they are ``borrowed``, so that they can be modified without affecting anything else."""
+        if self.borrowed:
+            self.value = dict(self.value)
+            if self.undecoded is not None:
+                self.undecoded = dict(self.undecoded)
+            self.borrowed = False
+
+    def restoreItem(self, key, value, delete=False):
+        """Replace or (if ``delete``) remove one item from a snapshot, counting it as an update."""
+        if self.shared:
+            lock = self.locks.stripe(key)
+            lock.acquire()
+        try:
+            self.own()
+            if self.undecoded is not None:
+                self.undecoded.pop(key, None)
+            if delete:
+                self.value.pop(key, None)
+            else:
+                self.value[key] = value
+            self.recordChange(key)
+        finally:
+            if self.shared:
+                lock.release()
+
+    def restoreEmpty(self):
+        """Remove all items before restoring a full snapshot, counting each removal as an update."""
         if self.shared:
-            self.locklock.acquire()
-            if head in self.locks:
-                self.locks[head].acquire()
+            # stripes are always taken in index order, so this can't deadlock with another restore
+            for lock in self.locks.stripes:
+                lock.acquire()
+        try:
+            keys = set(self.value)
+            if self.undecoded is not None:
+                keys.update(self.undecoded)
+            self.value = {}
+            self.undecoded = None
+            self.borrowed = False
+            for key in keys:
+                self.recordChange(key)
+        finally:
+            if self.shared:
+                for lock in reversed(self.locks.stripes):
+                    lock.release()
+
+    def decodeItem(self, key):
+        """Make sure that the item at ``key`` (if any) has been decoded into ``value``."""
+        if key not in self.value and key in self.undecoded:
+            if self.shared:
+                lock = self.locks.stripe(key)
+                lock.acquire()
+                try:
+                    if key not in self.value and key in self.undecoded:
+                        self.value[key] = self.decoder(self.undecoded[key])
+                finally:
+                    lock.release()
             else:
-                self.locks[head] = threading.Lock()
-                self.locks[head].acquire()
-            self.locklock.release()
+                self.value[key] = self.decoder(self.undecoded[key])
+
+    def decodeAll(self):
+        """Decode every item that is still held back by ``deferDecoding``."""
+        if self.undecoded is not None:
+            for key in list(self.undecoded.keys()):
+                self.decodeItem(key)
+
+    def get(self, path, arrayErrCode, mapErrCode, fcnName, pos):
+        if self.undecoded is not None:
+            self.decodeItem(path[0])
+        if self.readerWriter:
+            lock = self.locks.stripe(path[0])
+            lock.acquireRead()
+            try:
+                return get(self.value, path, arrayErrCode, mapErrCode, fcnName, pos)
+            finally:
+                lock.releaseRead()
+        else:
+            return get(self.value, path, arrayErrCode, mapErrCode, fcnName, pos)
 
-            if head not in self.value:
-                self.value[head] = init
-            self.value[head] = update(state, scope, self.value[head], tail, to, arrayErrCode, mapErrCode, fcnName, pos)
+    def update(self, state, scope, path, to, init, arrayErrCode, mapErrCode, fcnName, pos):
+        result = None
 
-            result = self.value[head]
-            self.locks[head].release()
+        head, tail = path[0], path[1:]
+
+        if self.undecoded is not None:
+            self.decodeItem(head)
+
+        if self.shared:
+            lock = self.locks.stripe(head)
+            lock.acquire()
+            try:
+                if head not in self.value:
+                    self.value[head] = init
+                self.value[head] = update(state, scope, self.value[head], tail, to, arrayErrCode, mapErrCode, fcnName, pos)
+                result = self.value[head]
+                self.recordChange(head)
+            finally:
+                lock.release()
 
         else:
+            self.own()
             if head not in self.value:
                 self.value[head] = init
             self.value[head] = update(state, scope, self.value[head], tail, to, arrayErrCode, mapErrCode, fcnName, pos)
             result = self.value[head]
+            self.recordChange(head)
 
         return result
 
+    def delete(self, item):
+        if self.shared:
+            lock = self.locks.stripe(item)
+            lock.acquire()
+            try:
+                self.value.pop(item, None)
+                if self.undecoded is not None:
+                    self.undecoded.pop(item, None)
+                self.recordChange(item)
+            finally:
+                lock.release()
+        else:
+            self.own()
+            self.value.pop(item, None)
+            if self.undecoded is not None:
+                self.undecoded.pop(item, None)
+            self.recordChange(item)
+
     def maybeSaveBackup(self):
         if self.rollback:
             self.oldvalue = dict(self.value)
@@ -1486,19 +1850,84 @@ class PFAEngine(object):
         exec(code, sandbox)
         cls = [x for x in list(sandbox.values()) if getattr(x, "__bases__", None) == (PFAEngine,)][0]
         cls.parser = context.parser
+        cls.generatedCode = code
 
         if sharedState is None:
             sharedState = SharedState()
 
+        # cells and pools that are never written can share one decoded initial value among all instances
+        class WritesState(object):
+            def isDefinedAt(self, ast):
+                return isinstance(ast, (CellTo, PoolTo, PoolDel))
+            def __call__(self, ast):
+                if isinstance(ast, CellTo):
+                    return ("cell", ast.cell)
+                else:
+                    return ("pool", ast.pool)
+        written = set(engineConfig.collect(WritesState()))
+
+        def poolInitializer(poolConfig):
+            if isinstance(poolConfig.init, DecodedInit):
+                # already decoded by the streaming reader
+                return poolConfig.init.value, None
+            decodeItem = poie.datatype.compileJsonDecoder(poolConfig.avroType)
+            if engineOptions.pool_init_lazy and not poolConfig.rollback and not callable(poolConfig.init):
+                # keep the items serialized and parse each one only when its key is first accessed
+                return poolConfig.init, lambda x: decodeItem(json.loads(x))
+            initJsonNode = poolConfig.initJsonNode
+            if not isinstance(initJsonNode, dict):
+                raise PFAInitializationException("pool init must be a JSON object, not " + json.dumps(initJsonNode))
+            return initJsonNode, decodeItem
+
+        def makePool(poolConfig, init, decodeItem, value=None, copyInit=True):
+            if value is None and decodeItem is None:
+                value = dict(init) if copyInit else init
+            pool = Pool({} if value is None else value, poolConfig.shared, poolConfig.rollback, poolConfig.source, sharedState.lockManager)
+            if decodeItem is None:
+                pass
+            elif engineOptions.pool_init_lazy and not poolConfig.rollback:
+                pool.deferDecoding(dict(init) if copyInit else init, decodeItem)
+            elif value is None:
+                for key, item in init.items():
+                    pool.value[key] = decodeItem(item)
+            pool.borrowed = not copyInit
+            return pool
+
+        def cellInitializer(cellConfig):
+            if isinstance(cellConfig.init, DecodedInit):
+                # cell updates replace the value rather than modifying it, so it can be shared as-is
+                return (lambda x: x), cellConfig.init.value
+            return poie.datatype.compileJsonDecoder(cellConfig.avroType), cellConfig.initJsonNode
+
         for cellName, cellConfig in list(engineConfig.cells.items()):
             if cellConfig.shared and cellName not in sharedState.cells:
-                value = poie.datatype.jsonDecoder(cellConfig.avroType, cellConfig.initJsonNode)
-                sharedState.cells[cellName] = Cell(value, cellConfig.shared, cellConfig.rollback, cellConfig.source)
+                decode, initJsonNode = cellInitializer(cellConfig)
+                value = decode(initJsonNode)
+                sharedState.cells[cellName] = Cell(value, cellConfig.shared, cellConfig.rollback, cellConfig.source, sharedState.lockManager)
 
         for poolName, poolConfig in list(engineConfig.pools.items()):
             if poolConfig.shared and poolName not in sharedState.pools:
-                value = poie.datatype.jsonDecoder(poie.datatype.AvroMap(poolConfig.avroType), poolConfig.initJsonNode)
-                sharedState.pools[poolName] = Pool(value, poolConfig.shared, poolConfig.rollback, poolConfig.source)
+                init, decodeItem = poolInitializer(poolConfig)
+                # other engines with the same sharedState may write to it, so it can't borrow this engine's init
+                sharedState.pools[poolName] = makePool(poolConfig, init, decodeItem)
+
+        privateCells = {}
+        for cellName, cellConfig in list(engineConfig.cells.items()):
+            if not cellConfig.shared:
+                decode, initJsonNode = cellInitializer(cellConfig)
+                if ("cell", cellName) in written:
+                    privateCells[cellName] = (decode, initJsonNode, None)
+                else:
+                    privateCells[cellName] = (None, None, decode(initJsonNode))
+
+        privatePools = {}
+        for poolName, poolConfig in list(engineConfig.pools.items()):
+            if not poolConfig.shared:
+                init, decodeItem = poolInitializer(poolConfig)
+                if ("pool", poolName) in written:
+                    privatePools[poolName] = (init, decodeItem, None)
+                else:
+                    privatePools[poolName] = (init, decodeItem, makePool(poolConfig, init, decodeItem, copyInit=False).value)
 
         out = []
         for index in range(multiplicity):
@@ -1507,13 +1936,15 @@ class PFAEngine(object):
 
             for cellName, cellConfig in list(engineConfig.cells.items()):
                 if not cellConfig.shared:
-                    value = poie.datatype.jsonDecoder(cellConfig.avroType, cellConfig.initJsonNode)
-                    cells[cellName] = Cell(value, cellConfig.shared, cellConfig.rollback, cellConfig.source)
+                    decode, initJsonNode, value = privateCells[cellName]
+                    if decode is not None:
+                        value = decode(initJsonNode)
+                    cells[cellName] = Cell(value, cellConfig.shared, cellConfig.rollback, cellConfig.source, sharedState.lockManager)
 
             for poolName, poolConfig in list(engineConfig.pools.items()):
                 if not poolConfig.shared:
-                    value = poie.datatype.jsonDecoder(poie.datatype.AvroMap(poolConfig.avroType), poolConfig.initJsonNode)
-                    pools[poolName] = Pool(value, poolConfig.shared, poolConfig.rollback, poolConfig.source)
+                    init, decodeItem, value = privatePools[poolName]
+                    pools[poolName] = makePool(poolConfig, init, decodeItem, value, copyInit=(value is None))
 
             if engineConfig.method == Method.FOLD:
                 zero = poie.datatype.jsonDecoder(engineConfig.output, json.loads(engineConfig.zero))
@@ -1529,13 +1960,14 @@ class PFAEngine(object):
 
             engine = cls(cells, pools, engineConfig, engineOptions, genericLog, genericEmit, zero, index, rand)
 
-            f = dict(functionTable.functions)
+            f = functionTable.functions.copy()
             if engineConfig.method == Method.EMIT:
                 f["emit"] = FakeEmitForExecution(engine)
             engine.f = f
             engine.config = engineConfig
 
             checkForDeadlock(engineConfig, engine)
+            engine.markCheckpoint()
             engine.initialize()
 
             out.append(engine)
@@ -1565,6 +1997,29 @@ class PFAEngine(object):
         """
         return PFAEngine.fromAst(poie.reader.jsonToAst(src), options, version, sharedState, multiplicity, style, debug)
 
+    @staticmethod
+    def fromJsonStream(src, options=None, version=None, sharedState=None, multiplicity=1, style="pure", debug=False):
+        """Create a collection of instances of this scoring engine from a JSON-formatted PFA stream, without loading the whole document (see ``poie.reader.jsonStreamToAst``).
+
+        :type src: open file
+        :param src: a PFA document in JSON-serialized form, read incrementally
+        :type options: dict of Pythonized JSON
+        :param options: options that override those found in the PFA document
+        :type version: string
+        :param version: PFA version number as a "major.minor.release" string
+        :type sharedState: pypoie.genpy.SharedState
+        :param sharedState: external state for shared cells and pools to initialize from and modify; pass ``None`` to limit sharing to instances of a single PFA file
+        :type multiplicity: positive integer
+        :param multiplicity: number of instances to return (default is 1; a single-item collection)
+        :type style: string
+        :param style: style of scoring engine; only one currently supported: "pure" for pure-Python
+        :type debug: bool
+        :param debug: if ``True``, print the Python code generated by this PFA document before evaluating
+        :rtype: PFAEngine
+        :return: a list of scoring engine instances
+        """
+        return PFAEngine.fromAst(poie.reader.jsonStreamToAst(src), options, version, sharedState, multiplicity, style, debug)
+
     @staticmethod
     def fromYaml(src, options=None, version=None, sharedState=None, multiplicity=1, style="pure", debug=False):
         """Create a collection of instances of this scoring engine from a YAML-formatted PFA file.
@@ -1611,6 +2066,7 @@ class PFAEngine(object):
         :rtype: PFAEngine
         :return: a list of scoring engine instances
         """
+        from poie.pmml.reader import pmmlToAst
         return PFAEngine.fromAst(pmmlToAst(src, pmmlOptions), pfaOptions, version, sharedState, multiplicity, style, debug)
 
     def snapshot(self):
@@ -1619,6 +2075,9 @@ class PFAEngine(object):
         Note that you can call ``toJson`` on the ``EngineConfig`` to get a string that can be written to a PFA file.
         """
 
+        for pool in list(self.pools.values()):
+            pool.decodeAll()
+
         newCells = dict((k, AstCell(self.config.cells[k].avroPlaceholder, json.dumps(v.value), v.shared, v.rollback, v.source)) for k, v in list(self.cells.items()))
         newPools = dict((k, AstPool(self.config.pools[k].avroPlaceholder, dict((kk, json.dumps(vv)) for kk, vv in list(v.value.items())), v.shared, v.rollback, v.source)) for k, v in list(self.pools.items()))
 
@@ -1641,6 +2100,122 @@ class PFAEngine(object):
             self.config.metadata,
             self.config.options)
 
+    def markCheckpoint(self):
+        """Record the current version of every cell and pool as this instance's last checkpoint (see ``writeSnapshot``)."""
+        self.setCheckpointMarks(dict((cellName, cell.version) for cellName, cell in self.cells.items()),
+                                dict((poolName, pool.mark()) for poolName, pool in self.pools.items()))
+
+    def setCheckpointMarks(self, cellVersions, poolMarks):
+        """Make ``cellVersions`` and ``poolMarks`` this instance's last checkpoint and tell each pool, so that it can drop changes that every instance has seen."""
+        self.checkpointMarks = (cellVersions, poolMarks)
+        for poolName, mark in poolMarks.items():
+            self.pools[poolName].checkpointed(self, mark)
+
+    def writeSnapshot(self, outputStream, delta=False):
+        """Write the state of all cells and pools to a stream as JSON lines, one cell or pool item per line.
+
+        Unlike ``snapshot``, this never builds the whole document in memory: each cell value and pool item is serialized and written on its own. Every call is a checkpoint for this instance, so that its next call with ``delta=True`` only writes cells and pool items that were updated (or pool items that were deleted) after this one. Checkpoints are tracked per instance: instances that share cells and pools each see every change in their own deltas, and a change made while a snapshot is being written is never lost, though it may be written twice.
+
+        The first line is a header, ``{"snapshot": "full"}`` or ``{"snapshot": "delta"}`` (with the engine name, instance, and ``actionsFinished``). The rest are ``{"cell": name, "value": value}``, ``{"pool": name, "key": key, "value": value}``, or ``{"pool": name, "key": key, "delete": true}``.
+
+        :type outputStream: file-like object
+        :param outputStream: text stream to write to
+        :type delta: bool
+        :param delta: if ``True``, only write what changed since this instance's last checkpoint; otherwise, write everything
+        :rtype: int
+        :return: number of cell values and pool items written (not counting the header)
+        """
+
+        outputStream.write(json.dumps({"snapshot": "delta" if delta else "full", "name": self.config.name, "instance": self.instance, "actionsFinished": self.actionsFinished}) + "\n")
+        count = 0
+        cellVersions, poolMarks = self.checkpointMarks
+        newCellVersions = {}
+        newPoolMarks = {}
+
+        for cellName, cell in list(self.cells.items()):
+            value, version = cell.checkpoint()
+            newCellVersions[cellName] = version
+            if not delta or version != cellVersions.get(cellName):
+                outputStream.write(json.dumps({"cell": cellName, "value": poie.datatype.jsonEncoder(self.config.cells[cellName].avroType, value)}) + "\n")
+                count += 1
+
+        for poolName, pool in list(self.pools.items()):
+            avroType = self.config.pools[poolName].avroType
+            if delta:
+                keys, newPoolMarks[poolName] = pool.changedSince(poolMarks[poolName])
+            else:
+                # anything that changes after this point has a higher sequence number and will be in the next delta
+                newPoolMarks[poolName] = pool.mark()
+                pool.decodeAll()
+                keys = list(pool.value.keys())
+
+            for key in keys:
+                try:
+                    value = pool.value[key]
+                except KeyError:
+                    if delta:
+                        outputStream.write(json.dumps({"pool": poolName, "key": key, "delete": True}) + "\n")
+                        count += 1
+                else:
+                    outputStream.write(json.dumps({"pool": poolName, "key": key, "value": poie.datatype.jsonEncoder(avroType, value)}) + "\n")
+                    count += 1
+
+        self.setCheckpointMarks(newCellVersions, newPoolMarks)
+        return count
+
+    def restoreSnapshot(self, inputStream):
+        """Load the state of cells and pools from a stream written by ``writeSnapshot``.
+
+        Replay a full snapshot followed by its deltas (in the order they were written) to reconstruct the state at the last delta. A full snapshot replaces the contents of every pool; a delta only changes the items it lists. Lines are read and decoded one at a time.
+
+        Restoring is a checkpoint for this instance (what was restored will not be in its next delta), but other instances that share the restored cells and pools see the restored values as updates.
+
+        :type inputStream: file-like object or iterable of strings
+        :param inputStream: JSON lines written by ``writeSnapshot``
+        :rtype: int
+        :return: number of cell values and pool items restored
+        """
+
+        delta = None
+        count = 0
+
+        for line in inputStream:
+            if line.strip() == "":
+                continue
+            obj = json.loads(line)
+
+            if "snapshot" in obj:
+                delta = (obj["snapshot"] == "delta")
+                if not delta:
+                    for pool in list(self.pools.values()):
+                        pool.restoreEmpty()
+
+            elif delta is None:
+                raise PFAInitializationException("snapshot stream must begin with a {\"snapshot\": ...} header")
+
+            elif "cell" in obj:
+                cellName = obj["cell"]
+                if cellName not in self.cells:
+                    raise PFAInitializationException("snapshot refers to unknown cell \"{0}\"".format(cellName))
+                self.cells[cellName].restore(poie.datatype.jsonDecoder(self.config.cells[cellName].avroType, obj["value"]))
+                count += 1
+
+            elif "pool" in obj:
+                poolName = obj["pool"]
+                if poolName not in self.pools:
+                    raise PFAInitializationException("snapshot refers to unknown pool \"{0}\"".format(poolName))
+                if obj.get("delete", False):
+                    self.pools[poolName].restoreItem(obj["key"], None, True)
+                else:
+                    self.pools[poolName].restoreItem(obj["key"], poie.datatype.jsonDecoder(self.config.pools[poolName].avroType, obj["value"]))
+                count += 1
+
+            else:
+                raise PFAInitializationException("unrecognized line in snapshot stream: " + line.strip())
+
+        self.markCheckpoint()
+        return count
+
     def calledBy(self, fcnName, exclude=None):
         """Determine which functions are called by ``fcnName`` by traversing the ``callGraph`` backward.
 
@@ -1731,6 +2306,8 @@ class PFAEngine(object):
 
         :type inputStream: open filehandle
         :param inputStream: serialized data
+        :type interpreter: string
+        :param interpreter: "avro" for the generic Avro library reader, "fastavro" or "correct-fastavro" for the fastavro library, or "compiled" for ``poie.avrocodec.AvroDataFileReader``, which decodes whole blocks with a decoder compiled from ``config.input``
         :rtype: ``avro.datafile.DataFileReader``
         :return: generator of objects suitable for the ``action`` method
         """
@@ -1742,21 +2319,30 @@ class PFAEngine(object):
             return fastavro.reader(inputStream)
         elif interpreter == "correct-fastavro":
             return FastAvroCorrector(inputStream, self.config.input)
+        elif interpreter == "compiled":
+            return poie.avrocodec.AvroDataFileReader(inputStream, self.config.input)
         else:
-            raise ValueError("interpreter must be one of \"avro\", \"fastavro\", and \"correct-fastavro\" (which corrects fastavro's handling of Unicode strings)")
+            raise ValueError("interpreter must be one of \"avro\", \"fastavro\", \"correct-fastavro\" (which corrects fastavro's handling of Unicode strings), and \"compiled\"")
 
-    def avroOutputDataFileWriter(self, fileName):
+    def avroOutputDataFileWriter(self, fileName, interpreter="avro"):
         """Create an output stream for Avro-serializing scoring engine output.
 
         Return values from the ``action`` method (or outputs captured by an ``emit`` callback) are suitable for writing to this stream.
 
         :type fileName: string
         :param fileName: name of the file that will be overwritten by Avro bytes
+        :type interpreter: string
+        :param interpreter: "avro" for the generic Avro library writer or "compiled" for ``poie.avrocodec.AvroDataFileWriter``, which encodes with an encoder compiled from ``config.output``
         :rtype: ``avro.datafile.DataFileWriter``
         :return: an output stream with an ``append`` method for appending output data objects
         """
 
-        return DataFileWriter(open(fileName, "w"), DatumWriter(), self.config.output.schema)
+        if interpreter == "avro":
+            return DataFileWriter(open(fileName, "wb"), DatumWriter(), self.config.output.schema)
+        elif interpreter == "compiled":
+            return poie.avrocodec.AvroDataFileWriter(open(fileName, "wb"), self.config.output)
+        else:
+            raise ValueError("interpreter must be one of \"avro\" and \"compiled\"")
 
 class FastAvroCorrector(object):
     """The fastavro library reads Avro strings as non-Unicode and doesn't tag unions. This wrapper class corrects it."""
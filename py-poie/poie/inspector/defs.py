@@ -28,6 +28,7 @@ import glob
 import math
 
 import poie.inspector.parser as parser
+from poie.inspector.jsonindex import JsonIndex
 from poie.reader import jsonToAst
 from poie.genpy import PFAEngine
 from poie.errors import AvroException, SchemaParseException, PFAException
@@ -342,16 +343,41 @@ class Model(object):
     Lazy-evaluates an ``engineConfig`` member the first time it is requested. This is a poie.pfaast.EngineConfig representing the abstract syntax tree of the PFA file. If the PFA file contains an error, attempting to access the ``engineConfig`` property yields an exception (poie.errors.AvroException, poie.errors.SchemaParseException, or poie.errors.PFAException).
 
     Lazy-evaluates an ``engine`` member the first time it is requested. This is a poie.genpy.PFAEngine representing an executable scoring engine. If the PFA file contains an error, attempting to access the ``engineConfig`` property yields an exception (poie.errors.AvroException, poie.errors.SchemaParseException, or poie.errors.PFAException).
+
+    Lazy-evaluates an ``index`` member the first time it is requested. This is a poie.inspector.jsonindex.JsonIndex of ``obj``, read from next to the original file if ``fileName`` is given (the user opted in to saving indexes), the index was saved there, and the file has not changed.
     """
 
-    def __init__(self, obj):
-        self.obj = obj
+    def __init__(self, obj, fileName=None):
+        self._obj = obj
+        self.fileName = fileName
         self._engineConfig = None
         self._engine = None
+        self._index = None
+
+    @property
+    def obj(self):
+        return self._obj
+
+    @obj.setter
+    def obj(self, obj):
+        self._obj = obj
+        self.reset()
 
     def reset(self):
         self._engineConfig = None
         self._engine = None
+        # obj has been modified, so an index saved with the file no longer applies
+        self.fileName = None
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            if self.fileName is not None:
+                self._index = JsonIndex.load(self.fileName, self._obj)
+            if self._index is None:
+                self._index = JsonIndex.build(self._obj)
+        return self._index
 
     @property
     def engineConfig(self):
@@ -43,6 +43,17 @@ def depthGreaterThan(obj, target):
     else:
         return target < 0
         
+def extpath(items):
+    """Convert extraction items that have already been checked by ``extaction`` into a path for poie.producer.tools.get or poie.inspector.jsonindex.JsonIndex.
+
+    :type items: (integer, pypoie.inspector.parser.FilePath)
+    :param items: extraction path (everything between square brakets)
+    :rtype: list of strings and integers
+    :return: path
+    """
+
+    return [item.num if isinstance(item, parser.Integer) else item.text for item in items]
+
 class LookCommand(Command):
     """The 'json look' command in pfainspector."""
 
@@ -116,26 +127,31 @@ class LookCommand(Command):
             if len(args) == 1 and isinstance(args[0], parser.Word):
                 if args[0].text not in self.mode.pfaFiles:
                     raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
-                node = self.mode.pfaFiles[args[0].text].obj
+                model = self.mode.pfaFiles[args[0].text]
+                node = model.obj
+                path = []
 
             elif len(args) == 1 and isinstance(args[0], parser.Extract):
                 if args[0].text not in self.mode.pfaFiles:
                     raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
-                node = self.mode.pfaFiles[args[0].text].obj
+                model = self.mode.pfaFiles[args[0].text]
+                node = model.obj
                 items = args[0].items
                 node = extaction(args[0], node, items)
+                path = extpath(items)
 
             else:
                 self.syntaxError()
 
-            if not depthGreaterThan(node, 0):
+            depth = model.index.depth(path)
+            if depth <= 0:
                 print(json.dumps(node))
 
             else:
                 content = io.StringIO()
-                if not depthGreaterThan(node, 1):
+                if depth <= 1:
                     t.look(node, maxDepth=options["maxDepth"], indexWidth=options["indexWidth"], inlineDepth=0, stream=content)
-                elif not depthGreaterThan(node, 2):
+                elif depth <= 2:
                     t.look(node, maxDepth=options["maxDepth"], indexWidth=options["indexWidth"], inlineDepth=1, stream=content)
                 else:
                     t.look(node, maxDepth=options["maxDepth"], indexWidth=options["indexWidth"], inlineDepth=2, stream=content)
@@ -204,20 +220,24 @@ class CountCommand(Command):
             if len(args) == 2 and isinstance(args[0], parser.Word):
                 if args[0].text not in self.mode.pfaFiles:
                     raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
-                node = self.mode.pfaFiles[args[0].text].obj
+                model = self.mode.pfaFiles[args[0].text]
+                node = model.obj
+                path = []
 
             elif len(args) == 2 and isinstance(args[0], parser.Extract):
                 if args[0].text not in self.mode.pfaFiles:
                     raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
-                node = self.mode.pfaFiles[args[0].text].obj
+                model = self.mode.pfaFiles[args[0].text]
+                node = model.obj
                 items = args[0].items
                 node = extaction(args[0], node, items)
+                path = extpath(items)
 
             else:
                 self.syntaxError()
 
             regex = args[-1].regex()
-            print("{0} matches".format(t.count(regex, node)))
+            print("{0} matches".format(model.index.count(regex, path)))
 
 class IndexCommand(Command):
     """The 'json index' command in pfainspector."""
@@ -271,14 +291,18 @@ class IndexCommand(Command):
             if len(args) == 2 and isinstance(args[0], parser.Word):
                 if args[0].text not in self.mode.pfaFiles:
                     raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
-                node = self.mode.pfaFiles[args[0].text].obj
+                model = self.mode.pfaFiles[args[0].text]
+                node = model.obj
+                path = []
 
             elif len(args) == 2 and isinstance(args[0], parser.Extract):
                 if args[0].text not in self.mode.pfaFiles:
                     raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
-                node = self.mode.pfaFiles[args[0].text].obj
+                model = self.mode.pfaFiles[args[0].text]
+                node = model.obj
                 items = args[0].items
                 node = extaction(args[0], node, items)
+                path = extpath(items)
 
             else:
                 self.syntaxError()
@@ -295,7 +319,7 @@ class IndexCommand(Command):
 
             print("Indexes that match the pattern:")
             count = 0
-            for index in t.indexes(regex, node):
+            for index in model.index.indexes(regex, path):
                 print("    [" + ", ".join(display(i) for i in index) + "]")
                 count += 1
             if count == 0:
@@ -374,14 +398,18 @@ class FindCommand(Command):
             if len(args) == 2 and isinstance(args[0], parser.Word):
                 if args[0].text not in self.mode.pfaFiles:
                     raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
-                node = self.mode.pfaFiles[args[0].text].obj
+                model = self.mode.pfaFiles[args[0].text]
+                node = model.obj
+                path = []
 
             elif len(args) == 2 and isinstance(args[0], parser.Extract):
                 if args[0].text not in self.mode.pfaFiles:
                     raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
-                node = self.mode.pfaFiles[args[0].text].obj
+                model = self.mode.pfaFiles[args[0].text]
+                node = model.obj
                 items = args[0].items
                 node = extaction(args[0], node, items)
+                path = extpath(items)
 
             else:
                 self.syntaxError()
@@ -398,16 +426,16 @@ class FindCommand(Command):
 
             content = io.StringIO()
             count = 0
-            for index in t.indexes(regex, node):
+            for index, depth in model.index.depthsOfMatches(regex, path):
                 content.write("At index [" + ", ".join(display(i) for i in index) + "]:\n")
 
                 matched = t.get(node, index)
 
-                if not depthGreaterThan(matched, 0):
+                if depth <= 0:
                     content.write(json.dumps(matched) + "\n")
-                elif not depthGreaterThan(matched, 1):
+                elif depth <= 1:
                     t.look(matched, maxDepth=options["maxDepth"], indexWidth=options["indexWidth"], inlineDepth=0, stream=content)
-                elif not depthGreaterThan(matched, 2):
+                elif depth <= 2:
                     t.look(matched, maxDepth=options["maxDepth"], indexWidth=options["indexWidth"], inlineDepth=1, stream=content)
                 else:
                     t.look(matched, maxDepth=options["maxDepth"], indexWidth=options["indexWidth"], inlineDepth=2, stream=content)
@@ -429,6 +457,97 @@ class FindCommand(Command):
                         raise
                 pipewait(proc)
 
+class StatsCommand(Command):
+    """The 'json stats' command in pfainspector."""
+
+    def __init__(self, mode):
+        self.name = "stats"
+        self.syntax = "stats <name> [top=10]"
+        self.help = "summarize the structure of a PFA document or subexpression: size, depth, node types, and most common object shapes\n    " + self.syntax
+        self.mode = mode
+
+    def complete(self, established, active):
+        """Handle tab-complete for this command's arguments.
+
+        :type established: string
+        :param established: part of the text that has been established
+        :type active: string
+        :param active: part of the text to be completed
+        :rtype: list of strings
+        :return: potential completions
+        """
+
+        options = ["top="]
+        words = getcomplete(established)
+
+        if len(words) == 0:
+            if active in self.mode.pfaFiles:
+                return [active + "["]
+            else:
+                return sorted(x for x in self.mode.pfaFiles if x.startswith(active))
+
+        elif len(words) == 1 and isinstance(words[0], parser.Extract) and words[0].partial:
+            if words[0].text in self.mode.pfaFiles:
+                return [x for x in extcomplete(self.mode.pfaFiles[words[0].text].obj, words[0].items) if x.startswith(active)]
+            else:
+                return []
+
+        elif not words[-1].partial:
+            return [x for x in options if x.startswith(active)]
+
+        else:
+            return []
+
+    def action(self, args):
+        """Perform the action associated with this command.
+
+        :type args: list of poie.inspector.parser.Ast
+        :param args: arguments passed to the command
+        :rtype: ``None``
+        :return: nothing; results must be printed to the screen
+        """
+
+        if len(args) == 1 and args[0] == parser.Word("help"):
+            print(self.help)
+        else:
+            options = {"top": 10}
+            while len(args) > 0 and isinstance(args[-1], parser.Option):
+                opt = args.pop()
+                if opt.word.text in ["top"]:
+                    try:
+                        options[opt.word.text] = opt.value.value()
+                    except TypeError:
+                        raise InspectorError("illegal value for {0}".format(opt.word.text))
+                else:
+                    raise InspectorError("option {0} unrecognized".format(opt.word.text))
+
+            if not isinstance(options["top"], int) or options["top"] < 0:
+                raise InspectorError("top must be a non-negative integer")
+
+            if len(args) == 1 and isinstance(args[0], parser.Word):
+                if args[0].text not in self.mode.pfaFiles:
+                    raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
+                model = self.mode.pfaFiles[args[0].text]
+                path = []
+
+            elif len(args) == 1 and isinstance(args[0], parser.Extract):
+                if args[0].text not in self.mode.pfaFiles:
+                    raise InspectorError("no PFA document named \"{0}\" in memory (try 'load <file> as {1}')".format(args[0].text, args[0].text))
+                model = self.mode.pfaFiles[args[0].text]
+                extaction(args[0], model.obj, args[0].items)
+                path = extpath(args[0].items)
+
+            else:
+                self.syntaxError()
+
+            stats = model.index.statistics(path)
+            print("{0} subexpressions, depth {1}".format(stats["size"], stats["depth"]))
+            print("    {0} objects, {1} arrays, {2} strings, {3} other scalars".format(stats["objects"], stats["arrays"], stats["strings"], stats["scalars"]))
+            if options["top"] > 0 and len(stats["shapes"]) > 0:
+                print("Most common object keys:")
+                for number, keys in stats["shapes"][:options["top"]]:
+                    print("    {0:>10d}  {{{1}}}".format(number, ", ".join(json.dumps(x) for x in keys)))
+
 class ChangeCommand(Command):
     """The 'json change' command in pfainspector."""
 
@@ -599,5 +718,6 @@ class JsonGadget(Gadget):
             CountCommand(mode),
             IndexCommand(mode),
             FindCommand(mode),
+            StatsCommand(mode),
             ChangeCommand(mode)
             ])
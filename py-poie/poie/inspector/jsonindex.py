@@ -0,0 +1,429 @@
+
+# Copyright (C) 2021 Data Mining Group
+#
+# This file is part of POIE
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import heapq
+import json
+import os
+from array import array
+
+import poie.producer.tools as t
+
+INDEX_FILE_SUFFIX = ".index"
+INDEX_FILE_VERSION = 3
+
+def _encodeSignature(sig):
+    if isinstance(sig, str):
+        return sig
+    elif sig[0] == "object":
+        return ["object", sorted(sig[1])]
+    else:
+        return list(sig)
+
+def _decodeSignature(node):
+    if isinstance(node, str):
+        return node
+    elif node[0] == "object":
+        return ("object", frozenset(node[1]))
+    elif node[0] == "array":
+        return ("array", int(node[1]))
+    else:
+        return ("scalar",)
+
+def signature(node):
+    """Key under which a subexpression is indexed.
+
+    Objects are keyed by their set of keys (ignoring ``"@"``), arrays by their length, strings by their value, and all other scalars together.
+
+    :type node: Pythonized JSON
+    :param node: subexpression
+    :rtype: hashable
+    :return: index key
+    """
+    if isinstance(node, dict):
+        return ("object", frozenset(k for k in node if k != "@"))
+    elif isinstance(node, (list, tuple)):
+        return ("array", len(node))
+    elif isinstance(node, str):
+        return node
+    else:
+        return ("scalar",)
+
+def _children(node, sortedKeys):
+    if isinstance(node, dict):
+        sortedKeys.append(sorted(node.keys()))
+        return ((k, node[k]) for k in sortedKeys[-1])
+    else:
+        sortedKeys.append(None)
+        return enumerate(node)
+
+class JsonIndex(object):
+    """Index of every subexpression of a JSON document, for answering pfainspector queries without walking the whole document.
+
+    Subexpressions are numbered by ordinal in the order that poie.producer.tools.search visits them: children before their parents and object keys in sorted order. The subexpressions of a node with ordinal ``o`` are therefore exactly the ordinals from ``o - size(o) + 1`` through ``o``, so any query can be restricted to a subtree with two bisections.
+    """
+
+    def __init__(self, obj, parents, keys, sizes, depths, signatures, children, objectKeys):
+        """Create a ``JsonIndex`` from precomputed tables; normally called through ``build`` or ``load``.
+
+        :type obj: Pythonized JSON
+        :param obj: indexed document
+        :type parents: array of integers
+        :param parents: ordinal of each subexpression's parent (``-1`` for the root)
+        :type keys: list of strings, integers, or ``None``
+        :param keys: key or array index of each subexpression in its parent
+        :type sizes: array of integers
+        :param sizes: number of subexpressions in each subtree, including itself
+        :type depths: array of integers
+        :param depths: depth of each subexpression (0 for scalars, 1 for arrays or objects of scalars or empty ones, etc.)
+        :type signatures: dict from index keys to arrays of integers
+        :param signatures: ordinals of the subexpressions with each ``signature``, in increasing order
+        :type children: dict from integers to arrays of integers
+        :param children: ordinals of the elements or values (in sorted key order) of each array or object, by its ordinal
+        :type objectKeys: dict from integers to lists of strings
+        :param objectKeys: sorted keys of each object, by the object's ordinal
+        """
+        self.obj = obj
+        self.parents = parents
+        self.keys = keys
+        self.sizes = sizes
+        self.depths = depths
+        self.signatures = signatures
+        self.children = children
+        self.objectKeys = objectKeys
+
+    @staticmethod
+    def build(obj):
+        """Index a document in a single pass (no recursion, so arbitrarily deep documents are fine).
+
+        :type obj: Pythonized JSON
+        :param obj: document to index
+        :rtype: pypoie.inspector.jsonindex.JsonIndex
+        :return: the index
+        """
+        parents = array("l")
+        keys = []
+        sizes = array("l")
+        depths = array("l")
+        signatures = {}
+        children = {}
+        objectKeys = {}
+
+        def add(node, key, size, depth):
+            ordinal = len(sizes)
+            parents.append(-1)
+            keys.append(key)
+            sizes.append(size)
+            depths.append(depth)
+            sig = signature(node)
+            ordinals = signatures.get(sig)
+            if ordinals is None:
+                ordinals = signatures[sig] = array("l")
+            ordinals.append(ordinal)
+            return ordinal
+
+        if not isinstance(obj, (dict, list, tuple)):
+            add(obj, None, 1, 0)
+            return JsonIndex(obj, parents, keys, sizes, depths, signatures, children, objectKeys)
+
+        sortedKeys = []
+        stack = [(obj, None, _children(obj, sortedKeys), array("l"))]
+        while len(stack) > 0:
+            node, key, nodeChildren, childOrdinals = stack[-1]
+            for childKey, child in nodeChildren:
+                if isinstance(child, (dict, list, tuple)):
+                    stack.append((child, childKey, _children(child, sortedKeys), array("l")))
+                    break
+                else:
+                    childOrdinals.append(add(child, childKey, 1, 0))
+            else:
+                stack.pop()
+                size = 1
+                depth = 1
+                for childOrdinal in childOrdinals:
+                    size += sizes[childOrdinal]
+                    if depths[childOrdinal] + 1 > depth:
+                        depth = depths[childOrdinal] + 1
+                ordinal = add(node, key, size, depth)
+                children[ordinal] = childOrdinals
+                # sortedKeys is a stack parallel to stack: the sorted keys of each node being visited (None for arrays)
+                nodeKeys = sortedKeys.pop()
+                if nodeKeys is not None:
+                    objectKeys[ordinal] = nodeKeys
+                for childOrdinal in childOrdinals:
+                    parents[childOrdinal] = ordinal
+                if len(stack) > 0:
+                    stack[-1][3].append(ordinal)
+
+        return JsonIndex(obj, parents, keys, sizes, depths, signatures, children, objectKeys)
+
+    @staticmethod
+    def indexFileName(fileName):
+        """Name of the file in which the index of ``fileName`` is persisted."""
+        return fileName + INDEX_FILE_SUFFIX
+
+    def save(self, fileName):
+        """Persist this index next to the document it was built from.
+
+        The index is written as plain JSON (never pickled), so reading an index file cannot execute code.
+
+        :type fileName: string
+        :param fileName: name of the document file (not the index file)
+        :rtype: ``None``
+        :return: nothing
+        """
+        stat = os.stat(fileName)
+        with open(self.indexFileName(fileName), "w") as stream:
+            json.dump({"version": INDEX_FILE_VERSION,
+                       "size": stat.st_size,
+                       "mtime": stat.st_mtime_ns,
+                       "parents": self.parents.tolist(),
+                       "keys": self.keys,
+                       "sizes": self.sizes.tolist(),
+                       "depths": self.depths.tolist(),
+                       "signatures": [[_encodeSignature(k), v.tolist()] for k, v in self.signatures.items()],
+                       "children": [[k, v.tolist()] for k, v in self.children.items()],
+                       "objectKeys": [[k, v] for k, v in self.objectKeys.items()]}, stream)
+
+    @staticmethod
+    def load(fileName, obj):
+        """Load a persisted index if it exists and was saved from the document in its current state.
+
+        The index file is only trusted as far as its structure: if it is malformed or inconsistent with ``obj``, it is ignored.
+
+        :type fileName: string
+        :param fileName: name of the document file (not the index file)
+        :type obj: Pythonized JSON
+        :param obj: the document, as loaded from ``fileName``
+        :rtype: pypoie.inspector.jsonindex.JsonIndex or ``None``
+        :return: the index or ``None`` if there is no usable index file
+        """
+        indexFileName = JsonIndex.indexFileName(fileName)
+        if not os.path.exists(indexFileName):
+            return None
+        try:
+            stat = os.stat(fileName)
+            with open(indexFileName) as stream:
+                node = json.load(stream)
+            if not isinstance(node, dict) or node.get("version") != INDEX_FILE_VERSION or node.get("size") != stat.st_size or node.get("mtime") != stat.st_mtime_ns:
+                return None
+            parents = array("l", node["parents"])
+            keys = node["keys"]
+            sizes = array("l", node["sizes"])
+            depths = array("l", node["depths"])
+            signatures = dict((_decodeSignature(k), array("l", v)) for k, v in node["signatures"])
+            children = dict((int(k), array("l", v)) for k, v in node["children"])
+            objectKeys = dict((int(k), list(v)) for k, v in node["objectKeys"])
+        except (IOError, OSError, ValueError, TypeError, KeyError, IndexError, OverflowError):
+            return None
+        if not isinstance(keys, list) or not len(parents) == len(keys) == len(sizes) == len(depths) or len(sizes) == 0 or sizes[-1] != len(sizes):
+            return None
+        numObjects = sum(len(v) for k, v in signatures.items() if isinstance(k, tuple) and k[0] == "object")
+        numArrays = sum(len(v) for k, v in signatures.items() if isinstance(k, tuple) and k[0] == "array")
+        if len(objectKeys) != numObjects or len(children) != numObjects + numArrays or any(len(objectKeys[k]) != len(children.get(k, ())) for k in objectKeys):
+            return None
+        return JsonIndex(obj, parents, keys, sizes, depths, signatures, children, objectKeys)
+
+    @property
+    def root(self):
+        """Ordinal of the whole document."""
+        return len(self.sizes) - 1
+
+    def ordinal(self, index):
+        """Find the ordinal of a subexpression.
+
+        :type index: list of strings and integers
+        :param index: path from the root of the document, as in poie.producer.tools.get
+        :rtype: integer
+        :return: ordinal of the subexpression (``KeyError`` or ``IndexError`` if there is none)
+        """
+        ordinal = self.root
+        for key in index:
+            objectKeys = self.objectKeys.get(ordinal)
+            if objectKeys is not None:
+                position = bisect.bisect_left(objectKeys, key)
+                if position == len(objectKeys) or objectKeys[position] != key:
+                    raise KeyError(key)
+            else:
+                position = key
+            ordinal = self.children[ordinal][position]
+        return ordinal
+
+    def path(self, ordinal, top=None):
+        """Find the path to a subexpression.
+
+        :type ordinal: integer
+        :param ordinal: ordinal of the subexpression
+        :type top: integer or ``None``
+        :param top: ordinal of the subexpression the path should be relative to (``None`` for the root)
+        :rtype: tuple of strings and integers
+        :return: path, as in poie.producer.tools.get
+        """
+        if top is None:
+            top = self.root
+        out = []
+        while ordinal != top:
+            out.append(self.keys[ordinal])
+            ordinal = self.parents[ordinal]
+        out.reverse()
+        return tuple(out)
+
+    def size(self, index=()):
+        """Number of subexpressions at and below ``index``."""
+        return self.sizes[self.ordinal(index)]
+
+    def depth(self, index=()):
+        """Depth of the subexpression at ``index`` (see poie.inspector.jsongadget.depthGreaterThan)."""
+        return self.depths[self.ordinal(index)]
+
+    def candidateKeys(self, pattern):
+        """Index keys of all subexpressions that could match a pattern.
+
+        :type pattern: Pythonized JSON or poie.producer.tools.Matcher
+        :param pattern: pattern as in poie.producer.tools.getmatch
+        :rtype: list of index keys or ``None``
+        :return: index keys or ``None`` if any subexpression could match
+        """
+        if isinstance(pattern, dict):
+            return [("object", frozenset(k for k in pattern if k != "@"))]
+        elif isinstance(pattern, (list, tuple)):
+            return [("array", len(pattern))]
+        elif isinstance(pattern, str):
+            return [pattern]
+        elif pattern is None or isinstance(pattern, (int, float)):
+            return [("scalar",)]
+        elif isinstance(pattern, t.RegEx):
+            return [k for k in self.signatures if isinstance(k, str) and pattern.getmatch(k) is not None]
+        elif isinstance(pattern, t.Or):
+            out = []
+            for alternative in pattern.alternatives:
+                keys = self.candidateKeys(alternative)
+                if keys is None:
+                    return None
+                out.extend(keys)
+            return out
+        else:
+            return None
+
+    def _candidates(self, keys, low, high):
+        streams = []
+        for key in set(keys):
+            ordinals = self.signatures.get(key)
+            if ordinals is not None:
+                start = bisect.bisect_left(ordinals, low)
+                stop = bisect.bisect_right(ordinals, high)
+                if stop > start:
+                    streams.append([(ordinal, key) for ordinal in ordinals[start:stop]])
+        if len(streams) == 1:
+            return streams[0]
+        else:
+            return heapq.merge(*streams)
+
+    def _search(self, pattern, index):
+        top = self.ordinal(index)
+        keys = self.candidateKeys(pattern)
+        if keys is None:
+            for path, m in t.search(pattern, t.get(self.obj, list(index))):
+                yield path, None, m
+            return
+
+        matchByString = {}
+        for ordinal, key in self._candidates(keys, top - self.sizes[top] + 1, top):
+            path = self.path(ordinal, top)
+            if isinstance(key, str):
+                # strings are indexed by value, so each distinct value is matched only once and never looked up
+                if key not in matchByString:
+                    matchByString[key] = t.getmatch(pattern, key)
+                m = matchByString[key]
+            else:
+                m = t.getmatch(pattern, t.get(self.obj, list(index) + list(path)))
+            if m is not None:
+                yield path, ordinal, m
+
+    def search(self, pattern, index=()):
+        """Yield matches as (index, poie.producer.tools.Match) pairs, exactly like poie.producer.tools.search, but only visiting subexpressions that could match.
+
+        :type pattern: Pythonized JSON or poie.producer.tools.Matcher
+        :param pattern: pattern as in poie.producer.tools.getmatch
+        :type index: list of strings and integers
+        :param index: path to the subexpression to search in
+        :rtype: generator of (tuple, poie.producer.tools.Match) pairs
+        :return: paths relative to ``index`` and matches
+        """
+        return ((path, m) for path, ordinal, m in self._search(pattern, index))
+
+    def depthsOfMatches(self, pattern, index=()):
+        """Yield (index, depth) pairs for matches, in the same order as ``search``, without looking up each match's depth separately.
+
+        :type pattern: Pythonized JSON or poie.producer.tools.Matcher
+        :param pattern: pattern as in poie.producer.tools.getmatch
+        :type index: list of strings and integers
+        :param index: path to the subexpression to search in
+        :rtype: generator of (tuple, integer) pairs
+        :return: paths relative to ``index`` and depths of the matched subexpressions
+        """
+        for path, ordinal, m in self._search(pattern, index):
+            if ordinal is None:
+                ordinal = self.ordinal(list(index) + list(path))
+            yield path, self.depths[ordinal]
+
+    def indexes(self, pattern, index=()):
+        """Yield matching paths relative to ``index``, like poie.producer.tools.indexes."""
+        return (x[0] for x in self.search(pattern, index))
+
+    def count(self, pattern, index=()):
+        """Count matches below ``index``, like poie.producer.tools.count.
+
+        String and regular expression patterns are answered from the index alone.
+        """
+        if isinstance(pattern, (str, t.RegEx)):
+            top = self.ordinal(index)
+            low = top - self.sizes[top] + 1
+            total = 0
+            for key in set(self.candidateKeys(pattern)):
+                ordinals = self.signatures.get(key)
+                if ordinals is not None:
+                    total += bisect.bisect_right(ordinals, top) - bisect.bisect_left(ordinals, low)
+            return total
+        else:
+            return sum(1 for x in self.search(pattern, index))
+
+    def statistics(self, index=()):
+        """Summarize the subexpressions at and below ``index``.
+
+        :type index: list of strings and integers
+        :param index: path to the subexpression to summarize
+        :rtype: dict
+        :return: ``"size"`` and ``"depth"`` of the subtree, counts of ``"objects"``, ``"arrays"``, ``"strings"``, and ``"scalars"``, and ``"shapes"``, a list of (number of objects, sorted keys) pairs, most common first
+        """
+        top = self.ordinal(index)
+        low = top - self.sizes[top] + 1
+        out = {"size": self.sizes[top], "depth": self.depths[top], "objects": 0, "arrays": 0, "strings": 0, "scalars": 0, "shapes": []}
+        for key, ordinals in self.signatures.items():
+            number = bisect.bisect_right(ordinals, top) - bisect.bisect_left(ordinals, low)
+            if number == 0:
+                continue
+            if isinstance(key, str):
+                out["strings"] += number
+            elif key[0] == "object":
+                out["objects"] += number
+                out["shapes"].append((number, sorted(key[1])))
+            elif key[0] == "array":
+                out["arrays"] += number
+            else:
+                out["scalars"] += number
+        out["shapes"].sort(key=lambda x: (-x[0], x[1]))
+        return out
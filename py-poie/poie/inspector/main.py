@@ -41,8 +41,8 @@ class InspectorMode(Mode):
         class LoadCommand(Command):
             def __init__(self, mode):
                 self.name = "load"
-                self.syntax = "load <file-path> as <name>"
-                self.help = "read a PFA file into the current context, possibly naming it\n    " + self.syntax
+                self.syntax = "load <file-path> as <name> [saveIndex=false]"
+                self.help = "read a PFA file into the current context, possibly naming it, and index its structure (saveIndex=true keeps the index next to the file and reuses it on later loads with saveIndex=true)\n    " + self.syntax
                 self.mode = mode
             def complete(self, established, active):
                 words = getcomplete(established)
@@ -50,17 +50,42 @@ class InspectorMode(Mode):
                     return pathcomplete(established, active)
                 elif len(words) == 1 and "as".startswith(active):
                     return ["as "]
+                elif len(words) == 3 and not words[-1].partial:
+                    return [x for x in ["saveIndex="] if x.startswith(active)]
                 else:
                     return []
             def action(self, args):
                 if len(args) == 1 and args[0] == parser.Word("help"):
                     print(self.help)
-                elif len(args) == 3 and isinstance(args[0], parser.FilePath) and args[1] == parser.Word("as") and isinstance(args[2], parser.Word):
+                    return
+
+                options = {"saveIndex": False}
+                while len(args) > 0 and isinstance(args[-1], parser.Option):
+                    opt = args.pop()
+                    if opt.word.text in ["saveIndex"]:
+                        try:
+                            options[opt.word.text] = opt.value.value()
+                        except TypeError:
+                            raise InspectorError("illegal value for {0}".format(opt.word.text))
+                    else:
+                        raise InspectorError("option {0} unrecognized".format(opt.word.text))
+
+                if not isinstance(options["saveIndex"], bool):
+                    raise InspectorError("saveIndex must be boolean")
+
+                if len(args) == 3 and isinstance(args[0], parser.FilePath) and args[1] == parser.Word("as") and isinstance(args[2], parser.Word):
                     try:
                         data = json.load(open(args[0].text))
                     except IOError as err:
                         raise InspectorError(err)
-                    self.mode.pfaFiles[args[2].text] = Model(data)
+                    model = Model(data, args[0].text if options["saveIndex"] else None)
+                    index = model.index
+                    if options["saveIndex"]:
+                        try:
+                            index.save(args[0].text)
+                        except IOError as err:
+                            raise InspectorError(err)
+                    self.mode.pfaFiles[args[2].text] = model
                 else:
                     self.syntaxError()
 
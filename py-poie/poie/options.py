@@ -42,4 +42,14 @@ class EngineOptions(object):
         self.timeout_action = longOpt("timeout", self.timeout)
         self.timeout_end = longOpt("timeout", self.timeout)
 
+        def boolOpt(name, default):
+            out = combinedOptions.get(name, default)
+            if out is True or out is False:
+                return out
+            else:
+                raise PFAInitializationException(name + " must be boolean")
+
+        # if True, pool items are decoded from their JSON initializers when first accessed, rather than all at startup
+        self.pool_init_lazy = boolOpt("pool.init.lazy", False)
+
         # ...
@@ -15,41 +15,12 @@
 # limitations under the License.
 
 import base64
+import importlib
 import json
 import re
+import threading
 from collections import OrderedDict
 
-import poie.lib.core
-import poie.lib.pfamath
-import poie.lib.spec
-import poie.lib.link
-import poie.lib.kernel
-import poie.lib.la
-import poie.lib.metric
-import poie.lib.rand
-import poie.lib.pfastring
-import poie.lib.regex
-import poie.lib.parse
-import poie.lib.cast
-import poie.lib.array
-import poie.lib.map
-import poie.lib.bytes
-import poie.lib.fixed
-import poie.lib.enum
-import poie.lib.pfatime
-import poie.lib.impute
-import poie.lib.interp
-import poie.lib.prob.dist
-import poie.lib.stat.pfatest
-import poie.lib.stat.sample
-import poie.lib.stat.change
-import poie.lib.model.reg
-import poie.lib.model.tree
-import poie.lib.model.cluster
-import poie.lib.model.neighbor
-import poie.lib.model.naive
-import poie.lib.model.neural
-import poie.lib.model.svm
 
 import poie.P as P
 import poie.util
@@ -60,6 +31,7 @@ from poie.signature import IncompatibleTypes
 from poie.signature import LabelData
 from poie.signature import Sig
 from poie.signature import PFAVersion
+from poie.signature import SignatureCache
 from poie.datatype import *
 import poie.options
 from poie.util import ts
@@ -352,58 +324,152 @@ class EmitFcn(Fcn):
         """Generate an executable Python string for this function; usually ``self.f["emit"].engine.emit(argument)``."""
         return "self.f[\"emit\"].engine.emit(" + args[0] + ")"
 
+libraryModules = {
+    "": "poie.lib.core",
+    "m": "poie.lib.pfamath",
+    "m.special": "poie.lib.spec",
+    "m.link": "poie.lib.link",
+    "m.kernel": "poie.lib.kernel",
+    "la": "poie.lib.la",
+    "metric": "poie.lib.metric",
+    "rand": "poie.lib.rand",
+    "s": "poie.lib.pfastring",
+    "re": "poie.lib.regex",
+    "parse": "poie.lib.parse",
+    "cast": "poie.lib.cast",
+    "a": "poie.lib.array",
+    "map": "poie.lib.map",
+    "bytes": "poie.lib.bytes",
+    "fixed": "poie.lib.fixed",
+    "enum": "poie.lib.enum",
+    "time": "poie.lib.pfatime",
+    "impute": "poie.lib.impute",
+    "interp": "poie.lib.interp",
+    "prob.dist": "poie.lib.prob.dist",
+    "stat.test": "poie.lib.stat.pfatest",
+    "stat.sample": "poie.lib.stat.sample",
+    "stat.change": "poie.lib.stat.change",
+    "model.reg": "poie.lib.model.reg",
+    "model.tree": "poie.lib.model.tree",
+    "model.cluster": "poie.lib.model.cluster",
+    "model.neighbor": "poie.lib.model.neighbor",
+    "model.naive": "poie.lib.model.naive",
+    "model.neural": "poie.lib.model.neural",
+    "model.svm": "poie.lib.model.svm",
+    }
+"""All PFA library modules, by the prefix of the function names they provide (everything before the last dot)."""
+
+_libraryLock = threading.RLock()
+
+class LibraryFunctions(dict):
+    """Dict of PFA functions that imports each library module the first time a function with its prefix is looked up.
+
+    Looking up a name (``[]``, ``get``, ``in``) loads at most one module; anything that needs all of the names (iteration, ``len``, ``keys``, ``items``, ``values``) loads all of them. Functions that were put in the dict directly (user functions, ``emit``) are never overwritten by library functions.
+    """
+
+    def __init__(self, *args, **kwds):
+        super(LibraryFunctions, self).__init__(*args, **kwds)
+        self.loadedPrefixes = set()
+
+    def load(self, prefix):
+        """Import the library module for a function-name prefix (if any) and add its functions."""
+        if prefix not in self.loadedPrefixes:
+            with _libraryLock:
+                if prefix not in self.loadedPrefixes:
+                    moduleName = libraryModules.get(prefix)
+                    if moduleName is not None:
+                        for name, fcn in importlib.import_module(moduleName).provides.items():
+                            self.setdefault(name, fcn)
+                    self.loadedPrefixes.add(prefix)
+
+    def loadAll(self):
+        """Import all library modules."""
+        for prefix in libraryModules:
+            self.load(prefix)
+
+    def __missing__(self, name):
+        prefix = name.rpartition(".")[0]
+        if prefix not in self.loadedPrefixes:
+            self.load(prefix)
+            if dict.__contains__(self, name):
+                return dict.__getitem__(self, name)
+        raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        else:
+            return True
+
+    def __iter__(self):
+        self.loadAll()
+        return super(LibraryFunctions, self).__iter__()
+
+    def __len__(self):
+        self.loadAll()
+        return super(LibraryFunctions, self).__len__()
+
+    def keys(self):
+        self.loadAll()
+        return super(LibraryFunctions, self).keys()
+
+    def items(self):
+        self.loadAll()
+        return super(LibraryFunctions, self).items()
+
+    def values(self):
+        self.loadAll()
+        return super(LibraryFunctions, self).values()
+
+    def copy(self):
+        """Shallow copy that stays lazy."""
+        out = LibraryFunctions(dict.items(self))
+        out.loadedPrefixes = set(self.loadedPrefixes)
+        return out
+
 class FunctionTable(object):
     """Represents a table of all accessible PFA function names, such as library functions, user-defined functions, and possibly emit."""
 
-    def __init__(self, functions):
+    def __init__(self, functions, signatureCache=None):
         """:type functions: dict from function name to poie.fcn.Fcn
         :param functions: function lookup table
+        :type signatureCache: poie.signature.SignatureCache or ``None``
+        :param signatureCache: memoized signature matches to share with another table; ``None`` starts a new one
         """
         self.functions = functions
+        if signatureCache is None:
+            signatureCache = SignatureCache()
+        self.signatureCache = signatureCache
+
+    def accepts(self, fcn, args, version):
+        """Match a function's signature against argument types, remembering the result for later call sites.
+
+        :type fcn: poie.fcn.Fcn
+        :param fcn: function being called
+        :type args: list of poie.datatype.Type
+        :param args: argument types
+        :type version: pypoie.signature.PFAVersion
+        :param version: PFA version number in which to interpret the patterns
+        :rtype: (pypoie.signature.Sig, list of poie.datatype.AvroType, AvroType)
+        :return: same as ``fcn.sig.accepts(args, version)``
+        """
+        return self.signatureCache.accepts(fcn.sig, args, version)
 
     @staticmethod
     def blank():
         """Create a function table containing nothing but library functions.
 
-        This is where all the PFA library modules are enumerated.
-        """
-
-        functions = {}
-        functions.update(poie.lib.core.provides)
-        functions.update(poie.lib.pfamath.provides)
-        functions.update(poie.lib.spec.provides)
-        functions.update(poie.lib.link.provides)
-        functions.update(poie.lib.kernel.provides)
-        functions.update(poie.lib.la.provides)
-        functions.update(poie.lib.metric.provides)
-        functions.update(poie.lib.rand.provides)
-        functions.update(poie.lib.pfastring.provides)
-        functions.update(poie.lib.regex.provides)
-        functions.update(poie.lib.parse.provides)
-        functions.update(poie.lib.cast.provides)
-        functions.update(poie.lib.array.provides)
-        functions.update(poie.lib.map.provides)
-        functions.update(poie.lib.bytes.provides)
-        functions.update(poie.lib.fixed.provides)
-        functions.update(poie.lib.enum.provides)
-        functions.update(poie.lib.pfatime.provides)
-        functions.update(poie.lib.impute.provides)
-        functions.update(poie.lib.interp.provides)
-        functions.update(poie.lib.prob.dist.provides)
-        functions.update(poie.lib.stat.pfatest.provides)
-        functions.update(poie.lib.stat.sample.provides)
-        functions.update(poie.lib.stat.change.provides)
-        functions.update(poie.lib.model.reg.provides)
-        functions.update(poie.lib.model.tree.provides)
-        functions.update(poie.lib.model.cluster.provides)
-        functions.update(poie.lib.model.neighbor.provides)
-        functions.update(poie.lib.model.naive.provides)
-        functions.update(poie.lib.model.neural.provides)
-        functions.update(poie.lib.model.svm.provides)
-
-        # TODO: functions.update(poie.lib.other.provides)...
-
-        return FunctionTable(functions)
+        The library modules are imported as the type-checker asks for their functions (see poie.pfaast.LibraryFunctions).
+        """
+        return FunctionTable(LibraryFunctions())
 
 ############################################################ type-checking and transforming ASTs
 
@@ -909,7 +975,10 @@ class EngineConfig(Ast):
         else:
             emitFcn = {}
 
-        withUserFunctions = FunctionTable(dict(list(functionTable.functions.items()) + list(userFunctions.items()) + list(emitFcn.items())))
+        functions = functionTable.functions.copy()
+        functions.update(userFunctions)
+        functions.update(emitFcn)
+        withUserFunctions = FunctionTable(functions, functionTable.signatureCache)
 
         userFcnContexts = []
         for fname, fcnDef in list(self.fcns.items()):
@@ -1102,6 +1171,21 @@ class CellPoolSource(object):
     JSON = "json"
     AVRO = "avro"
 
+class DecodedInit(object):
+    """Initial value of a cell or pool that has already been decoded into its runtime form.
+
+    The streaming reader (poie.reader.jsonStreamToAst) decodes ``init`` as it reads the document, rather than keeping the serialized JSON, so that large models never exist as a JSON tree.
+    """
+
+    def __init__(self, value):
+        """:type value: any
+        :param value: decoded cell value or dict of decoded pool items
+        """
+        self.value = value
+
+    def __repr__(self):
+        return "DecodedInit(...)"
+
 @poie.util.case
 class Cell(Ast):
     """Abstract syntax tree for a ``cell`` definition."""
@@ -1109,8 +1193,8 @@ class Cell(Ast):
     def __init__(self, avroPlaceholder, init, shared, rollback, source, pos=None):
         """:type avroPlaceholder: poie.datatype.AvroPlaceholder
         :param avroPlaceholder: cell type as a placeholder (so it can exist before type resolution)
-        :type init: string or callable
-        :param init: serialized JSON string containing initial data or a function that produces it (from an external file, usually)
+        :type init: string, callable, or poie.pfaast.DecodedInit
+        :param init: serialized JSON string containing initial data, a function that produces it (from an external file, usually), or the already-decoded value
         :type shared: bool
         :param shared: if ``True``, this cell shares data with all others in the same poie.genpy.SharedState
         :type rollback: bool
@@ -1127,7 +1211,7 @@ class Cell(Ast):
         if not isinstance(avroPlaceholder, (AvroPlaceholder, AvroType)):
             raise PFASyntaxException("\"avroPlaceholder\" must be an AvroPlaceholder or AvroType", pos)
 
-        if not isinstance(init, str) and not callable(init):
+        if not isinstance(init, (str, DecodedInit)) and not callable(init):
             raise PFASyntaxException("\"init\" must be a string or callable", pos)
 
         if not isinstance(shared, bool):
@@ -1175,7 +1259,9 @@ class Cell(Ast):
 
     @property
     def initJsonNode(self):
-        if callable(self.init):
+        if isinstance(self.init, DecodedInit):
+            return jsonEncoder(self.avroType, self.init.value)
+        elif callable(self.init):
             return json.loads(self.init(self.avroType))
         else:
             return json.loads(self.init)
@@ -1210,8 +1296,8 @@ class Pool(Ast):
     def __init__(self, avroPlaceholder, init, shared, rollback, source, pos=None):
         """:type avroPlaceholder: poie.datatype.AvroPlaceholder
         :param avroPlaceholder: pool type as a placeholder (so it can exist before type resolution)
-        :type init: string or callable
-        :param init: serialized JSON string containing initial data or a function that produces it (from an external file, usually)
+        :type init: dict of string, callable, or poie.pfaast.DecodedInit
+        :param init: serialized JSON strings containing initial items, a function that produces them (from an external file, usually), or the already-decoded items
         :type shared: bool
         :param shared: if ``True``, this pool shares data with all others in the same poie.genpy.SharedState
         :type rollback: bool
@@ -1227,7 +1313,10 @@ class Pool(Ast):
         if not isinstance(avroPlaceholder, (AvroPlaceholder, AvroType)):
             raise PFASyntaxException("\"avroPlaceholder\" must be an AvroPlaceholder or AvroType", pos)
 
-        if not isinstance(init, dict) or not all(isinstance(x, str) or x is None for x in list(init.values())):
+        if isinstance(init, DecodedInit):
+            if not isinstance(init.value, dict):
+                raise PFASyntaxException("\"init\" must be a string or callable", pos)
+        elif not isinstance(init, dict) or not all(isinstance(x, str) or x is None for x in list(init.values())):
             raise PFASyntaxException("\"init\" must be a string or callable", pos)
 
         if not isinstance(shared, bool):
@@ -1275,7 +1364,9 @@ class Pool(Ast):
 
     @property
     def initJsonNode(self):
-        if callable(self.init):
+        if isinstance(self.init, DecodedInit):
+            return OrderedDict((k, jsonEncoder(self.avroType, v)) for k, v in self.init.value.items())
+        elif callable(self.init):
             return json.loads(self.init(AvroMap(self.avroType)))
         else:
             return OrderedDict((k, json.loads(v)) for k, v in list(self.init.items()))
@@ -1855,7 +1946,7 @@ class CallUserFcn(Expression):
                 raise PFASemanticException("unknown function \"{0}\" in enumeration type".format(n), self.pos)
             if not isinstance(fcn, UserFcn):
                 raise PFASemanticException("function \"{0}\" is not a user function".format(n), self.pos)
-            sigres = fcn.sig.accepts(argTypes, version)
+            sigres = functionTable.accepts(fcn, argTypes, version)
             if sigres is not None:
                 sig, paramTypes, retType = sigres
                 fcn.deprecationWarning(sig, version)
@@ -1987,7 +2078,7 @@ class Call(Expression):
                 calls = calls.union(ctx.calls)
                 argTypes.append(ctx.fcnType)
 
-        sigres = fcn.sig.accepts(argTypes, version)
+        sigres = functionTable.accepts(fcn, argTypes, version)
         if sigres is not None:
             sig, paramTypes, retType = sigres
             fcn.deprecationWarning(sig, version)
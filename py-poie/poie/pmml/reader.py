@@ -98,12 +98,36 @@ class PmmlContentHandler(xml.sax.handler.ContentHandler):
     def endElementNS(self, name, qname):
         if name[0] is not None and name[0].startswith(self.namespace):
             self.endElement(name[1])
-        
-def loadPMML(pmmlInput, processNamespaces=False):
-    """Load a PMML document.
+
+class StreamingPmmlContentHandler(PmmlContentHandler):
+    """Streaming XML reader that converts each <Segment> of a <Segmentation> to PFA as soon as it is closed and drops its subtree, so that memory scales with the largest segment, not the whole ensemble."""
+
+    def __init__(self, options, context):
+        super(StreamingPmmlContentHandler, self).__init__()
+        self.options = options
+        self.context = context
+
+    def endElement(self, name):
+        element = self.stack.pop()
+        self.result = element
+
+        if isinstance(element, poie.pmml.version_independent.DataDictionary):
+            # segments refer to the fields, so the input type must be known before the first one closes
+            element.toPFA(self.options, self.context)
+
+        elif isinstance(element, poie.pmml.version_independent.Segment) and len(self.stack) > 0 and isinstance(self.stack[-1], poie.pmml.version_independent.Segmentation):
+            segmentation = self.stack[-1]
+            segmentation.addSegment(element, self.options, self.context)
+            segmentation.Segment.pop()
+            segmentation.children.pop()
+
+def parsePMML(pmmlInput, contentHandler, processNamespaces=False):
+    """Feed a PMML document through a SAX content handler.
 
     :type pmmlInput: open XML file, gzip-compressed byte string, XML string, or file name string
     :param pmmlInput: input source for the PMML
+    :type contentHandler: pypoie.pmml.reader.PmmlContentHandler
+    :param contentHandler: handler that builds the PMML bindings
     :type processNamespaces: bool
     :param processNamespaces: if ``True``, allow for namespaces other than just "http://www.dmg.org/PMML-*"
     :rtype: pypoie.pmml.version_independent.PmmlBinding
@@ -121,7 +145,6 @@ def loadPMML(pmmlInput, processNamespaces=False):
         else:
             pmmlInput = open(pmmlInput)
 
-    contentHandler = PmmlContentHandler()
     parser = xml.sax.make_parser()
     parser.setContentHandler(contentHandler)
     if processNamespaces:
@@ -133,13 +156,26 @@ def loadPMML(pmmlInput, processNamespaces=False):
 
     return contentHandler.result
 
+def loadPMML(pmmlInput, processNamespaces=False):
+    """Load a PMML document.
+
+    :type pmmlInput: open XML file, gzip-compressed byte string, XML string, or file name string
+    :param pmmlInput: input source for the PMML
+    :type processNamespaces: bool
+    :param processNamespaces: if ``True``, allow for namespaces other than just "http://www.dmg.org/PMML-*"
+    :rtype: pypoie.pmml.version_independent.PmmlBinding
+    :return: loaded PMML
+    """
+
+    return parsePMML(pmmlInput, PmmlContentHandler(), processNamespaces)
+
 def pmmlToAst(pmmlInput, options=None):
     """Load a PMML document and convert it to a PFA abstract syntax tree.
 
     :type pmmlInput: open XML file, gzip-compressed byte string, XML string, or file name string
     :param pmmlInput: input source for the PMML
     :type options: dict of option strings
-    :param options: PMML-to-PFA conversion options
+    :param options: PMML-to-PFA conversion options; set ``"reader.streaming"`` to convert ensemble segments while reading, rather than after loading the whole document
     :rtype: poie.pfaast.EngineConfig
     :return: converted PFA
     """
@@ -149,11 +185,17 @@ def pmmlToAst(pmmlInput, options=None):
 
     context = poie.pmml.version_independent.Context()
     context.avroTypeBuilder = AvroTypeBuilder()
-    
-    obj = loadPMML(pmmlInput, options.get("reader.processNamespaces", False))
+    context.pendingInits = []
+
+    if options.get("reader.streaming", False):
+        obj = parsePMML(pmmlInput, StreamingPmmlContentHandler(options, context), options.get("reader.processNamespaces", False))
+    else:
+        obj = loadPMML(pmmlInput, options.get("reader.processNamespaces", False))
     result = obj.toPFA(options, context)
 
     context.avroTypeBuilder.resolveTypes()
+    for decodeInit in context.pendingInits:
+        decodeInit()
     return result
 
 def pmmlToNode(pmmlInput, options=None):
@@ -15,12 +15,14 @@
 # limitations under the License.
 
 import json
+import tempfile
 
 import poie.pfaast as ast
 from poie.datatype import AvroArray
 from poie.datatype import AvroDouble
 from poie.datatype import AvroString
 from poie.datatype import AvroTypeBuilder
+from poie.datatype import compileJsonDecoder
 from poie.signature import LabelData
 from poie.util import uniqueEngineName, uniqueRecordName, uniqueEnumName
 
@@ -125,8 +127,9 @@ class HasDataType(object):
 class PMML(PmmlBinding):
     """Represents a <PMML> tag and provides methods to convert to PFA."""
     def toPFA(self, options, context):
-        inputType = self.DataDictionary[0].toPFA(options, context)
-        context.inputType = context.avroTypeBuilder.resolveOneType(json.dumps(inputType))
+        if getattr(context, "inputTypeNode", None) is None:
+            self.DataDictionary[0].toPFA(options, context)
+        inputType = context.inputTypeNode
 
         models = self.models()
         if len(models) == 0:
@@ -143,8 +146,9 @@ class PMML(PmmlBinding):
             context.fcns = {}
             context.cells = {}
             context.pools = {}
-            context.storageType = "cell"
-            context.storageName = "modelData"
+            if getattr(context, "storageType", None) is None:
+                context.storageType = "cell"
+                context.storageName = "modelData"
 
             if len(self.TransformationDictionary) > 0:
                 for defineFunction in self.TransformationDictionary[0].DefineFunction:
@@ -630,7 +634,9 @@ class DataDictionary(PmmlBinding):
         for dataField in self.DataField:
             fields.append(dataField.toPFA(options, context))
 
-        return {"type": "record", "name": "DataDictionary", "fields": fields}
+        context.inputTypeNode = {"type": "record", "name": "DataDictionary", "fields": fields}
+        context.inputType = context.avroTypeBuilder.resolveOneType(json.dumps(context.inputTypeNode))
+        return context.inputTypeNode
 
 class DataField(PmmlBinding, HasDataType):
     """Represents a <DataField> tag and provides methods to convert to PFA."""
@@ -919,7 +925,64 @@ class MiningField(PmmlBinding):
 class MiningModel(PmmlBinding, ModelElement):
     """Represents a <MiningModel> tag and provides methods to convert to PFA."""
     def toPFA(self, options, context):
-        raise NotImplementedError
+        if len(self.Segmentation) != 1:
+            raise NotImplementedError
+        segmentation = self.Segmentation[0]
+
+        for segment in segmentation.Segment:
+            segmentation.addSegment(segment, options, context)
+        if segmentation.numSegments == 0:
+            raise NotImplementedError
+
+        expectedOutputType = "double" if self.functionName == "regression" else "string"
+        if segmentation.outputType != expectedOutputType:
+            raise TypeError("MiningModel with functionName \"{0}\" has segments whose trees produce {1}, not {2}".format(self.functionName, segmentation.outputType, expectedOutputType))
+        context.outputType = segmentation.outputType
+
+        if self.functionName == "regression" and segmentation.multipleModelMethod == "average":
+            combiner = "a.mean"
+        elif self.functionName == "regression" and segmentation.multipleModelMethod == "median":
+            combiner = "a.median"
+        elif self.functionName == "regression" and segmentation.multipleModelMethod == "sum":
+            combiner = "a.sum"
+        elif self.functionName == "classification" and segmentation.multipleModelMethod == "majorityVote":
+            combiner = "a.mode"
+        else:
+            raise NotImplementedError
+
+        # the trees stay in segmentation's spool file until the types are resolved; see Segmentation.decodeSegments
+        forestPlaceholder = context.avroTypeBuilder.makePlaceholder(json.dumps({"type": "array", "items": segmentation.modelType}))
+        if context.storageType == "cell":
+            storage = ast.Cell(forestPlaceholder, ast.DecodedInit([]), False, False, ast.CellPoolSource.EMBEDDED)
+            context.cells[context.storageName] = storage
+            itemName = None
+            forest = ast.CellGet(context.storageName, [])
+
+        elif context.storageType == "pool":
+            poolName, itemName, refName = context.storageName
+            if poolName in context.pools:
+                raise ValueError("pool \"{0}\" already exists; a MiningModel needs its own pool".format(poolName))
+            storage = ast.Pool(forestPlaceholder, ast.DecodedInit({}), False, False, ast.CellPoolSource.EMBEDDED)
+            context.pools[poolName] = storage
+            forest = ast.PoolGet(poolName, [ast.LiteralString(itemName)])
+
+        else:
+            raise NotImplementedError
+
+        context.pendingInits.append(lambda: segmentation.decodeSegments(storage, itemName))
+
+        return [ast.Call(combiner, [ast.Call("a.map", [
+            forest,
+            ast.FcnDef([{"tree": context.avroTypeBuilder.makePlaceholder('"TreeNode"')}],
+                       context.avroTypeBuilder.makePlaceholder(json.dumps(context.outputType)),
+                       [ast.Call("model.tree.simpleWalk", [
+                           ast.Ref("input"),
+                           ast.Ref("tree"),
+                           ast.FcnDef([{"d": context.avroTypeBuilder.makePlaceholder('"DataDictionary"')}, {"t": context.avroTypeBuilder.makePlaceholder('"TreeNode"')}],
+                                      context.avroTypeBuilder.makePlaceholder('"boolean"'),
+                                      [ast.Call("model.tree.simpleTest", [ast.Ref("d"), ast.Ref("t")])])
+                           ])])
+            ])])]
 
 class MiningSchema(PmmlBinding):
     """Represents a <MiningSchema> tag and provides methods to convert to PFA."""
@@ -1320,10 +1383,77 @@ class Seasonality_ExpoSmooth(PmmlBinding):
 class Segment(PmmlBinding):
     """Represents a <Segment> tag and provides methods to convert to PFA."""
     def toPFA(self, options, context):
-        raise NotImplementedError
+        """Convert this segment's model to a member of its ensemble.
+
+        :type options: dict of string
+        :param options: PMML-to-PFA conversion options
+        :type context: pypoie.pmml.version_independent.Context
+        :param context: PMML-to-PFA conversion context
+        :rtype: (Pythonized JSON type, Pythonized JSON value)
+        :return: type of the model and the model; also sets ``context.outputType``
+        """
+
+        predicates = [x for x in self.children if isinstance(x, Predicate)]
+        models = [x for x in self.children if isinstance(x, ModelElement)]
+        if len(predicates) != 1 or not isinstance(predicates[0], AlwaysTrue) or len(models) != 1 or not isinstance(models[0], TreeModel):
+            raise NotImplementedError
+        predicateTypes, modelType, modelData = models[0].treeData(context)
+        if predicateTypes != set(["SimplePredicate"]):
+            raise NotImplementedError
+        return modelType, modelData
 
 class Segmentation(PmmlBinding):
     """Represents a <Segmentation> tag and provides methods to convert to PFA."""
+    def __init__(self):
+        super(Segmentation, self).__init__()
+        # converted trees, one JSON line each, so that the ensemble is never held in memory while reading
+        self.spool = None
+        self.numSegments = 0
+        self.modelType = None
+        self.outputType = None
+
+    def addSegment(self, segment, options, context):
+        """Convert one segment and append its tree to the spool file.
+
+        :type segment: pypoie.pmml.version_independent.Segment
+        :param segment: segment to convert; it can be dropped afterward
+        :type options: dict of string
+        :param options: PMML-to-PFA conversion options
+        :type context: pypoie.pmml.version_independent.Context
+        :param context: PMML-to-PFA conversion context
+        """
+
+        modelType, modelData = segment.toPFA(options, context)
+        if self.numSegments == 0:
+            self.modelType = modelType
+            self.outputType = context.outputType
+            self.spool = tempfile.TemporaryFile("w+")
+        elif modelType != self.modelType or context.outputType != self.outputType:
+            raise TypeError("Segment {0} (number {1}) has tree type {2} with output {3}, but the first segment has tree type {4} with output {5}; all segments of a Segmentation must have the same type".format(
+                segment.id, self.numSegments + 1, json.dumps(modelType), context.outputType, json.dumps(self.modelType), self.outputType))
+        self.spool.write(json.dumps(modelData))
+        self.spool.write("\n")
+        self.numSegments += 1
+
+    def decodeSegments(self, storage, itemName):
+        """Read the spooled trees back into the initial value of a cell or pool item; call after the types have been resolved.
+
+        :type storage: poie.pfaast.Cell or poie.pfaast.Pool
+        :param storage: cell or pool whose ``init`` receives the array of trees
+        :type itemName: string or ``None``
+        :param itemName: pool item name or ``None`` for a cell
+        """
+
+        decodeTree = compileJsonDecoder(storage.avroType.items)
+        self.spool.seek(0)
+        forest = [decodeTree(json.loads(line)) for line in self.spool]
+        self.spool.close()
+        self.spool = None
+        if itemName is None:
+            storage.init = ast.DecodedInit(forest)
+        else:
+            storage.init = ast.DecodedInit({itemName: forest})
+
     def toPFA(self, options, context):
         raise NotImplementedError
 
@@ -1553,7 +1683,15 @@ class TransformationDictionary(PmmlBinding):
 
 class TreeModel(PmmlBinding, ModelElement):
     """Represents a <TreeModel> tag and provides methods to convert to PFA."""
-    def toPFA(self, options, context):
+    def treeData(self, context):
+        """Convert a binary-split tree to a ``TreeNode`` record type and the tree as an instance of that type; sets ``context.outputType``.
+
+        :type context: pypoie.pmml.version_independent.Context
+        :param context: PMML-to-PFA conversion context
+        :rtype: (set of strings, Pythonized JSON type, Pythonized JSON value)
+        :return: names of the predicate classes used in the splits, the ``TreeNode`` type, and the tree
+        """
+
         topNode = self.Node[0]
         otherNodes = topNode.nodes()
 
@@ -1588,29 +1726,6 @@ class TreeModel(PmmlBinding, ModelElement):
                     {"name": "fail", "type": outputTypes}
                     ]}
 
-                if context.storageType == "cell":
-                    context.cells[context.storageName] = ast.Cell(context.avroTypeBuilder.makePlaceholder(json.dumps(modelType)), json.dumps(modelData), False, False, ast.CellPoolSource.EMBEDDED)
-                    return [ast.Call("model.tree.simpleWalk", [
-                        ast.Ref("input"),
-                        ast.CellGet(context.storageName, []),
-                        ast.FcnDef([{"d": context.avroTypeBuilder.makePlaceholder('"DataDictionary"')}, {"t": context.avroTypeBuilder.makePlaceholder('"TreeNode"')}],
-                                   context.avroTypeBuilder.makePlaceholder('"boolean"'),
-                                   [ast.Call("model.tree.simpleTest", [ast.Ref("d"), ast.Ref("t")])])
-                        ])]
-
-                elif context.storageType == "pool":
-                    poolName, itemName, refName = context.storageName
-                    if poolName not in context.pools:
-                        context.pools[poolName] = ast.Pool(context.avroTypeBuilder.makePlaceholder(json.dumps(modelType)), {}, False, ast.CellPoolSource.EMBEDDED)
-                    context.pools[poolName].init[itemName] = json.dumps(modelData)
-                    return [ast.Call("model.tree.simpleWalk", [
-                        ast.Ref("input"),
-                        ast.PoolGet(context.storageName, []),
-                        ast.FcnDef([{"d": context.avroTypeBuilder.makePlaceholder('"DataDictionary"')}, {"t": context.avroTypeBuilder.makePlaceholder('"TreeNode"')}],
-                                   context.avroTypeBuilder.makePlaceholder('"boolean"'),
-                                   [ast.Call("model.tree.simpleTest", [ast.Ref("d"), ast.Ref("t")])])
-                        ])]
-
             elif predicateTypes == set(["CompoundPredicate"]) or predicateTypes == set(["SimplePredicate", "CompoundPredicate"]):
                 modelData = topNode.simpleWalk(context, self.functionName, splitCharacteristic, predicateTypes)["TreeNode"]
 
@@ -1625,22 +1740,53 @@ class TreeModel(PmmlBinding, ModelElement):
                     {"name": "fail", "type": outputTypes}
                     ]}
 
-                if context.storageType == "cell":
-                    context.cells[context.storageName] = ast.Cell(context.avroTypeBuilder.makePlaceholder(json.dumps(modelType)), json.dumps(modelData), False, False, ast.CellPoolSource.EMBEDDED)
-                    return [ast.Call("model.tree.simpleWalk", [
-                        ast.Ref("input"),
-                        ast.CellGet(context.storageName, [LiteralString("operator")]),
-                        ast.CellGet(context.storageName, [LiteralString("comparisions")]),
-                        ast.FcnDef([{"d": context.avroTypeBuilder.makePlaceholder('"DataDictionary"')}, {"c": context.avroTypeBuilder.makePlaceholder('"Comparison"')}],
-                                   context.avroTypeBuilder.makePlaceholder('"boolean"'),
-                                   [ast.Call("model.tree.simpleTest", [ast.Ref("d"), ast.Ref("c")])])
-                        ])]
-
             else:
                 raise NotImplementedError
+
+            return predicateTypes, modelType, modelData
+
         else:
             raise NotImplementedError
 
+    def toPFA(self, options, context):
+        predicateTypes, modelType, modelData = self.treeData(context)
+
+        if predicateTypes == set(["SimplePredicate"]):
+            if context.storageType == "cell":
+                context.cells[context.storageName] = ast.Cell(context.avroTypeBuilder.makePlaceholder(json.dumps(modelType)), json.dumps(modelData), False, False, ast.CellPoolSource.EMBEDDED)
+                return [ast.Call("model.tree.simpleWalk", [
+                    ast.Ref("input"),
+                    ast.CellGet(context.storageName, []),
+                    ast.FcnDef([{"d": context.avroTypeBuilder.makePlaceholder('"DataDictionary"')}, {"t": context.avroTypeBuilder.makePlaceholder('"TreeNode"')}],
+                               context.avroTypeBuilder.makePlaceholder('"boolean"'),
+                               [ast.Call("model.tree.simpleTest", [ast.Ref("d"), ast.Ref("t")])])
+                    ])]
+
+            elif context.storageType == "pool":
+                poolName, itemName, refName = context.storageName
+                if poolName not in context.pools:
+                    context.pools[poolName] = ast.Pool(context.avroTypeBuilder.makePlaceholder(json.dumps(modelType)), {}, False, ast.CellPoolSource.EMBEDDED)
+                context.pools[poolName].init[itemName] = json.dumps(modelData)
+                return [ast.Call("model.tree.simpleWalk", [
+                    ast.Ref("input"),
+                    ast.PoolGet(context.storageName, []),
+                    ast.FcnDef([{"d": context.avroTypeBuilder.makePlaceholder('"DataDictionary"')}, {"t": context.avroTypeBuilder.makePlaceholder('"TreeNode"')}],
+                               context.avroTypeBuilder.makePlaceholder('"boolean"'),
+                               [ast.Call("model.tree.simpleTest", [ast.Ref("d"), ast.Ref("t")])])
+                    ])]
+
+        else:
+            if context.storageType == "cell":
+                context.cells[context.storageName] = ast.Cell(context.avroTypeBuilder.makePlaceholder(json.dumps(modelType)), json.dumps(modelData), False, False, ast.CellPoolSource.EMBEDDED)
+                return [ast.Call("model.tree.simpleWalk", [
+                    ast.Ref("input"),
+                    ast.CellGet(context.storageName, [LiteralString("operator")]),
+                    ast.CellGet(context.storageName, [LiteralString("comparisions")]),
+                    ast.FcnDef([{"d": context.avroTypeBuilder.makePlaceholder('"DataDictionary"')}, {"c": context.avroTypeBuilder.makePlaceholder('"Comparison"')}],
+                               context.avroTypeBuilder.makePlaceholder('"boolean"'),
+                               [ast.Call("model.tree.simpleTest", [ast.Ref("d"), ast.Ref("c")])])
+                    ])]
+
 class Trend(PmmlBinding):
     """Represents a <Trend> tag and provides methods to convert to PFA."""
     def toPFA(self, options, context):
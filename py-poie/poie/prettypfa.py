@@ -16,8 +16,11 @@
 
 import ast as pythonast
 import base64
+import hashlib
 import json as jsonlib
+import os
 import re
+import threading
 from collections import OrderedDict
 
 from poie.pfaast import Subs
@@ -1180,10 +1183,34 @@ class MiniAssignment(MiniAst):
         else:
             super(MiniAssignment, self).defType(state)
 
+def parseTableDirectory():
+    """Directory in which to cache the generated LALR tables for PrettyPFA.
+
+    Uses ``$POIE_CACHE_DIR`` if set (an empty value disables caching), otherwise ``$XDG_CACHE_HOME/poie`` or ``~/.cache/poie``.
+
+    :rtype: string or ``None``
+    :return: an existing, writable directory or ``None`` if tables should not be cached
+    """
+
+    if "POIE_CACHE_DIR" in os.environ:
+        directory = os.environ["POIE_CACHE_DIR"]
+    else:
+        directory = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "poie")
+    if not directory:
+        return None
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+    except (IOError, OSError):
+        return None
+    if not os.access(directory, os.W_OK):
+        return None
+    return directory
+
 class Parser(object):
     """Parser for the "ply" package, specialized for PrettyPFA (whole document or expression).
 
-    Includes both the tokenizer and the parser.
+    Includes both the tokenizer and the parser. A single ``Parser`` may be shared among threads; calls to ``parse`` are serialized.
     """
 
     def __init__(self, wholeDocument):
@@ -1194,6 +1221,25 @@ class Parser(object):
         """
         self.initialized = False
         self.wholeDocument = wholeDocument
+        self.lock = threading.RLock()
+
+    def ensureInitialized(self):
+        """Import ply and call ``initialize`` if this ``Parser`` has not been initialized yet.
+
+        :rtype: ``None``
+        :return: nothing
+        """
+
+        if not self.initialized:
+            with self.lock:
+                if not self.initialized:
+                    try:
+                        import ply.lex as lex
+                        import ply.yacc as yacc
+                    except ImportError:
+                        raise ImportError("ply (used to parse the PrettyPFA) is not available on your system")
+                    else:
+                        self.initialize(lex, yacc)
 
     def initialize(self, lex, yacc):
         """Initialize the ``Parser`` by passing it the appropriate ply modules.
@@ -2101,7 +2147,29 @@ class Parser(object):
                     offendingLine = "\n".join(insertArrow(lines[(lineno - 1):(lineno + 2)], 1))
                     raise PrettyPfaException("Parsing syntax error on line {0}:\n{1}".format(p.lineno, offendingLine))
 
-        self.yacc = yacc.yacc(debug=False, write_tables=False)
+        # the LALR tables depend only on the grammar, so cache them by a hash of the rules
+        grammarHash = hashlib.sha1(repr((tokens, literals, precedence, sorted((k, v.__doc__) for k, v in locals().items() if k.startswith("p_") and callable(v)))).encode("utf-8")).hexdigest()
+        directory = parseTableDirectory()
+        if directory is None:
+            self.yacc = yacc.yacc(debug=False, write_tables=False)
+        else:
+            tablePath = os.path.join(directory, "prettypfa-{0}-{1}.pickle".format("document" if self.wholeDocument else "expression", grammarHash))
+            if os.path.exists(tablePath):
+                # ply checks the grammar signature and regenerates if the file is stale or unreadable
+                self.yacc = yacc.yacc(debug=False, write_tables=False, picklefile=tablePath)
+            else:
+                temporaryPath = "{0}.{1}.tmp".format(tablePath, os.getpid())
+                try:
+                    self.yacc = yacc.yacc(debug=False, write_tables=False, picklefile=temporaryPath)
+                    os.replace(temporaryPath, tablePath)
+                except (IOError, OSError):
+                    if os.path.exists(temporaryPath):
+                        try:
+                            os.remove(temporaryPath)
+                        except OSError:
+                            pass
+                    self.yacc = yacc.yacc(debug=False, write_tables=False)
+
         self.initialized = True
 
     def parse(self, text, subs):
@@ -2115,20 +2183,22 @@ class Parser(object):
         :return: parsed text as an abstract syntax tree
         """
 
-        self.lexer.lineno = 1
-        self.text = text
-        self.subs = subs
-        out = self.yacc.parse(text, lexer=self.lexer)
-        if self.wholeDocument:
-            return out
-        else:
-            state = InterpretationState()
-            if isinstance(out, (list, tuple)):
-                out2 = [x.asExpr(state) for x in out]
+        self.ensureInitialized()
+        with self.lock:
+            self.lexer.lineno = 1
+            self.text = text
+            self.subs = subs
+            out = self.yacc.parse(text, lexer=self.lexer)
+            if self.wholeDocument:
+                return out
             else:
-                out2 = out.asExpr(state)
-            state.avroTypeBuilder.resolveTypes()
-            return out2
+                state = InterpretationState()
+                if isinstance(out, (list, tuple)):
+                    out2 = [x.asExpr(state) for x in out]
+                else:
+                    out2 = out.asExpr(state)
+                state.avroTypeBuilder.resolveTypes()
+                return out2
 
 ###
 
@@ -2174,15 +2244,6 @@ def ast(text, check=True, version=None, subs={}, **subs2):
 
     subs2.update(subs)
 
-    if not parser.initialized:
-        try:
-            import ply.lex as lex
-            import ply.yacc as yacc
-        except ImportError:
-            raise ImportError("ply (used to parse the PrettyPFA) is not available on your system")
-        else:
-            parser.initialize(lex, yacc)
-
     out = parser.parse(text, subs2)
 
     anysubs = lambda x: x
@@ -2276,15 +2337,6 @@ def ppfas(text, subs={}, **subs2):
 
     subs2.update(subs)
 
-    if not exprParser.initialized:
-        try:
-            import ply.lex as lex
-            import ply.yacc as yacc
-        except ImportError:
-            raise ImportError("ply (used to parse the PrettyPFA) is not available on your system")
-        else:
-            exprParser.initialize(lex, yacc)
-
     return exprParser.parse(text, subs2)
 
 def ppfa(text, subs={}, **subs2):
@@ -14,9 +14,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import csv
 import itertools
 import numbers
 import math
+import mmap
+import multiprocessing
 import json
 from collections import OrderedDict
 
@@ -27,10 +30,28 @@ from poie.datatype import ForwardDeclarationParser
 from poie.datatype import AvroUnion
 import poie.prettypfa
 
+_workerState = None
+_workerNode = None
+def _workerFieldGainTerm(args):
+    # runs in a forked worker process, which inherited _workerState from the parent
+    global _workerNode
+    offset, datasetSize, fieldIndex, histogram = args
+    dataset, predictand, maxSubsetSize, maxBins, categoricalSplits, indexes = _workerState
+    # consecutive candidates are often other fields of the same node
+    if _workerNode is None or _workerNode[0] != (offset, datasetSize):
+        node = TreeNode(dataset, predictand, maxSubsetSize, maxBins, indexes[offset:offset + datasetSize], categoricalSplits)
+        node.histograms = {}
+        node.prepareSplit()
+        _workerNode = ((offset, datasetSize), node)
+    node = _workerNode[1]
+    if histogram is not None:
+        node.histograms[fieldIndex] = histogram
+    return node.fieldGainTerm(fieldIndex)
+
 class Dataset(object):
     """Canonical format for providing a dataset to the tree-builder.
 
-    Constructors are __init__ and fromIterable.
+    Constructors are __init__, fromIterable, fromNumpy, fromPandas, fromCsv, and fromAvro.
     """
 
     class Field(object):
@@ -58,21 +79,52 @@ class Dataset(object):
         def add(self, v):
             self.data.append(v)
 
+        def addChunk(self, values):
+            """Adds many values at once, rather than one at a time with ``add``; call ``toNumpy`` when done.
+
+            Each chunk is converted to a Numpy array as it is added: numbers as floats, strings as integers in the order that they were first seen (``toNumpy`` renumbers them in sorted order), so the field never holds Python objects for more than one chunk.
+
+            :type values: 1-d Numpy array or Python sequence
+            :param values: numbers or strings, depending on this field's type
+            """
+
+            if not hasattr(self, "chunks"):
+                self.chunks = []
+                self.firstSeen = {}
+
+            if self.tpe == numbers.Real:
+                self.chunks.append(numpy.array(values, dtype=numpy.dtype(float)))
+            elif self.tpe == str:
+                values = numpy.asarray(values)
+                if values.dtype.kind != "U":
+                    values = values.astype(str)
+                unique, inverse = numpy.unique(values, return_inverse=True)
+                lookup = numpy.array([self.firstSeen.setdefault(x, len(self.firstSeen)) for x in unique.tolist()], dtype=numpy.dtype(numpy.int32))
+                self.chunks.append(lookup[inverse])
+
         def toNumpy(self):
             """Changes this field into a Numpy representation *in-place* (destructively replaces the old representation)."""
 
+            if len(self.data) > 0:
+                self.addChunk(self.data)
+            if not hasattr(self, "chunks"):
+                self.addChunk([])
+
             if self.tpe == numbers.Real:
-                self.data = numpy.array(self.data, dtype=numpy.dtype(float))
+                self.data = numpy.concatenate(self.chunks)
             elif self.tpe == str:
-                unique = sorted(set(self.data))
+                unique = sorted(self.firstSeen)
                 intToStr = dict(enumerate(unique))
                 strToInt = dict((x, i) for i, x in enumerate(unique))
-                converted = numpy.empty(len(self.data), dtype=numpy.dtype(int))
-                for i, x in enumerate(self.data):
-                    converted[i] = strToInt[x]
+                renumber = numpy.empty(len(unique), dtype=numpy.dtype(int))
+                for x, i in self.firstSeen.items():
+                    renumber[i] = strToInt[x]
                 self.intToStr = intToStr
                 self.strToInt = strToInt
-                self.data = converted
+                self.data = renumber[numpy.concatenate(self.chunks)]
+
+            del self.chunks
+            del self.firstSeen
             return self
 
         def select(self, selection):
@@ -93,8 +145,42 @@ class Dataset(object):
             if hasattr(self, "intToStr"):
                 out.intToStr = self.intToStr
                 out.strToInt = self.strToInt
+            if hasattr(self, "bins"):
+                out.bins = self.bins[selection]
+                out.binEdges = self.binEdges
+                out.maxBins = self.maxBins
             return out
 
+        def quantize(self, maxBins):
+            """Assigns each value of a numerical field to one of at most ``maxBins`` bins *in-place* (adds ``bins`` and ``binEdges`` to the Numpy representation).
+
+            If the field has no more than ``maxBins`` unique values, each gets its own bin and the bin edges are the midpoints between neighboring values, so histogram-based splits are the same as exact splits. Otherwise, the bin edges are placed at (approximate) quantiles of the data, again at midpoints between neighboring values.
+
+            A value ``x`` is in bin ``i`` if ``binEdges[i - 1] < x <= binEdges[i]``, so a cut at ``binEdges[i]`` (with "<=") passes bins ``0`` through ``i``.
+
+            :type maxBins: integer, at least 2
+            :param maxBins: maximum number of bins
+            """
+
+            sortedData = numpy.sort(self.data)
+            if len(sortedData) == 0:
+                uniques = sortedData
+            else:
+                uniques = sortedData[numpy.concatenate(([True], sortedData[1:] != sortedData[:-1]))]
+
+            if len(uniques) <= maxBins:
+                self.binEdges = (uniques[:-1] + uniques[1:]) / 2.0
+            else:
+                # lower edge of each quantile and the next unique value above it; the highest value can't be a lower edge
+                lowers = numpy.unique(sortedData[(numpy.arange(1, maxBins) * len(sortedData)) // maxBins])
+                lowers = lowers[lowers < uniques[-1]]
+                uppers = uniques[numpy.searchsorted(uniques, lowers, side="right")]
+                self.binEdges = (lowers + uppers) / 2.0
+
+            self.bins = numpy.searchsorted(self.binEdges, self.data, side="left").astype(numpy.min_scalar_type(len(self.binEdges)))
+            self.maxBins = maxBins
+            return self
+
         def toPython(self):
             """Changes this field into a Python representation *in-place* (destructively replaces the old representation)."""
 
@@ -110,7 +196,7 @@ class Dataset(object):
         self.names = names
 
     @classmethod
-    def fromIterable(cls, iterable, limit=None, names=None):
+    def fromIterable(cls, iterable, limit=None, names=None, chunkSize=100000):
         """Constructor for Dataset that takes a Python iterable (rows) of iterables (columns).
 
         Each row must have the same number of fields with the same types (``numbers.Real`` or ``basestring``).
@@ -121,13 +207,25 @@ class Dataset(object):
         :param limit: maximum number of input rows
         :type names: list of strings or ``None``
         :param names: names of the fields; if not provided, names like ``var0``, ``var1``, etc. will be generated.
+        :type chunkSize: positive integer
+        :param chunkSize: number of rows to transpose into columns and check at a time
         :rtype: pypoie.producer.cart.Dataset
         :return: a dataset
         """
 
+        iterator = iter(iterable)
+        if limit is not None:
+            iterator = itertools.islice(iterator, limit)
+
         fields = []
-        for lineNumber, line in enumerate(iterable):
+        lineNumber = 0
+        while True:
+            chunk = list(itertools.islice(iterator, chunkSize))
+            if len(chunk) == 0:
+                break
+
             if lineNumber == 0:
+                line = chunk[0]
                 for word in line:
                     if isinstance(word, numbers.Real):
                         fields.append(cls.Field(numbers.Real))
@@ -142,20 +240,258 @@ class Dataset(object):
                     if len(names) != len(fields):
                         raise ValueError("number of columns in dataset is not the same as the number of names")
 
-            if limit is not None and lineNumber >= limit:
-                break
+            if any(len(line) != len(fields) for line in chunk):
+                for i, line in enumerate(chunk):
+                    if len(line) != len(fields):
+                        raise ValueError("number of columns in dataset is not the same as the first: {0} on line {1}".format(len(line), lineNumber + i))
 
-            if len(line) != len(fields):
-                raise ValueError("number of columns in dataset is not the same as the first: {0} on line {1}".format(len(line), lineNumber))
+            # check the types of each column by the set of Python types it contains, rather than one cell at a time
+            for columnNumber, (column, field) in enumerate(zip(zip(*chunk), fields)):
+                if not all(issubclass(t, field.tpe) for t in set(map(type, column))):
+                    for i, word in enumerate(column):
+                        if not isinstance(word, field.tpe):
+                            raise ValueError("type of column {0} in dataset is not the same as the first: {1} on line {2}".format(columnNumber, type(word), lineNumber + i))
+                field.addChunk(column)
 
-            for columnNumber, (word, field) in enumerate(zip(line, fields)):
-                if isinstance(word, field.tpe):
-                    field.add(word)
-                else:
-                    raise ValueError("type of column {0} in dataset is not the same as the first: {1} on line {2}".format(columnNumber, type(word), lineNumber))
+            lineNumber += len(chunk)
 
         return cls([x.toNumpy() for x in fields], names)
 
+    @classmethod
+    def fromColumns(cls, columns, names, chunkSize=1000000):
+        """Constructor for Dataset that takes a sequence of 1-d Numpy arrays (columns).
+
+        Columns with boolean, integer, or floating-point dtypes become numerical fields; all others become categorical fields, converted to strings and encoded ``chunkSize`` values at a time.
+
+        :type columns: list of 1-d Numpy arrays
+        :param columns: input dataset
+        :type names: list of strings
+        :param names: names of the fields
+        :type chunkSize: positive integer
+        :param chunkSize: number of values to encode at a time
+        :rtype: pypoie.producer.cart.Dataset
+        :return: a dataset
+        """
+
+        if len(names) != len(columns):
+            raise ValueError("number of columns in dataset is not the same as the number of names")
+
+        fields = []
+        for column in columns:
+            column = numpy.asarray(column)
+            if column.dtype.kind in "biuf":
+                field = cls.Field(numbers.Real)
+                field.data = numpy.array(column, dtype=numpy.dtype(float))
+            else:
+                field = cls.Field(str)
+                for start in range(0, len(column), chunkSize):
+                    field.addChunk(column[start:start + chunkSize])
+                field.toNumpy()
+            fields.append(field)
+
+        if len(set(len(field.data) for field in fields)) > 1:
+            raise ValueError("columns of dataset do not all have the same length")
+
+        return cls(fields, list(names))
+
+    @classmethod
+    def fromNumpy(cls, array, names=None, chunkSize=1000000):
+        """Constructor for Dataset that takes a Numpy structured array (record fields are columns) or a 2-d numerical Numpy array.
+
+        :type array: Numpy structured array or 2-d Numpy array
+        :param array: input dataset
+        :type names: list of strings or ``None``
+        :param names: names of the fields; if not provided, the structured array's field names or names like ``var0``, ``var1``, etc. will be used.
+        :type chunkSize: positive integer
+        :param chunkSize: number of categorical values to encode at a time (see ``fromColumns``)
+        :rtype: pypoie.producer.cart.Dataset
+        :return: a dataset
+        """
+
+        if array.dtype.names is not None:
+            columns = [array[name] for name in array.dtype.names]
+            if names is None:
+                names = list(array.dtype.names)
+        elif len(array.shape) == 2:
+            columns = [array[:,i] for i in range(array.shape[1])]
+            if names is None:
+                formatter = "var{0:0%dd}" % len(str(len(columns)))
+                names = [formatter.format(i) for i in range(len(columns))]
+        else:
+            raise ValueError("array must be a structured array or two-dimensional")
+
+        return cls.fromColumns(columns, names, chunkSize)
+
+    @classmethod
+    def fromPandas(cls, dataFrame, names=None, chunkSize=1000000):
+        """Constructor for Dataset that takes a Pandas DataFrame.
+
+        Numerical columns become numerical fields; all others (including Pandas categoricals) become categorical fields.
+
+        :type dataFrame: ``pandas.DataFrame``
+        :param dataFrame: input dataset
+        :type names: list of strings or ``None``
+        :param names: names of the fields; if not provided, the DataFrame's column names will be used.
+        :type chunkSize: positive integer
+        :param chunkSize: number of categorical values to encode at a time (see ``fromColumns``)
+        :rtype: pypoie.producer.cart.Dataset
+        :return: a dataset
+        """
+
+        columns = [dataFrame[name].to_numpy() for name in dataFrame.columns]
+        if names is None:
+            names = [str(name) for name in dataFrame.columns]
+        return cls.fromColumns(columns, names, chunkSize)
+
+    @classmethod
+    def fromCsv(cls, fileName, names=None, types=None, header=True, delimiter=",", limit=None, chunkSize=100000):
+        """Constructor for Dataset that reads a CSV file, ``chunkSize`` rows at a time.
+
+        :type fileName: string or open filehandle
+        :param fileName: CSV file
+        :type names: list of strings or ``None``
+        :param names: names of the fields; if not provided, the header or names like ``var0``, ``var1``, etc. will be used.
+        :type types: list of ``numbers.Real`` and ``str`` or ``None``
+        :param types: type of each field; if not provided, columns whose first value can be parsed as a number are numerical and all others are categorical
+        :type header: bool
+        :param header: if ``True``, the first row contains field names
+        :type delimiter: string
+        :param delimiter: field separator
+        :type limit: positive integer or ``None``
+        :param limit: maximum number of input rows (not counting the header)
+        :type chunkSize: positive integer
+        :param chunkSize: number of rows to convert at a time
+        :rtype: pypoie.producer.cart.Dataset
+        :return: a dataset
+        """
+
+        if isinstance(fileName, str):
+            stream = open(fileName, newline="")
+        else:
+            stream = fileName
+
+        try:
+            reader = csv.reader(stream, delimiter=delimiter)
+            if header:
+                headerNames = next(reader)
+                if names is None:
+                    names = headerNames
+            if limit is not None:
+                reader = itertools.islice(reader, limit)
+
+            fields = None
+            lineNumber = 0
+            while True:
+                chunk = list(itertools.islice(reader, chunkSize))
+                if len(chunk) == 0:
+                    break
+
+                if fields is None:
+                    if types is None:
+                        types = []
+                        for word in chunk[0]:
+                            try:
+                                float(word)
+                            except ValueError:
+                                types.append(str)
+                            else:
+                                types.append(numbers.Real)
+                    fields = [cls.Field(t) for t in types]
+                    if names is None:
+                        formatter = "var{0:0%dd}" % len(str(len(fields)))
+                        names = [formatter.format(i) for i in range(len(fields))]
+                    elif len(names) != len(fields):
+                        raise ValueError("number of columns in dataset is not the same as the number of names")
+
+                for i, line in enumerate(chunk):
+                    if len(line) != len(fields):
+                        raise ValueError("number of columns in dataset is not the same as the first: {0} on line {1}".format(len(line), lineNumber + i))
+
+                for columnNumber, (column, field) in enumerate(zip(zip(*chunk), fields)):
+                    try:
+                        field.addChunk(column)
+                    except ValueError as err:
+                        raise ValueError("column {0} in dataset has a value that is not a number between lines {1} and {2}: {3}".format(columnNumber, lineNumber, lineNumber + len(chunk) - 1, str(err)))
+
+                lineNumber += len(chunk)
+
+        finally:
+            if isinstance(fileName, str):
+                stream.close()
+
+        if fields is None:
+            fields = [cls.Field(t) for t in (types if types is not None else [])]
+            if names is None:
+                names = []
+        return cls([x.toNumpy() for x in fields], names)
+
+    @classmethod
+    def fromAvro(cls, fileName, names=None, limit=None, chunkSize=100000):
+        """Constructor for Dataset that reads an Avro container file of records, one block at a time.
+
+        Fields of type boolean, int, long, float, and double become numerical fields; fields of type string and enum become categorical fields. All other fields are ignored unless named in ``names``, in which case they are an error.
+
+        :type fileName: string or open binary filehandle
+        :param fileName: Avro file
+        :type names: list of strings or ``None``
+        :param names: names of the record fields to use; if not provided, all numerical and categorical fields
+        :type limit: positive integer or ``None``
+        :param limit: maximum number of input records
+        :type chunkSize: positive integer
+        :param chunkSize: approximate number of records to convert at a time
+        :rtype: pypoie.producer.cart.Dataset
+        :return: a dataset
+        """
+
+        import poie.avrocodec
+        from poie.datatype import AvroRecord, AvroBoolean, AvroInt, AvroLong, AvroFloat, AvroDouble, AvroString, AvroEnum
+
+        if isinstance(fileName, str):
+            stream = open(fileName, "rb")
+        else:
+            stream = fileName
+
+        try:
+            reader = poie.avrocodec.AvroDataFileReader(stream)
+            if not isinstance(reader.avroType, AvroRecord):
+                raise ValueError("Avro file must contain records, not {0}".format(reader.avroType))
+
+            types = {}
+            for field in reader.avroType.fields:
+                if isinstance(field.avroType, (AvroBoolean, AvroInt, AvroLong, AvroFloat, AvroDouble)):
+                    types[field.name] = numbers.Real
+                elif isinstance(field.avroType, (AvroString, AvroEnum)):
+                    types[field.name] = str
+            if names is None:
+                names = [field.name for field in reader.avroType.fields if field.name in types]
+            for name in names:
+                if name not in types:
+                    raise ValueError("Avro field {0} must be a number, string, or enum".format(repr(name)))
+            fields = [cls.Field(types[name]) for name in names]
+
+            numRecords = 0
+            chunk = []
+            for block in reader.blocks():
+                if limit is not None:
+                    block = block[:limit - numRecords]
+                chunk.extend(block)
+                numRecords += len(block)
+                if len(chunk) >= chunkSize or (limit is not None and numRecords >= limit):
+                    for name, field in zip(names, fields):
+                        field.addChunk([record[name] for record in chunk])
+                    chunk = []
+                if limit is not None and numRecords >= limit:
+                    break
+            if len(chunk) > 0:
+                for name, field in zip(names, fields):
+                    field.addChunk([record[name] for record in chunk])
+
+        finally:
+            if isinstance(fileName, str):
+                stream.close()
+
+        return cls([x.toNumpy() for x in fields], list(names))
+
     def __len__(self):
         return len(self.fields[0].data)
 
@@ -168,10 +504,12 @@ class TreeNode(object):
     The constructors are ``__init__`` and ``fromWholeDataset``.
 
     Tree-building is initiated by calling ``splitUntil(condition)``, where ``condition(node, depth)`` is a user-supplied function that takes a node (poie.producer.cart.TreeNode) and depth (integer) and returns bool (``True``: continue splitting; ``False``: stop splitting).
+
+    Every node's ``dataset`` and ``predictand`` are the whole training set; the data points that belong to a node are its ``indexes``, and ``nodeData``, ``nodeDataset``, and ``nodePredictand`` extract them.
     """
 
     @classmethod
-    def fromWholeDataset(cls, wholeDataset, predictandName, maxSubsetSize=None):
+    def fromWholeDataset(cls, wholeDataset, predictandName, maxSubsetSize=None, maxBins=None, categoricalSplits=None):
         """Constructor for a tree from a dataset that includes the predictand (that which we try to purify in the leaves) as one of its fields.
 
         :type wholeDataset: pypoie.producer.cart.Dataset
@@ -179,7 +517,11 @@ class TreeNode(object):
         :type predictandName: string
         :param predictandName: name of the predictand, to be taken out of the dataset
         :type maxSubsetSize: positive integer or ``None``
-        :param maxSubsetSize: maximum size of subset splits of categorical regressors (approximation for optimization in ``categoricalEntropyGainTerm`` and ``categoricalNVarianceGainTerm``)
+        :param maxSubsetSize: maximum size of subset splits of categorical regressors in exhaustive search (approximation for optimization in ``categoricalEntropyGainTerm`` and ``categoricalNVarianceGainTerm``)
+        :type maxBins: integer, at least 2, or ``None``
+        :param maxBins: if not ``None``, quantize numerical regressors into at most this many bins and search for splits with histograms (approximation for optimization in ``numericalHistogramEntropyGainTerm`` and ``numericalHistogramNVarianceGainTerm``); if ``None``, search all cut values exactly
+        :type categoricalSplits: "ordered", "exhaustive", or ``None``
+        :param categoricalSplits: "ordered" to search categorical regressors in order of their predictand means or class fractions (see ``categoricalOrderedNVarianceGainTerm`` and ``categoricalOrderedEntropyGainTerm``); "exhaustive" to try every subset (see ``categoricalNVarianceGainTerm`` and ``categoricalEntropyGainTerm``); ``None`` for "exhaustive" if ``maxSubsetSize`` is given and "ordered" otherwise
         :rtype: pypoie.producer.cart.TreeNode
         :return: an unsplit tree
         """
@@ -189,36 +531,66 @@ class TreeNode(object):
                           wholeDataset.names[:predictandIndex] + wholeDataset.names[(predictandIndex + 1):])
         predictand = wholeDataset.fields[predictandIndex]
         maxSubsetSize = maxSubsetSize
-        return cls(dataset, predictand, maxSubsetSize)
+        return cls(dataset, predictand, maxSubsetSize, maxBins, None, categoricalSplits)
 
-    def __init__(self, dataset, predictand, maxSubsetSize=None):
+    def __init__(self, dataset, predictand, maxSubsetSize=None, maxBins=None, indexes=None, categoricalSplits=None):
         """Constructor for a tree from a dataset of regressors (that which we split) and a predictand (that which we try to purify in the leaves).
 
+        All nodes of a tree share the same ``dataset`` and ``predictand``; each node only has an array of the ``indexes`` of its data points. Splitting a node partitions its ``indexes`` *in-place* (data points that pass the cut first, then those that fail, each in their original order) and its branches get the two halves as Numpy views, so the whole tree needs one index array, rather than a copy of the dataset for each level.
+
         :type dataset: pypoie.producer.cart.Dataset
         :param dataset: dataset of regressors only
         :type predictand: 1-d Numpy array
         :param predictand: predictands in a separate array with the same number of rows as the ``dataset``
         :type maxSubsetSize: positive integer or ``None``
-        :param maxSubsetSize: maximum size of subset splits of categorical regressors (approximation for optimization in ``categoricalEntropyGainTerm`` and ``categoricalNVarianceGainTerm``)
+        :param maxSubsetSize: maximum size of subset splits of categorical regressors in exhaustive search (approximation for optimization in ``categoricalEntropyGainTerm`` and ``categoricalNVarianceGainTerm``)
+        :type maxBins: integer, at least 2, or ``None``
+        :param maxBins: if not ``None``, quantize numerical regressors into at most this many bins and search for splits with histograms (approximation for optimization in ``numericalHistogramEntropyGainTerm`` and ``numericalHistogramNVarianceGainTerm``); if ``None``, search all cut values exactly
+        :type categoricalSplits: "ordered", "exhaustive", or ``None``
+        :param categoricalSplits: "ordered" to search categorical regressors in order of their predictand means or class fractions (see ``categoricalOrderedNVarianceGainTerm`` and ``categoricalOrderedEntropyGainTerm``); "exhaustive" to try every subset (see ``categoricalNVarianceGainTerm`` and ``categoricalEntropyGainTerm``); ``None`` for "exhaustive" if ``maxSubsetSize`` is given and "ordered" otherwise
+        :type indexes: 1-d Numpy array of integers or ``None``
+        :param indexes: rows of the ``dataset`` and ``predictand`` that belong to this node (reordered by ``splitOnce``); if ``None``, all rows
         """
 
+        if maxBins is not None and (not isinstance(maxBins, numbers.Integral) or maxBins < 2):
+            raise TypeError("maxBins must be an integer of at least 2 or None")
+        if categoricalSplits is None:
+            categoricalSplits = "ordered" if maxSubsetSize is None else "exhaustive"
+        if categoricalSplits not in ("ordered", "exhaustive"):
+            raise TypeError("categoricalSplits must be \"ordered\", \"exhaustive\", or None")
+        if categoricalSplits == "ordered" and maxSubsetSize is not None:
+            raise TypeError("maxSubsetSize only applies to exhaustive categoricalSplits")
+
         self.dataset = dataset
         self.predictand = predictand
         self.maxSubsetSize = maxSubsetSize
+        self.maxBins = maxBins
+        self.categoricalSplits = categoricalSplits
 
-        self.datasetSize = len(self.predictand.data)
+        if indexes is None:
+            indexes = numpy.arange(len(self.predictand.data))
+        self.indexes = indexes
+
+        # quantize once at the root; branches share the same quantized fields
+        if maxBins is not None:
+            for field in self.dataset.fields:
+                if field.tpe == numbers.Real and getattr(field, "maxBins", None) != maxBins:
+                    field.quantize(maxBins)
+
+        self.datasetSize = len(self.indexes)
+        predictandData = self.nodeData(self.predictand)
 
         if self.predictand.tpe == numbers.Real:
             try:
-                self.predictandUnique = numpy.unique(self.predictand.data)
+                self.predictandUnique = numpy.unique(predictandData)
             except TypeError:
-                self.predictandUnique = numpy.unique1d(self.predictand.data)
+                self.predictandUnique = numpy.unique1d(predictandData)
 
         elif self.predictand.tpe == str:
             if self.datasetSize > 0:
                 self.predictandDistribution = []
                 for category in range(len(self.predictand.intToStr)):
-                    frac = 1.0 * numpy.sum(self.predictand.data == category) / len(self.predictand.data)
+                    frac = 1.0 * numpy.sum(predictandData == category) / len(predictandData)
                     self.predictandDistribution.append(frac)
             else:
                 self.predictandDistribution = [0.0] * len(self.predictand.intToStr)
@@ -226,6 +598,37 @@ class TreeNode(object):
         else:
             raise RuntimeError
 
+    def nodeData(self, field, attribute="data"):
+        """Values of a field of the shared dataset (regressor or predictand) for the data points in this node.
+
+        :type field: pypoie.producer.cart.Dataset.Field
+        :param field: field in its Numpy representation
+        :type attribute: string
+        :param attribute: "data" for the values themselves, "bins" for the bin numbers of a quantized field (see ``Dataset.Field.quantize``)
+        :rtype: 1-d Numpy array
+        :return: a new array with ``datasetSize`` values
+        """
+
+        return getattr(field, attribute)[self.indexes]
+
+    def nodeDataset(self):
+        """Regressors of the data points in this node (``dataset`` is the whole training set, shared by all nodes).
+
+        :rtype: pypoie.producer.cart.Dataset
+        :return: a new dataset with ``datasetSize`` rows, independent of the tree
+        """
+
+        return Dataset([field.select(self.indexes) for field in self.dataset.fields], list(self.dataset.names))
+
+    def nodePredictand(self):
+        """Predictand of the data points in this node (``predictand`` is the whole training set's, shared by all nodes).
+
+        :rtype: pypoie.producer.cart.Dataset.Field
+        :return: a new field with ``datasetSize`` values, independent of the tree
+        """
+
+        return self.predictand.select(self.indexes)
+
     def splitComplete(self):
         """Convenience function for building up a tree until each leaf has only one unique value. Calls ``splitUntil``."""
 
@@ -247,7 +650,9 @@ class TreeNode(object):
 
         If the predictand is categorical (``basestring``), the node has attributes: ``datasetSize``, ``predictandDistribution``, ``entropy``, and ``gain``.
 
-        Splits are performed *in-place*, changing this ``TreeNode``.
+        The node's ``dataset`` and ``predictand`` are the whole training set; use ``nodeDataset()`` and ``nodePredictand()`` (or ``nodeData``) for the data points in the node.
+
+        Splits are performed *in-place*, changing this ``TreeNode``; a node can only be split once.
 
         :type condition: callable that takes node (poie.producer.cart.TreeNode) and depth (integer) and returns bool (``True``: continue splitting; ``False``: stop splitting).
         :param condition: splitting condition function
@@ -261,6 +666,67 @@ class TreeNode(object):
                 self.passBranch.splitUntil(condition, depth + 1)
                 self.failBranch.splitUntil(condition, depth + 1)
 
+    def splitLevelWise(self, condition, processes=None):
+        """Performs the same tree-split as ``splitUntil``, but one depth at a time, evaluating the best split of every field of every node at that depth together, possibly in parallel.
+
+        The result is identical to ``splitUntil``'s, regardless of the number of processes: each (node, field) candidate is computed by the same code on the same data in the same order, and ``chooseSplit`` breaks ties in field order. Only the order in which ``condition`` is called differs (all nodes of one depth before any of the next).
+
+        Worker processes are forked after the dataset exists, so they share its memory with this process, and this node's index array is moved into shared memory so that they see each level's partitioning; each candidate only sends a range of that array and receives a gain and a split. In histogram mode, this process fills the histograms and sends them with the candidates.
+
+        :type condition: callable that takes node (poie.producer.cart.TreeNode) and depth (integer) and returns bool (``True``: continue splitting; ``False``: stop splitting).
+        :param condition: splitting condition function
+        :type processes: positive integer or ``None``
+        :param processes: number of worker processes; ``None`` or ``1`` evaluates the candidates in this process
+        """
+
+        global _workerState
+        pool = None
+        if processes is not None and processes > 1:
+            sharedIndexes = numpy.frombuffer(mmap.mmap(-1, max(self.indexes.nbytes, 1)), dtype=self.indexes.dtype, count=len(self.indexes))
+            sharedIndexes[:] = self.indexes
+            self.indexes = sharedIndexes
+            _workerState = (self.dataset, self.predictand, self.maxSubsetSize, self.maxBins, self.categoricalSplits, sharedIndexes)
+            try:
+                pool = multiprocessing.get_context("fork").Pool(processes)
+            finally:
+                _workerState = None
+
+        try:
+            numFields = len(self.dataset.fields)
+            level = [self]
+            depth = 1
+            while len(level) > 0:
+                level = [node for node in level if node.canSplit()]
+                for node in level:
+                    node.prepareSplit()
+
+                if pool is None:
+                    gainTerms = [node.fieldGainTerm(fieldIndex) for node in level for fieldIndex in range(numFields)]
+                else:
+                    tasks = []
+                    for node in level:
+                        offset = (node.indexes.ctypes.data - self.indexes.ctypes.data) // self.indexes.itemsize
+                        for fieldIndex in range(numFields):
+                            histogram = node.histograms.get(fieldIndex) if self.maxBins is not None else None
+                            tasks.append((offset, node.datasetSize, fieldIndex, histogram))
+                    gainTerms = pool.map(_workerFieldGainTerm, tasks)
+
+                nextLevel = []
+                for nodeIndex, node in enumerate(level):
+                    node.chooseSplit(gainTerms[nodeIndex * numFields : (nodeIndex + 1) * numFields])
+                    node.partition()
+                    if hasattr(node, "passBranch") and hasattr(node, "failBranch") and condition(node, depth):
+                        nextLevel.append(node.passBranch)
+                        nextLevel.append(node.failBranch)
+
+                level = nextLevel
+                depth += 1
+
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
     def canSplit(self):
         """Returns ``True`` if it is possible to split the predictand; ``False`` otherwise."""
 
@@ -275,7 +741,7 @@ class TreeNode(object):
         """Returns the best score at this ``TreeNode``, which might or might not be a leaf."""
 
         if self.predictand.tpe == numbers.Real:
-            return numpy.mean(self.predictand.data)
+            return numpy.mean(self.nodeData(self.predictand))
         elif self.predictand.tpe == str:
             return self.predictand.intToStr[numpy.argmax(self.predictandDistribution)]
         else:
@@ -285,102 +751,160 @@ class TreeNode(object):
         """Compute an optimized split in one field, adding two new ``TreeNodes`` below this one.
 
         If the predictand is numerical (``numbers.Real``), the split minimizes entropy; if categorical (``basestring``), it minimizes n-times-variance.
+
+        This is ``prepareSplit``, ``fieldGainTerm`` for each field, ``chooseSplit``, and ``partition``; ``splitLevelWise`` calls the same steps for many nodes at once.
+
+        Raises ``RuntimeError`` if this node has already been split (its branches are views of its ``indexes``, so they can't be replaced).
         """
 
+        self.checkUnsplit()
+        self.prepareSplit()
+        self.chooseSplit([self.fieldGainTerm(fieldIndex) for fieldIndex in range(len(self.dataset.fields))])
+        self.partition()
+
+    def checkUnsplit(self):
+        """Raise ``RuntimeError`` if this node already has branches."""
+
+        if hasattr(self, "passBranch") or hasattr(self, "failBranch"):
+            raise RuntimeError("TreeNode has already been split; its indexes are shared with its branches, so it can't be split again")
+
+    def prepareSplit(self):
+        """Compute the part of the gain that doesn't depend on the split (``nTimesVariance`` or ``entropy`` of the unsplit node) and, in histogram mode, this node's histograms if it doesn't have them yet."""
+
+        if self.maxBins is not None and not hasattr(self, "histograms"):
+            self.histograms = self.fillHistograms()
+
         # build a regression tree using n-times-variance as the metric to optimize
         if self.predictand.tpe == numbers.Real:
-            self.nTimesVariance = len(self.predictand.data) * numpy.var(self.predictand.data)
-
-            self.gain = None
-            self.split = None
-            self.fieldIndex = None
-            self.field = None
-            # for each field...
-            for fieldIndex, field in enumerate(self.dataset.fields):
-                if field.tpe == numbers.Real:
-                    gainTerm, split = self.numericalNVarianceGainTerm(field)
-                elif field.tpe == str:
-                    gainTerm, split = self.categoricalNVarianceGainTerm(field, self.maxSubsetSize)
-                else:
-                    raise RuntimeError
+            self.nTimesVariance = self.datasetSize * numpy.var(self.nodeData(self.predictand))
 
-                # the gainTerm functions don't include this constant (n-times-variance of the unsplit node)
-                gainTerm += self.nTimesVariance
-
-                # ... and keep track of the best field, best split
-                if self.gain is None or gainTerm > self.gain:
-                    self.gain = gainTerm
-                    self.split = split
-                    self.fieldIndex = fieldIndex
-                    self.field = field
-            
         # build a classification tree using entropy as the metric to optimize
         elif self.predictand.tpe == str:
-            # find the best split by maximizing entropic gain
             self.entropy = 0.0
             for frac in self.predictandDistribution:
                 if frac != 0.0:
                     self.entropy -= frac * numpy.log2(frac)
 
-            self.gain = None
-            self.split = None
-            self.fieldIndex = None
-            self.field = None
-            # for each field...
-            for fieldIndex, field in enumerate(self.dataset.fields):
-                # go to a function that finds the best choice for that field
-                if field.tpe == numbers.Real:
-                    gainTerm, split = self.numericalEntropyGainTerm(field)
-                elif field.tpe == str:
-                    gainTerm, split = self.categoricalEntropyGainTerm(field, self.maxSubsetSize)
-                else:
-                    raise RuntimeError
+        else:
+            raise RuntimeError
+
+    def fieldGainTerm(self, fieldIndex):
+        """Find the best split in one field by going to a function that finds the best choice for that type of field and predictand.
+
+        :type fieldIndex: non-negative integer
+        :param fieldIndex: index of the field in the dataset
+        :rtype: (number, number or tuple of integers)
+        :return: (best gain term, best cut value or best combination of regressor categories)
+        """
+
+        field = self.dataset.fields[fieldIndex]
+
+        if self.predictand.tpe == numbers.Real:
+            if field.tpe == numbers.Real and self.maxBins is not None:
+                return self.numericalHistogramNVarianceGainTerm(self.histograms[fieldIndex], field.binEdges)
+            elif field.tpe == numbers.Real:
+                return self.numericalNVarianceGainTerm(field)
+            elif field.tpe == str and self.categoricalSplits == "ordered":
+                return self.categoricalOrderedNVarianceGainTerm(field)
+            elif field.tpe == str:
+                return self.categoricalNVarianceGainTerm(field, self.maxSubsetSize)
+            else:
+                raise RuntimeError
+
+        elif self.predictand.tpe == str:
+            if field.tpe == numbers.Real and self.maxBins is not None:
+                return self.numericalHistogramEntropyGainTerm(self.histograms[fieldIndex], field.binEdges)
+            elif field.tpe == numbers.Real:
+                return self.numericalEntropyGainTerm(field)
+            elif field.tpe == str and self.categoricalSplits == "ordered":
+                return self.categoricalOrderedEntropyGainTerm(field)
+            elif field.tpe == str:
+                return self.categoricalEntropyGainTerm(field, self.maxSubsetSize)
+            else:
+                raise RuntimeError
+
+        else:
+            raise RuntimeError
 
-                # the gainTerm functions don't include this constant (entropy of the unsplit node)
-                gainTerm += self.entropy
+    def chooseSplit(self, gainTerms):
+        """Keep the best field, best split (sets ``gain``, ``split``, ``fieldIndex``, and ``field``).
 
-                # ... and keep track of the best field, best split
-                if self.gain is None or gainTerm > self.gain:
-                    self.gain = gainTerm
-                    self.split = split
-                    self.fieldIndex = fieldIndex
-                    self.field = field
+        Fields are compared in order and a later field must have a strictly larger gain to win, so ties go to the first field no matter how the gain terms were computed.
+
+        :type gainTerms: list of (number, number or tuple of integers)
+        :param gainTerms: result of ``fieldGainTerm`` for each field, in field order
+        """
 
+        # the gainTerm functions don't include this constant (n-times-variance or entropy of the unsplit node)
+        if self.predictand.tpe == numbers.Real:
+            constant = self.nTimesVariance
+        elif self.predictand.tpe == str:
+            constant = self.entropy
         else:
             raise RuntimeError
 
-        # construct a new dataset by splitting the best field, best split
+        self.gain = None
+        self.split = None
+        self.fieldIndex = None
+        self.field = None
+        # for each field...
+        for fieldIndex, (gainTerm, split) in enumerate(gainTerms):
+            gainTerm += constant
+
+            # ... and keep track of the best field, best split
+            if self.gain is None or gainTerm > self.gain:
+                self.gain = gainTerm
+                self.split = split
+                self.fieldIndex = fieldIndex
+                self.field = self.dataset.fields[fieldIndex]
+
+    def partition(self):
+        """Add two new ``TreeNodes`` below this one for the data that pass and fail the split chosen by ``chooseSplit``, unless one of them would be empty.
+
+        In histogram mode (``maxBins`` is not ``None``), the new ``TreeNodes`` get their histograms from this one: the smaller branch fills its histograms from its data and the larger branch subtracts those from this node's histograms, so each level of the tree costs O(n) rather than O(n log n).
+
+        Raises ``RuntimeError`` if this node has already been split.
+        """
+
+        self.checkUnsplit()
+
+        # select the data points in this node that pass the best field, best split
         if self.field.tpe == numbers.Real:
-            passSelection = self.field.data <= self.split
+            passSelection = self.nodeData(self.field) <= self.split
         elif self.field.tpe == str:
-            passSelection = numpy.in1d(self.field.data, self.split)
-        failSelection = numpy.logical_not(passSelection)
+            passSelection = numpy.in1d(self.nodeData(self.field), self.split)
+        numPass = numpy.count_nonzero(passSelection)
 
-        passDataset = Dataset([], self.dataset.names)
-        for field in self.dataset.fields:
-            passDataset.fields.append(field.select(passSelection))
+        if numPass > 0 and numPass < self.datasetSize:
+            # partition this node's indexes in-place (stable, so that branches see their data in the same order as a copy would have)
+            self.indexes[:] = numpy.concatenate((self.indexes[passSelection], self.indexes[numpy.logical_not(passSelection)]))
 
-        failDataset = Dataset([], self.dataset.names)
-        for field in self.dataset.fields:
-            failDataset.fields.append(field.select(failSelection))
+            # create two new tree nodes, one with the data that pass the cut, the other with the data that fail
+            self.passBranch = TreeNode(self.dataset, self.predictand, self.maxSubsetSize, self.maxBins, self.indexes[:numPass], self.categoricalSplits)
+            self.failBranch = TreeNode(self.dataset, self.predictand, self.maxSubsetSize, self.maxBins, self.indexes[numPass:], self.categoricalSplits)
 
-        if len(passDataset) > 0 and len(failDataset) > 0:
-            passPredictand = self.predictand.select(passSelection)
-            failPredictand = self.predictand.select(failSelection)
+            # sibling subtraction: only the smaller branch has to be binned
+            if self.maxBins is not None:
+                if self.passBranch.datasetSize <= self.failBranch.datasetSize:
+                    smaller, larger = self.passBranch, self.failBranch
+                else:
+                    smaller, larger = self.failBranch, self.passBranch
+                smaller.histograms = smaller.fillHistograms()
+                larger.histograms = dict((fieldIndex, histogram - smaller.histograms[fieldIndex]) for fieldIndex, histogram in self.histograms.items())
 
-            # create two new tree nodes, one with the data that pass the cut, the other with the data that fail
-            self.passBranch = TreeNode(passDataset, passPredictand, self.maxSubsetSize)
-            self.failBranch = TreeNode(failDataset, failPredictand, self.maxSubsetSize)
+        if self.maxBins is not None:
+            del self.histograms
 
     def numericalEntropyGainTerm(self, field):
         """Split a numerical predictor in such a way that maximizes entropic gain above and below the threshold of the split."""
 
         # sort values so that we can use running sums (numpy.cumsum)
-        sortedIndexes = numpy.argsort(field.data, kind="heapsort")
+        fieldData = self.nodeData(field)
+        sortedIndexes = numpy.argsort(fieldData, kind="heapsort")
 
         # work with the predictor (values) and predictand (categories) for ascending values of the predictor
-        values = field.data[sortedIndexes]
-        categories = self.predictand.data[sortedIndexes]
+        values = fieldData[sortedIndexes]
+        categories = self.nodeData(self.predictand)[sortedIndexes]
         
         # for normalizing
         numInSelection = numpy.arange(1, self.datasetSize + 1, dtype=numpy.dtype(float))
@@ -444,16 +968,18 @@ class TreeNode(object):
         """
 
         # get a selection array for each category of the variable we want to use to make the prediciton
+        fieldData = self.nodeData(field)
+        predictandData = self.nodeData(self.predictand)
         numPredictorCategories = len(field.strToInt)
         predictorSelection = numpy.zeros((self.datasetSize, numPredictorCategories), dtype=numpy.dtype(bool))
         for predictorCategory in range(numPredictorCategories):
-            predictorSelection[:,predictorCategory] = (field.data == predictorCategory)
+            predictorSelection[:,predictorCategory] = (fieldData == predictorCategory)
 
         # get a selection array for each category that we want to predict
         numPredictandCategories = len(self.predictand.strToInt)
         predictandSelection = numpy.zeros((self.datasetSize, numPredictandCategories), dtype=numpy.dtype(bool))
         for predictandCategory in range(numPredictandCategories):
-            predictandSelection[:,predictandCategory] = (self.predictand.data == predictandCategory)
+            predictandSelection[:,predictandCategory] = (predictandData == predictandCategory)
 
         # combine them for all combinations of predictor category and predictand category
         # bitwise_and is equivalent to logical_and (for these boolean arrays) and faster
@@ -523,11 +1049,12 @@ class TreeNode(object):
         """
 
         # sort values so that we can use running sums (numpy.cumsum)
-        sortedIndexes = numpy.argsort(field.data, kind="heapsort")
+        fieldData = self.nodeData(field)
+        sortedIndexes = numpy.argsort(fieldData, kind="heapsort")
 
         # work with the predictor (values) and predictand (predictands) for ascending values of the predictor
-        values = field.data[sortedIndexes]
-        predictands = self.predictand.data[sortedIndexes]
+        values = fieldData[sortedIndexes]
+        predictands = self.nodeData(self.predictand)[sortedIndexes]
 
         # compute less-than-or-equal-to sums for each index using Numpy
         sum1sel = numpy.arange(1, len(values) + 1, dtype=numpy.dtype(float))
@@ -562,6 +1089,247 @@ class TreeNode(object):
 
         return gainTerm, cutValue
 
+    def fillHistograms(self):
+        """Fill a histogram of the predictand for each quantized numerical field, as used by ``numericalHistogramEntropyGainTerm`` and ``numericalHistogramNVarianceGainTerm``.
+
+        If the predictand is numerical (``numbers.Real``), each bin has three columns: count, sum, and sum of squares of the predictand. If categorical (``basestring``), each bin has one column per predictand category, containing counts.
+
+        :rtype: dict from field index to 2-d Numpy array
+        :return: one (number of bins, number of columns) array for each numerical field
+        """
+
+        predictandData = self.nodeData(self.predictand)
+        out = {}
+        for fieldIndex, field in enumerate(self.dataset.fields):
+            if field.tpe == numbers.Real:
+                numBins = len(field.binEdges) + 1
+                bins = self.nodeData(field, "bins")
+                if self.predictand.tpe == numbers.Real:
+                    histogram = numpy.empty((numBins, 3), dtype=numpy.dtype(float))
+                    histogram[:,0] = numpy.bincount(bins, minlength=numBins)
+                    histogram[:,1] = numpy.bincount(bins, predictandData, minlength=numBins)
+                    histogram[:,2] = numpy.bincount(bins, numpy.power(predictandData, 2), minlength=numBins)
+                else:
+                    numCategories = len(self.predictand.intToStr)
+                    histogram = numpy.bincount(bins.astype(numpy.dtype(int)) * numCategories + predictandData, minlength=numBins * numCategories)
+                    histogram = histogram.reshape(numBins, numCategories).astype(numpy.dtype(float))
+                out[fieldIndex] = histogram
+        return out
+
+    def cumulativeEntropyGains(self, cumulative):
+        """Compute the entropic gain term of each cut of an ordered set of bins or categories.
+
+        :type cumulative: 2-d Numpy array
+        :param cumulative: running sums over bins (rows) of the number of data points in each predictand category (columns); the last row is the total
+        :rtype: (1-d Numpy array, 1-d Numpy array of bool)
+        :return: (gain term for cutting after each row but the last, ``True`` where both sides of the cut are non-empty)
+        """
+
+        numInCategorySel = cumulative[:-1]
+        numInCategoryAntisel = cumulative[-1] - cumulative[:-1]
+        numInSelection = numpy.sum(numInCategorySel, axis=1)
+        numNotInSelection = numpy.sum(numInCategoryAntisel, axis=1)
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            # for entropy, it is convenient to define 0*log(0) as 0, but Numpy reports it as NaN
+            frac = numInCategorySel / numInSelection[:,numpy.newaxis]
+            selectionEntropy = -numpy.nansum(frac * numpy.log2(frac), axis=1)
+            frac = numInCategoryAntisel / numNotInSelection[:,numpy.newaxis]
+            antiSelectionEntropy = -numpy.nansum(frac * numpy.log2(frac), axis=1)
+
+        gains = -(numInSelection/self.datasetSize)*selectionEntropy - (numNotInSelection/self.datasetSize)*antiSelectionEntropy
+        return gains, (numInSelection > 0) & (numNotInSelection > 0)
+
+    def cumulativeNVarianceGains(self, cumulative):
+        """Compute the n-times-variance gain term of each cut of an ordered set of bins or categories.
+
+        :type cumulative: 2-d Numpy array
+        :param cumulative: running sums over bins (rows) of the count, sum, and sum of squares of the predictand (columns); the last row is the total
+        :rtype: (1-d Numpy array, 1-d Numpy array of bool)
+        :return: (gain term for cutting after each row but the last, ``True`` where both sides of the cut are non-empty)
+        """
+
+        sum1sel, sumxsel, sumxxsel = cumulative[:-1].T
+        sum1antisel, sumxantisel, sumxxantisel = (cumulative[-1] - cumulative[:-1]).T
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            nTimesVarianceInSelection = sumxxsel - (sumxsel**2/sum1sel)
+            nTimesVarianceInAntiselection = sumxxantisel - (sumxantisel**2/sum1antisel)
+
+        gains = -nTimesVarianceInSelection - nTimesVarianceInAntiselection
+        return gains, (sum1sel > 0) & (sum1antisel > 0)
+
+    def bestCut(self, gains, valid):
+        """Choose the best cut from the gains of an ordered set of cuts, preferring larger indexes if there's a tie (like ``numericalEntropyGainTerm`` and ``numericalNVarianceGainTerm``).
+
+        :type gains: 1-d Numpy array
+        :param gains: gain term for each cut
+        :type valid: 1-d Numpy array of bool
+        :param valid: ``True`` where both sides of the cut are non-empty
+        :rtype: integer or ``None``
+        :return: index of the best cut or ``None`` if no cut separates the data
+        """
+
+        if not numpy.any(valid):
+            return None
+        gains = numpy.where(valid, gains, -numpy.inf)
+        return len(gains) - 1 - numpy.argmax(gains[::-1])
+
+    def numericalHistogramEntropyGainTerm(self, histogram, binEdges):
+        """Split a quantized numerical predictor at the bin edge that maximizes entropic gain above and below the threshold of the split.
+
+        :type histogram: 2-d Numpy array
+        :param histogram: counts of each predictand category in each bin (see ``fillHistograms``)
+        :type binEdges: 1-d Numpy array
+        :param binEdges: cut values between the bins (see ``Dataset.Field.quantize``)
+        :rtype: (number, number)
+        :return: (best gain term, best cut value)
+        """
+
+        # running sums over bins, rather than over sorted data points
+        gains, valid = self.cumulativeEntropyGains(numpy.cumsum(histogram, axis=0))
+
+        maxGainIndex = self.bestCut(gains, valid)
+        if maxGainIndex is None:
+            # every value is in the same bin: the only "split" is no split
+            return -self.entropy, numpy.inf
+        return gains[maxGainIndex], binEdges[maxGainIndex]
+
+    def numericalHistogramNVarianceGainTerm(self, histogram, binEdges):
+        """Split a quantized numerical predictor at the bin edge that maximizes n-times-variance gain above and below the threshold of the split.
+
+        :type histogram: 2-d Numpy array
+        :param histogram: count, sum, and sum of squares of the predictand in each bin (see ``fillHistograms``)
+        :type binEdges: 1-d Numpy array
+        :param binEdges: cut values between the bins (see ``Dataset.Field.quantize``)
+        :rtype: (number, number)
+        :return: (best gain term, best cut value)
+        """
+
+        # running sums over bins, rather than over sorted data points
+        gains, valid = self.cumulativeNVarianceGains(numpy.cumsum(histogram, axis=0))
+
+        maxGainIndex = self.bestCut(gains, valid)
+        if maxGainIndex is None:
+            # every value is in the same bin: the only "split" is no split
+            return -self.nTimesVariance, numpy.inf
+        return gains[maxGainIndex], binEdges[maxGainIndex]
+
+    def categorySubset(self, selection, categories):
+        """Express a split of categories as the smaller of the two subsets (the one containing the lowest category in a tie), as in exhaustive search.
+
+        :type selection: 1-d Numpy array of bool
+        :param selection: which of the ``categories`` are on one side of the split
+        :type categories: 1-d Numpy array of integers
+        :param categories: categories present in this node
+        :rtype: tuple of integers
+        :return: categories in the smaller subset, in increasing order
+        """
+
+        selected = categories[selection]
+        antiselected = categories[numpy.logical_not(selection)]
+        if len(antiselected) < len(selected) or (len(antiselected) == len(selected) and antiselected.min() < selected.min()):
+            selected = antiselected
+        return tuple(int(x) for x in numpy.sort(selected))
+
+    def categoricalOrderedEntropyGainTerm(self, field, maxIterations=100):
+        """Split a categorical predictor in such a way that maximizes entropic gain inside and outside of a subset of predictor values, without trying every subset.
+
+        For each predictand category, the predictor categories are sorted by the fraction of that predictand category and every cut of that order is tried. With two predictand categories, this finds the best split (Breiman et al. 1984). With more, the best of these splits is refined by moving each predictor category to the side whose predictand distribution it is closest to in Kullback-Leibler divergence, for as long as that increases the gain (Chou 1991).
+
+        :type field: pypoie.producer.cart.Dataset.Field
+        :param field: the field to consider when calculating the entropy gain term
+        :type maxIterations: positive integer
+        :param maxIterations: maximum number of refinement steps
+        :rtype: (number, tuple of integers)
+        :return: (best gain term, best combination of regressor categories)
+        """
+
+        # count each combination of predictor category (rows) and predictand category (columns)
+        numPredictorCategories = len(field.strToInt)
+        numPredictandCategories = len(self.predictand.strToInt)
+        combined = self.nodeData(field) * numPredictandCategories + self.nodeData(self.predictand)
+        numInCategory = numpy.bincount(combined, minlength=numPredictorCategories * numPredictandCategories)
+        numInCategory = numInCategory.reshape(numPredictorCategories, numPredictandCategories).astype(numpy.dtype(float))
+
+        # only consider categories that still have instances at this depth of the tree
+        numMarginal = numpy.sum(numInCategory, axis=1)
+        remainingPredictorCategories = numpy.nonzero(numMarginal > 0)[0]
+        remainingPredictandCategories = numpy.nonzero(numpy.sum(numInCategory, axis=0) > 0)[0]
+        numInCategory = numInCategory[remainingPredictorCategories][:,remainingPredictandCategories]
+        fractions = numInCategory / numMarginal[remainingPredictorCategories,numpy.newaxis]
+
+        if len(remainingPredictorCategories) < 2:
+            return -self.entropy, tuple(int(x) for x in remainingPredictorCategories)
+
+        def gainOf(selection):
+            return self.cumulativeEntropyGains(numpy.array([numpy.sum(numInCategory[selection], axis=0), numpy.sum(numInCategory, axis=0)]))[0][0]
+
+        # cuts of the order by each predictand category's fraction (for two predictand categories, the second order is the reverse of the first)
+        bestGainTerm = None
+        bestSelection = None
+        for predictandCategory in range(len(remainingPredictandCategories) if len(remainingPredictandCategories) > 2 else 1):
+            order = numpy.argsort(fractions[:,predictandCategory], kind="mergesort")
+            gains, valid = self.cumulativeEntropyGains(numpy.cumsum(numInCategory[order], axis=0))
+            maxGainIndex = self.bestCut(gains, valid)
+            if bestGainTerm is None or gains[maxGainIndex] > bestGainTerm:
+                bestGainTerm = gains[maxGainIndex]
+                bestSelection = numpy.zeros(len(order), dtype=numpy.dtype(bool))
+                bestSelection[order[:maxGainIndex + 1]] = True
+
+        # refine by reassigning each category to the closer side, like k-means with two clusters
+        if len(remainingPredictandCategories) > 2:
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                for iteration in range(maxIterations):
+                    costs = []
+                    for side in bestSelection, numpy.logical_not(bestSelection):
+                        sideFractions = numpy.sum(numInCategory[side], axis=0) / numpy.sum(numInCategory[side])
+                        # cross-entropy of each category's distribution with the side's (KL divergence plus a term that is the same for both sides)
+                        costs.append(-numpy.nansum(numpy.where(fractions > 0, fractions * numpy.log2(sideFractions), 0.0), axis=1))
+                    selection = numpy.where(costs[0] == costs[1], bestSelection, costs[0] < costs[1])
+                    if numpy.array_equal(selection, bestSelection) or numpy.all(selection) or not numpy.any(selection):
+                        break
+                    gainTerm = gainOf(selection)
+                    if gainTerm <= bestGainTerm:
+                        break
+                    bestGainTerm = gainTerm
+                    bestSelection = selection
+
+        return bestGainTerm, self.categorySubset(bestSelection, remainingPredictorCategories)
+
+    def categoricalOrderedNVarianceGainTerm(self, field):
+        """Split a categorical predictor in such a way that maximizes n-times-variance gain inside and outside of a subset of predictor values, without trying every subset.
+
+        The predictor categories are sorted by their mean predictand and every cut of that order is tried, which finds the best split (Fisher 1958, Breiman et al. 1984) in O(k log k) for k categories.
+
+        :type field: pypoie.producer.cart.Dataset.Field
+        :param field: the field to consider when calculating the n-times-variance gain term
+        :rtype: (number, tuple of integers)
+        :return: (best gain term, best combination of regressor categories)
+        """
+
+        # compute a partial sum for each category of the predictor field
+        fieldData = self.nodeData(field)
+        predictandData = self.nodeData(self.predictand)
+        numCategories = len(field.strToInt)
+        sums = numpy.empty((numCategories, 3), dtype=numpy.dtype(float))
+        sums[:,0] = numpy.bincount(fieldData, minlength=numCategories)
+        sums[:,1] = numpy.bincount(fieldData, predictandData, minlength=numCategories)
+        sums[:,2] = numpy.bincount(fieldData, numpy.power(predictandData, 2), minlength=numCategories)
+
+        # only consider categories that still have instances at this depth of the tree
+        remainingCategories = numpy.nonzero(sums[:,0] > 0)[0]
+        if len(remainingCategories) < 2:
+            return -self.nTimesVariance, tuple(int(x) for x in remainingCategories)
+
+        order = numpy.argsort(sums[remainingCategories,1] / sums[remainingCategories,0], kind="mergesort")
+        gains, valid = self.cumulativeNVarianceGains(numpy.cumsum(sums[remainingCategories[order]], axis=0))
+        maxGainIndex = self.bestCut(gains, valid)
+
+        selection = numpy.zeros(len(order), dtype=numpy.dtype(bool))
+        selection[order[:maxGainIndex + 1]] = True
+        return gains[maxGainIndex], self.categorySubset(selection, remainingCategories)
+
     def categoricalNVarianceGainTerm(self, field, maxSubsetSize=None):
         """Split a categorical predictor in such a way that maximizes n-times-variance gain inside and outside of a subset of predictor values.
 
@@ -574,17 +1342,19 @@ class TreeNode(object):
         """
 
         # find unique values of the predictor field
+        fieldData = self.nodeData(field)
+        predictandData = self.nodeData(self.predictand)
         try:
-            fieldUniques = numpy.unique(field.data)
+            fieldUniques = numpy.unique(fieldData)
         except TypeError:
-            fieldUniques = numpy.unique1d(field.data)
+            fieldUniques = numpy.unique1d(fieldData)
 
         # compute a partial sum for each unique value
         sum1 = numpy.empty(len(fieldUniques), dtype=numpy.dtype(float))
         sumx = numpy.empty(len(fieldUniques), dtype=numpy.dtype(float))
         sumxx = numpy.empty(len(fieldUniques), dtype=numpy.dtype(float))
         for i, v in enumerate(fieldUniques):
-            predictandValues = self.predictand.data[field.data == v]
+            predictandValues = predictandData[fieldData == v]
             sum1[i] = len(predictandValues)
             sumx[i] = numpy.sum(predictandValues)
             sumxx[i] = numpy.sum(numpy.power(predictandValues, 2))
@@ -629,7 +1399,8 @@ class TreeNode(object):
                     bestGainTerm = gainTerm
                     bestCombination = categorySet
 
-        return bestGainTerm, bestCombination
+        # categorySet indexes fieldUniques, which may be missing some categories at this depth of the tree
+        return bestGainTerm, tuple(int(fieldUniques[i]) for i in bestCombination)
 
     def walkNodes(self, topDown=True, depth=0):
         """Return a generator that walks over all nodes in the tree, yielding a 2-tuple of node and depth.
@@ -73,6 +73,93 @@ class PFAChainError(Exception):
     """Exception for errors encountered in chaining PFA files."""
     pass
 
+def matchTypes(first, second, matchedNames=None, memo=None):
+    """Determine whether data of one type (the output of a step in a chain) can be passed to the next step as data of another type (its input) without conversion.
+
+    Named types match if they have the same structure, regardless of their names; unions match if every branch of ``second`` matches some branch of ``first``.
+
+    :type first: pypoie.datatype.AvroType
+    :param first: type of the data
+    :type second: pypoie.datatype.AvroType
+    :param second: type expected by the next step
+    :type matchedNames: list or ``None``
+    :param matchedNames: if not ``None``, (name in ``first``, name in ``second``) pairs of matching named types are appended to it
+    :type memo: set of (string, string) pairs or ``None``
+    :param memo: (name in ``first``, name in ``second``) pairs of record types that are being matched further up the recursion (for recursive types)
+    :rtype: bool
+    :return: ``True`` if the types are compatible
+    """
+
+    if matchedNames is None:
+        matchedNames = []
+    if memo is None:
+        memo = set()
+
+    if isinstance(first, AvroNull) and isinstance(second, AvroNull):
+        return True
+    elif isinstance(first, AvroBoolean) and isinstance(second, AvroBoolean):
+        return True
+    elif isinstance(first, AvroInt) and isinstance(second, AvroInt):
+        return True
+    elif isinstance(first, AvroLong) and isinstance(second, AvroLong):
+        return True
+    elif isinstance(first, AvroFloat) and isinstance(second, AvroFloat):
+        return True
+    elif isinstance(first, AvroDouble) and isinstance(second, AvroDouble):
+        return True
+    elif isinstance(first, AvroBytes) and isinstance(second, AvroBytes):
+        return True
+    elif isinstance(first, AvroFixed) and isinstance(second, AvroFixed):
+        if first.size == second.size:
+            matchedNames.append((first.fullName, second.fullName))
+            return True
+        else:
+            return False
+    elif isinstance(first, AvroString) and isinstance(second, AvroString):
+        return True
+    elif isinstance(first, AvroEnum) and isinstance(second, AvroEnum):
+        if first.symbols == second.symbols:
+            matchedNames.append((first.fullName, second.fullName))
+            return True
+        else:
+            return False
+    elif isinstance(first, AvroArray) and isinstance(second, AvroArray):
+        return matchTypes(first.items, second.items, matchedNames, memo)
+    elif isinstance(first, AvroMap) and isinstance(second, AvroMap):
+        return matchTypes(first.values, second.values, matchedNames, memo)
+    elif isinstance(first, AvroRecord) and isinstance(second, AvroRecord):
+        pair = (first.fullName, second.fullName)
+        # a pair that is already being matched further up is assumed to match; any mismatch will be found there
+        if pair in memo:
+            return True
+        if len(first.fields) != len(second.fields):
+            return False
+        memo.add(pair)
+        try:
+            for f1, f2 in zip(first.fields, second.fields):
+                if f1.name != f2.name:
+                    return False
+                elif not matchTypes(f1.avroType, f2.avroType, matchedNames, memo):
+                    return False
+        finally:
+            memo.discard(pair)
+        matchedNames.append(pair)
+        return True
+    elif isinstance(first, AvroUnion) and isinstance(second, AvroUnion):
+        # every kind of value that the producer can emit must be accepted by the consumer (a wider consumer is fine)
+        for xt in first.types:
+            for yt in second.types:
+                # names matched in a branch that fails to match as a whole must not be reported
+                branchNames = []
+                if matchTypes(xt, yt, branchNames, memo):
+                    matchedNames.extend(branchNames)
+                    break
+            else:
+                return False
+        return True
+    else:
+        return False
+
 def jsonNode(pfas, lineNumbers=True, check=True, name=None, randseed=None, doc=None, version=None, metadata={}, options={}, tryYaml=False, verbose=False):
     """Create a single PFA from a chained workflow, returning the result as Pythonized JSON.
 
@@ -163,7 +250,7 @@ def engine(pfas, name=None, randseed=None, doc=None, version=None, metadata={},
     :rtype: pypoie.genpy.EngineConfig
     :return: a PFA document representing the chained workflow
     """
-    return PFAEngine.fromAst(ast(pfas, False, name, randseed, doc, version, metadata, options, tryYaml, verbose), options, sharedState, multiplicity, style, debug)
+    return PFAEngine.fromAst(ast(pfas, False, name, randseed, doc, version, metadata, options, tryYaml, verbose), options, None, sharedState, multiplicity, style, debug)
 
 def ast(pfas, check=True, name=None, randseed=None, doc=None, version=None, metadata={}, options={}, tryYaml=False, verbose=False):
     """Create a single PFA from a chained workflow, returning the result as an abstract syntax tree.
@@ -279,64 +366,14 @@ def ast(pfas, check=True, name=None, randseed=None, doc=None, version=None, meta
 
     # ensure that chained types match and will be given the same names
     if verbose: sys.stderr.write(time.asctime() + " Verifying that input/output schemas match along the chain\n")
-    def chainPair(i, first, second, memo):
-        if isinstance(first, AvroNull) and isinstance(second, AvroNull):
-            return True
-        elif isinstance(first, AvroBoolean) and isinstance(second, AvroBoolean):
-            return True
-        elif isinstance(first, AvroInt) and isinstance(second, AvroInt):
-            return True
-        elif isinstance(first, AvroLong) and isinstance(second, AvroLong):
-            return True
-        elif isinstance(first, AvroFloat) and isinstance(second, AvroFloat):
-            return True
-        elif isinstance(first, AvroDouble) and isinstance(second, AvroDouble):
-            return True
-        elif isinstance(first, AvroBytes) and isinstance(second, AvroBytes):
-            return True
-        elif isinstance(first, AvroFixed) and isinstance(second, AvroFixed):
-            t = avroType.fullName
-            if first.size == second.size:
-                originalNameToNewName[i + 1][second.fullName] = originalNameToNewName[i][first.fullName]
-                return True
-            else:
-                return False
-        elif isinstance(first, AvroString) and isinstance(second, AvroString):
-            return True
-        elif isinstance(first, AvroEnum) and isinstance(second, AvroEnum):
-            if first.symbols == second.symbols:
-                originalNameToNewName[i + 1][second.fullName] = originalNameToNewName[i][first.fullName]
-                return True
-            else:
-                return False
-        elif isinstance(first, AvroArray) and isinstance(second, AvroArray):
-            return chainPair(i, first.items, second.items, memo)
-        elif isinstance(first, AvroMap) and isinstance(second, AvroMap):
-            return chainPair(i, first.values, second.values, memo)
-        elif isinstance(first, AvroRecord) and isinstance(second, AvroRecord):
-            if first.fullName not in memo:
-                memo.add(first.fullName)
-                if len(first.fields) != len(second.fields):
-                    return False
-                for f1, f2 in zip(first.fields, second.fields):
-                    if f1.name != f2.name:
-                        return False
-                    elif not chainPair(i, f1.avroType, f2.avroType, memo):
-                        return False
-                originalNameToNewName[i + 1][second.fullName] = originalNameToNewName[i][first.fullName]
-                return True
-        elif isinstance(first, AvroUnion) and isinstance(second, AvroUnion):
-            for yt in second.types:
-                if not any(chainPair(i, xt, yt, memo) for xt in first.types):
-                    return False
-            return True
-        else:
-            return False
     for i in range(len(pfas) - 1):
         first = pfas[i].output
         second = pfas[i + 1].input
-        if not chainPair(i, first, second, set()):
+        matchedNames = []
+        if not matchTypes(first, second, matchedNames):
             raise PFAChainError("output of engine {0}: {1} not compatible with input of engine {2}: {3}".format(i + 1, ts(first), i + 2, ts(second)))
+        for firstName, secondName in matchedNames:
+            originalNameToNewName[i + 1][secondName] = originalNameToNewName[i][firstName]
 
     def rename(i, avroType, memo):
         if isinstance(avroType, AvroArray):
@@ -662,6 +699,201 @@ def ast(pfas, check=True, name=None, randseed=None, doc=None, version=None, meta
 
 
 
+def engines(pfas, options={}, tryYaml=False, sharedState=None, debug=False):
+    """Create an executable workflow that keeps each step of the chain as its own scoring engine, rather than combining them into one PFA document.
+
+    :type pfas: list of poie.pfaast.EngineConfig, Pythonized JSON, or JSON strings
+    :param pfas: PFA documents for which the output of document *i* is the input to document *i + 1*
+    :type options: dict of Pythonized JSON
+    :param options: implementation options for every step (default is ``{}``)
+    :type tryYaml: bool
+    :param tryYaml: if ``True``, attempt to interpret ``pfas`` as YAML (assuming they fail as JSON)
+    :type sharedState: pypoie.genpy.SharedState
+    :param sharedState: external state for shared cells and pools to initialize from and modify; pass ``None`` to limit sharing to instances of a single PFA file
+    :type debug: bool
+    :param debug: if ``True``, print the Python code generated by each PFA document before evaluating
+    :rtype: pypoie.producer.chain.ChainedEngines
+    :return: the steps of the chained workflow
+    """
+
+    steps = []
+    for src in pfas:
+        if isinstance(src, EngineConfig):
+            step = src
+        elif isinstance(src, dict):
+            step = poie.reader.jsonToAst(src)
+        else:
+            try:
+                step = poie.reader.jsonToAst(src)
+            except ValueError:
+                if tryYaml:
+                    step = poie.reader.yamlToAst(src)
+                else:
+                    raise
+        steps.append(step)
+
+    return ChainedEngines([PFAEngine.fromAst(step, options, None, sharedState, 1, "pure", debug)[0] for step in steps])
+
+class ChainedEngines(object):
+    """Runs a chained workflow as a sequence of separately compiled scoring engines, passing the output of each directly to the next.
+
+    Unlike ``engine``, which renames and merges all of the documents into one, this only compiles each document on its own. The output type of each step is checked against the input type of the next once, when the ``ChainedEngines`` is created (see ``matchTypes``), so only data entering the first step are checked with ``checkData``.
+
+    Map and emit engines can be mixed: everything that an emit engine emits for one input is passed on to the next step. Fold engines are not supported, as in ``engine``.
+
+    The time spent in each step is accumulated in ``stageTimes`` and the number of inputs it has processed in ``stageCounts``; ``latencies`` reports the average.
+    """
+
+    def __init__(self, engines):
+        """Creates a ``ChainedEngines``; normally only called by ``chain.engines``.
+
+        :type engines: list of pypoie.genpy.PFAEngine
+        :param engines: compiled steps, in order
+        """
+
+        if len(engines) == 0:
+            raise PFAChainError("a chain must have at least one engine")
+
+        for i, engine in enumerate(engines):
+            if engine.config.method == Method.FOLD:
+                raise NotImplementedError("chaining of fold-type scoring engines has not been implemented yet")
+            if i > 0 and not matchTypes(engines[i - 1].config.output, engine.config.input):
+                raise PFAChainError("output of engine {0}: {1} not compatible with input of engine {2}: {3}".format(i, ts(engines[i - 1].config.output), i + 1, ts(engine.config.input)))
+
+        self.engines = engines
+        self.emitted = [None] * len(engines)
+        for i, engine in enumerate(engines):
+            if engine.config.method == Method.EMIT:
+                self.emitted[i] = []
+                engine.emit = self.emitted[i].append
+
+        self.stageTimes = [0.0] * len(engines)
+        self.stageCounts = [0] * len(engines)
+
+    @property
+    def inputType(self):
+        """Input type of the first step."""
+        return self.engines[0].config.input
+
+    @property
+    def outputType(self):
+        """Output type of the last step."""
+        return self.engines[-1].config.output
+
+    def begin(self):
+        """Call ``begin`` on each step, in order."""
+        for engine in self.engines:
+            engine.begin()
+
+    def end(self):
+        """Call ``end`` on each step, in order, passing anything that emit engines emit in ``end`` down the chain."""
+        outputs = []
+        for i, engine in enumerate(self.engines):
+            if len(outputs) > 0:
+                outputs = self.runStage(i, outputs)
+            engine.end()
+            if self.emitted[i] is not None:
+                outputs.extend(self.emitted[i])
+                del self.emitted[i][:]
+        return outputs
+
+    def runStage(self, i, inputs, check=False):
+        """Pass a batch of data through one step.
+
+        :type i: non-negative integer
+        :param i: index of the step
+        :type inputs: list of Pythonized data
+        :param inputs: inputs to the step
+        :type check: bool
+        :param check: if ``True``, check the inputs with ``checkData``
+        :rtype: list of Pythonized data
+        :return: outputs of the step: one per input for map engines, everything emitted for emit engines
+        """
+
+        engine = self.engines[i]
+        startTime = time.time()
+        if self.emitted[i] is None:
+            outputs = [engine.action(x, check) for x in inputs]
+        else:
+            for x in inputs:
+                engine.action(x, check)
+            outputs = list(self.emitted[i])
+            del self.emitted[i][:]
+        self.stageTimes[i] += time.time() - startTime
+        self.stageCounts[i] += len(inputs)
+        return outputs
+
+    def actions(self, inputs, check=True):
+        """Pass a batch of data through all of the steps, one step at a time.
+
+        :type inputs: list of Pythonized data
+        :param inputs: inputs to the first step
+        :type check: bool
+        :param check: if ``True``, check the inputs to the first step with ``checkData``; data passed between steps are never checked
+        :rtype: list of Pythonized data
+        :return: outputs of the last step (for emit engines, there may be more or fewer than the inputs)
+        """
+
+        outputs = inputs
+        for i in range(len(self.engines)):
+            outputs = self.runStage(i, outputs, check and i == 0)
+            if len(outputs) == 0:
+                break
+        return outputs
+
+    def action(self, input, check=True):
+        """Pass one datum through all of the steps.
+
+        :type input: Pythonized data
+        :param input: input to the first step
+        :type check: bool
+        :param check: if ``True``, check the input with ``checkData``
+        :rtype: Pythonized data or list of Pythonized data
+        :return: output of the last step if every step is a map engine; otherwise, a list of everything that reached the end of the chain
+        """
+
+        outputs = self.actions([input], check)
+        if all(emitted is None for emitted in self.emitted):
+            return outputs[0]
+        else:
+            return outputs
+
+    def run(self, inputs, batchSize=1000, check=True):
+        """Generator that passes an iterable of data through the chain in batches, yielding outputs of the last step, between calls to ``begin`` and ``end``.
+
+        :type inputs: iterable of Pythonized data
+        :param inputs: inputs to the first step
+        :type batchSize: positive integer
+        :param batchSize: number of inputs that pass through one step before going on to the next
+        :type check: bool
+        :param check: if ``True``, check the inputs to the first step with ``checkData``
+        :rtype: generator of Pythonized data
+        :return: outputs of the last step
+        """
+
+        self.begin()
+        batch = []
+        for x in inputs:
+            batch.append(x)
+            if len(batch) >= batchSize:
+                for y in self.actions(batch, check):
+                    yield y
+                batch = []
+        if len(batch) > 0:
+            for y in self.actions(batch, check):
+                yield y
+        for y in self.end():
+            yield y
+
+    def latencies(self):
+        """Average time spent in each step per input to that step.
+
+        :rtype: list of numbers or ``None``
+        :return: seconds per input for each step (``None`` for steps that have not been reached)
+        """
+        return [t / n if n > 0 else None for t, n in zip(self.stageTimes, self.stageCounts)]
+
+
 ## TODO: turn these into unit tests
 
 ## ### BEGIN testing
@@ -15,6 +15,7 @@
 # limitations under the License.
 
 import math
+import multiprocessing
 import random
 from collections import OrderedDict
 
@@ -29,6 +30,29 @@ import poie.prettypfa
 
 ### interfaces
 
+_workerState = None
+def _workerChunkSums(args):
+    # runs in a forked worker process, which inherited _workerState from the parent
+    clusters, boundaries = args
+    kmeans, dataset, weights = _workerState
+    kmeans.clusters = clusters
+    return [kmeans.chunkSums(dataset[start:stop], None if weights is None else weights[start:stop]) for start, stop in boundaries]
+
+def _hashRecords(chunk, seed):
+    # 64-bit hash of each record's values (as doubles), mixed column by column and finalized like splitmix64
+    words = numpy.ascontiguousarray(chunk, dtype=numpy.dtype(float)).view(numpy.uint64)
+    out = numpy.full(words.shape[0], seed, dtype=numpy.uint64)
+    for column in range(words.shape[1]):
+        out ^= words[:, column]
+        out *= numpy.uint64(0x100000001b3)
+        out ^= out >> numpy.uint64(29)
+    out ^= out >> numpy.uint64(33)
+    out *= numpy.uint64(0xff51afd7ed558ccd)
+    out ^= out >> numpy.uint64(33)
+    out *= numpy.uint64(0xc4ceb9f53a5ecd53)
+    out ^= out >> numpy.uint64(33)
+    return out
+
 def _NotImplementedError():
     raise NotImplementedError
 class Similarity(object):
@@ -265,49 +289,90 @@ class KMeans(object):
     Usually, you would construct the object, possibly stepup, then optimize and export to pfaDocument.
     """
 
-    def __init__(self, numberOfClusters, dataset, weights=None, metric=Euclidean(AbsDiff()), minPointsInCluster=None, maxPointsForClustering=None):
+    # records per chunk of cluster sums when there is no maxMemory; fixed, so that the order of summation (and therefore the result) doesn't depend on the number of processes
+    defaultChunkRecords = 100000
+
+    def __init__(self, numberOfClusters, dataset, weights=None, metric=Euclidean(AbsDiff()), minPointsInCluster=None, maxPointsForClustering=None, maxMemory=None, processes=None, uniqueSampleSize=None, seeding="random", triangleInequality=False):
         """Construct a KMeans object, initializing cluster centers to unique, random points from the dataset.
 
+        Datasets that do not fit in memory can be a ``numpy.memmap`` or a function that reads the data in chunks.  Each pass over a chunked dataset calls the function again, so it should be fast to restart (reading a file in blocks, for instance).
+
         :type numberOfClusters: positive integer
         :param numberOfClusters: number of clusters (the "k" in k-means)
-        :type dataset: 2-d Numpy array
-        :param dataset: dataset to cluster; ``dataset.shape[0]`` is the number of records (rows), ``dataset.shape[1]`` is the number of dimensions for each point (columns)
+        :type dataset: 2-d Numpy array (possibly a ``numpy.memmap``) or callable that returns an iterator over 2-d Numpy arrays or (2-d Numpy array, 1-d Numpy array) pairs
+        :param dataset: dataset to cluster; ``dataset.shape[0]`` is the number of records (rows), ``dataset.shape[1]`` is the number of dimensions for each point (columns); if callable, it provides chunks of records with the same number of columns, possibly with their weights
         :type weights: 1-d Numpy array or ``None``
-        :param weights: how much to weight each point in the ``dataset``: must have shape equal to ``(dataset.shape[0],)``; ``0`` means ignore the dataset, ``1`` means normal weight; ``None`` generates all ones
+        :param weights: how much to weight each point in the ``dataset``: must have shape equal to ``(dataset.shape[0],)``; ``0`` means ignore the dataset, ``1`` means normal weight; ``None`` generates all ones (must be ``None`` for a chunked dataset)
         :type metric: poie.produce.kmeans.Metric
         :param metric: metric for Numpy and PFA, such as ``Euclidean(AbsDiff())``
         :type minPointsInCluster: non-negative integer or ``None``
         :param minPointsInCluster: minimum number of points before jumping (replacing cluster with a random point during optimization)
         :type maxPointsForClustering: positive integer or ``None``
         :param maxPointsForClustering: maximum number of points in an optimization (if ``dataset.shape[0]`` exceeds this amount, a random subset is chosen)
+        :type maxMemory: positive integer or ``None``
+        :param maxMemory: approximate number of bytes of temporary arrays to use when assigning points to clusters; the dataset is processed in chunks of records small enough to fit (see ``chunkSize``); ``None`` assigns points in one chunk and sums clusters in chunks of ``defaultChunkRecords`` (see ``chunkBoundaries``)
+        :type processes: positive integer or ``None``
+        :param processes: number of worker processes that assign points and sum clusters in ``optimize`` and ``stepup`` (see ``startWorkers``); ``None`` or ``1`` does all the work in this process
+        :type uniqueSampleSize: positive integer or ``None``
+        :param uniqueSampleSize: if not ``None``, choose initial and jumping cluster centers from a random sample of this many unique records, found in one pass by hashing (see ``sampleRecords``), rather than from all unique records; ``None`` means all unique records for in-memory datasets and a sample of ``max(10000, 10 * numberOfClusters)`` for memory-mapped and chunked datasets
+        :type seeding: string
+        :param seeding: how to choose the initial cluster centers from the unique records: "random" for uniformly random, "kmeans++" for ``seedPlusPlus``, or "kmeans||" for ``seedParallel``
+        :type triangleInequality: bool
+        :param triangleInequality: if ``True``, use bounds on the distances between points and clusters to skip distance calculations that cannot change a point's closest cluster (see ``boundedClusterSums``); the results are the same as without bounds, but the metric must satisfy the triangle inequality and the work is done in this process
         """
 
-        if len(dataset.shape) != 2:
-            raise TypeError("dataset must be two-dimensional: dataset.shape[0] is the number of records (rows), dataset.shape[1] is the number of dimensions (columns)")
+        if seeding not in ("random", "kmeans++", "kmeans||"):
+            raise TypeError("seeding must be \"random\", \"kmeans++\", or \"kmeans||\"")
+        if triangleInequality and not (isinstance(metric, (Euclidean, Chebyshev, Taxicab)) and isinstance(metric.similarity, AbsDiff)):
+            raise TypeError("triangleInequality requires a metric that satisfies the triangle inequality: Euclidean, Chebyshev, or Taxicab of AbsDiff")
+
+        if callable(dataset):
+            if weights is not None:
+                raise TypeError("weights of a chunked dataset must be provided with its chunks, as (dataset, weights) pairs")
+        else:
+            if len(dataset.shape) != 2:
+                raise TypeError("dataset must be two-dimensional: dataset.shape[0] is the number of records (rows), dataset.shape[1] is the number of dimensions (columns)")
+            if weights is not None and weights.shape != (dataset.shape[0],):
+                raise TypeError("weights must have as many records as the dataset and must be one dimensional")
 
         self.dataset = dataset
-        if weights is not None and weights.shape != (dataset.shape[0],):
-            raise TypeError("weights must have as many records as the dataset and must be one dimensional")
         self.weights = weights
         self.metric = metric
+        self.numberOfClusters = numberOfClusters
+        self.minPointsInCluster = minPointsInCluster
+        self.maxPointsForClustering = maxPointsForClustering
+        self.maxMemory = maxMemory
+        self.processes = processes
+        self.workers = None
+        self.triangleInequality = triangleInequality
+        self.bounds = None
+
+        if uniqueSampleSize is None and not callable(dataset) and not isinstance(dataset, numpy.memmap):
+            try:
+                flattenedView = numpy.ascontiguousarray(self.dataset).view(numpy.dtype((numpy.void, self.dataset.dtype.itemsize * self.dataset.shape[1])))
+                _, indexes = numpy.unique(flattenedView, return_index=True)
+                self.uniques = self.dataset[indexes]
+            except TypeError:
+                self.uniques = self.dataset
+            self.numberOfRecords = self.dataset.shape[0]
 
-        try:
-            flattenedView = numpy.ascontiguousarray(self.dataset).view(numpy.dtype((numpy.void, self.dataset.dtype.itemsize * self.dataset.shape[1])))
-            _, indexes = numpy.unique(flattenedView, return_index=True)
-            self.uniques = self.dataset[indexes]
-        except TypeError:
-            self.uniques = self.dataset
+        else:
+            if uniqueSampleSize is None:
+                uniqueSampleSize = max(10000, 10 * numberOfClusters)
+            self.uniques, _, self.numberOfRecords = self.sampleRecords(dataset, weights, uniqueSampleSize, unique=True)
 
         if self.uniques.shape[0] <= numberOfClusters:
             raise TypeError("the number of unique records in the dataset ({0} in this case) must be strictly greater than numberOfClusters ({1})".format(self.uniques.shape[0], numberOfClusters))
-        self.numberOfClusters = numberOfClusters
+        self.numberOfDimensions = self.uniques.shape[1]
 
         self.clusters = []
-        for index in range(numberOfClusters):
-            self.clusters.append(self.newCluster())
-
-        self.minPointsInCluster = minPointsInCluster
-        self.maxPointsForClustering = maxPointsForClustering
+        if seeding == "kmeans++":
+            self.clusters = self.seedPlusPlus(self.uniques)
+        elif seeding == "kmeans||":
+            self.clusters = self.seedParallel()
+        else:
+            for index in range(numberOfClusters):
+                self.clusters.append(self.newCluster())
 
     def randomPoint(self):
         """Pick a random point from the dataset.
@@ -341,6 +406,10 @@ class KMeans(object):
         if subsetSize <= self.numberOfClusters:
             raise TypeError("subsetSize must be strictly greater than the numberOfClusters")
 
+        if callable(self.dataset):
+            dataset, weights, _ = self.sampleRecords(self.dataset, self.weights, subsetSize, unique=False)
+            return dataset, weights
+
         indexes = random.sample(range(self.dataset.shape[0]), subsetSize)
         dataset = self.dataset[indexes,:]
         if self.weights is None:
@@ -350,6 +419,104 @@ class KMeans(object):
 
         return dataset, weights
 
+    def distances(self, points, cluster):
+        """Apply the metric to each point and one cluster center, one chunk at a time (see ``chunkSize``).
+
+        :type points: 2-d Numpy array
+        :param points: points to compare
+        :type cluster: 1-d Numpy array
+        :param cluster: cluster center
+        :rtype: 1-d Numpy array
+        :return: distance from each point to the cluster
+        """
+        out = numpy.empty(points.shape[0], dtype=numpy.dtype(float))
+        chunkSize = self.chunkSize(points)
+        for start in range(0, points.shape[0], chunkSize):
+            out[start:start + chunkSize] = self.metric.calculate(points[start:start + chunkSize], cluster)
+        return out
+
+    def seedPlusPlus(self, points, weights=None, initial=()):
+        """Choose cluster centers by k-means++ (Arthur and Vassilvitskii 2007): each new center is a random point, chosen with probability proportional to its weight times the square of its distance to the nearest center chosen so far.
+
+        Points that coincide with a chosen center have zero probability, so the centers are unique if the points are.
+
+        :type points: 2-d Numpy array
+        :param points: candidate points, usually ``self.uniques``
+        :type weights: 1-d Numpy array or ``None``
+        :param weights: how much to weight each candidate; ``None`` for all ones
+        :type initial: list of 1-d Numpy arrays
+        :param initial: centers that have already been chosen
+        :rtype: list of 1-d Numpy arrays
+        :return: ``numberOfClusters`` cluster centers (*copies* of points)
+        """
+        if weights is None:
+            weights = numpy.ones(points.shape[0], dtype=numpy.dtype(float))
+
+        centers = [x.copy() for x in initial]
+        if len(centers) == 0:
+            cumulative = numpy.cumsum(weights)
+            index = min(numpy.searchsorted(cumulative, random.random() * cumulative[-1], side="right"), points.shape[0] - 1)
+            centers.append(points[index].copy())
+
+        minDistanceSquared = numpy.square(self.distances(points, centers[0]))
+        for center in centers[1:]:
+            numpy.minimum(minDistanceSquared, numpy.square(self.distances(points, center)), minDistanceSquared)
+
+        while len(centers) < self.numberOfClusters:
+            cumulative = numpy.cumsum(minDistanceSquared * weights)
+            if not cumulative[-1] > 0.0:
+                raise TypeError("fewer than numberOfClusters ({0}) distinct points to choose from".format(self.numberOfClusters))
+            index = min(numpy.searchsorted(cumulative, random.random() * cumulative[-1], side="right"), points.shape[0] - 1)
+            centers.append(points[index].copy())
+            numpy.minimum(minDistanceSquared, numpy.square(self.distances(points, centers[-1])), minDistanceSquared)
+
+        return centers
+
+    def seedParallel(self, rounds=5, oversampling=None):
+        """Choose cluster centers by k-means|| (Bahmani et al. 2012), a variant of k-means++ that takes few passes over the data.
+
+        Starting from one random point, each round adds every point independently with probability ``oversampling`` times the square of its distance to the nearest candidate over the sum of these squares.  The candidates are then weighted by the number of points closest to them and reduced to ``numberOfClusters`` by ``seedPlusPlus``.  This computes more distances than ``seedPlusPlus`` (about ``rounds * oversampling`` per point, rather than ``numberOfClusters``), but in a few vectorized rounds rather than one pass per cluster.
+
+        :type rounds: positive integer
+        :param rounds: number of sampling rounds
+        :type oversampling: positive number or ``None``
+        :param oversampling: expected number of candidates added per round; ``None`` for ``2 * numberOfClusters``
+        :rtype: list of 1-d Numpy arrays
+        :return: ``numberOfClusters`` cluster centers (*copies* of unique points)
+        """
+        if oversampling is None:
+            oversampling = 2.0 * self.numberOfClusters
+        randomState = numpy.random.RandomState(random.getrandbits(32))
+        points = self.uniques
+
+        chosen = [random.randint(0, points.shape[0] - 1)]
+        minDistanceSquared = numpy.square(self.distances(points, points[chosen[0]]))
+        for round in range(rounds):
+            total = minDistanceSquared.sum()
+            if not total > 0.0:
+                break
+            newIndexes = numpy.nonzero(randomState.random_sample(points.shape[0]) < oversampling * minDistanceSquared / total)[0]
+            for index in newIndexes:
+                numpy.minimum(minDistanceSquared, numpy.square(self.distances(points, points[index])), minDistanceSquared)
+            chosen.extend(newIndexes)
+
+        candidates = points[chosen]
+        if candidates.shape[0] <= self.numberOfClusters:
+            return self.seedPlusPlus(points, initial=list(candidates))
+
+        # weight each candidate by the number of points that are closest to it
+        counts = numpy.zeros(candidates.shape[0], dtype=numpy.dtype(float))
+        chunkSize = max(self.chunkSize(points) * self.numberOfClusters // candidates.shape[0], 1)
+        distanceToCandidate = numpy.empty((min(chunkSize, points.shape[0]), candidates.shape[0]), dtype=numpy.dtype(float))
+        for start in range(0, points.shape[0], chunkSize):
+            chunk = points[start:start + chunkSize]
+            distances = distanceToCandidate[:chunk.shape[0]]
+            for candidateIndex, candidate in enumerate(candidates):
+                distances[:, candidateIndex] = self.metric.calculate(chunk, candidate)
+            counts += numpy.bincount(numpy.argmin(distances, axis=1), minlength=candidates.shape[0])
+
+        return self.seedPlusPlus(candidates, counts)
+
     def closestCluster(self, dataset=None, weights=None):
         """Identify the closest cluster to each element in the dataset.
 
@@ -366,15 +533,334 @@ class KMeans(object):
         if weights is None:
             weights = self.weights
 
-        # distanceToCenter is the result of applying the metric to each point in the dataset, for each cluster
-        # distanceToCenter.shape[0] is the number of records, distanceToCenter.shape[1] is the number of clusters
-
-        distanceToCenter = numpy.empty((dataset.shape[0], self.numberOfClusters), dtype=numpy.dtype(float))
-        for clusterIndex, cluster in enumerate(self.clusters):
-            distanceToCenter[:, clusterIndex] = self.metric.calculate(dataset, cluster)
+        if callable(dataset):
+            return numpy.concatenate([self.closestCluster(chunk, chunkWeights) for chunk, chunkWeights in self.iterateChunks(dataset, weights)])
 
         # indexOfClosestCluster is the cluster classification for each point in the dataset
-        return numpy.argmin(distanceToCenter, axis=1)
+        indexOfClosestCluster = numpy.empty(dataset.shape[0], dtype=numpy.dtype(int))
+
+        # distanceToCenter is the result of applying the metric to each point in a chunk of the dataset, for each cluster
+        # distanceToCenter.shape[0] is the number of records in the chunk, distanceToCenter.shape[1] is the number of clusters
+
+        chunkSize = self.chunkSize(dataset)
+        distanceToCenter = numpy.empty((min(chunkSize, dataset.shape[0]), self.numberOfClusters), dtype=numpy.dtype(float))
+        for start in range(0, dataset.shape[0], chunkSize):
+            chunk = dataset[start:start + chunkSize]
+            distances = distanceToCenter[:chunk.shape[0]]
+            for clusterIndex, cluster in enumerate(self.clusters):
+                distances[:, clusterIndex] = self.metric.calculate(chunk, cluster)
+            numpy.argmin(distances, axis=1, out=indexOfClosestCluster[start:start + chunkSize])
+
+        return indexOfClosestCluster
+
+    def chunkSize(self, dataset):
+        """Number of records to assign to clusters at a time, determined by ``maxMemory``.
+
+        Each record in a chunk needs a distance to each cluster and a few temporary copies of its components (for ``dataset - cluster`` and the like).
+
+        :type dataset: 2-d Numpy array
+        :param dataset: an input dataset
+        :rtype: positive integer
+        :return: number of records
+        """
+        if self.maxMemory is None:
+            return max(dataset.shape[0], 1)
+        bytesPerRecord = numpy.dtype(float).itemsize * (self.numberOfClusters + 4 * dataset.shape[1])
+        return max(int(self.maxMemory // bytesPerRecord), 1)
+
+    def chunkSums(self, chunk, chunkWeights):
+        """Assign each point in a chunk to its closest cluster and sum the points in each.
+
+        :type chunk: 2-d Numpy array
+        :param chunk: records of an input dataset, no more than ``chunkSize`` of them
+        :type chunkWeights: 1-d Numpy array or ``None``
+        :param chunkWeights: weights of those records
+        :rtype: (2-d Numpy array, 1-d Numpy array, 1-d Numpy array)
+        :return: (weighted sum of points, sum of weights, number of points) for each cluster; the first has shape ``(numberOfClusters, chunk.shape[1])``
+        """
+
+        return self.assignedSums(chunk, chunkWeights, self.closestCluster(chunk, chunkWeights))
+
+    def assignedSums(self, chunk, chunkWeights, indexOfClosestCluster):
+        """Sum the points in each cluster, given the index of each point's closest cluster.
+
+        :type chunk: 2-d Numpy array
+        :param chunk: records of an input dataset
+        :type chunkWeights: 1-d Numpy array or ``None``
+        :param chunkWeights: weights of those records
+        :type indexOfClosestCluster: 1-d Numpy array of integers
+        :param indexOfClosestCluster: closest cluster for each record
+        :rtype: (2-d Numpy array, 1-d Numpy array, 1-d Numpy array)
+        :return: (weighted sum of points, sum of weights, number of points) for each cluster; the first has shape ``(numberOfClusters, chunk.shape[1])``
+        """
+
+        counts = numpy.bincount(indexOfClosestCluster, minlength=self.numberOfClusters)
+        sums = numpy.empty((self.numberOfClusters, chunk.shape[1]), dtype=numpy.dtype(float))
+        if chunkWeights is None:
+            sumOfWeights = counts.astype(numpy.dtype(float))
+            for dimension in range(chunk.shape[1]):
+                sums[:, dimension] = numpy.bincount(indexOfClosestCluster, chunk[:, dimension], minlength=self.numberOfClusters)
+        else:
+            sumOfWeights = numpy.bincount(indexOfClosestCluster, chunkWeights, minlength=self.numberOfClusters)
+            for dimension in range(chunk.shape[1]):
+                sums[:, dimension] = numpy.bincount(indexOfClosestCluster, chunk[:, dimension] * chunkWeights, minlength=self.numberOfClusters)
+
+        return sums, sumOfWeights, counts
+
+    def chunkBoundaries(self, dataset):
+        """Divide a dataset into chunks of at most ``chunkSize`` records, or ``defaultChunkRecords`` if there is no ``maxMemory``.
+
+        The chunks are the same for any number of ``processes`` (``clusterSums`` deals them out to the workers), so the sums are added in the same order.
+
+        :type dataset: 2-d Numpy array
+        :param dataset: an input dataset
+        :rtype: list of (integer, integer)
+        :return: (start, stop) record indexes of each chunk
+        """
+        if self.maxMemory is None:
+            chunkSize = self.defaultChunkRecords
+        else:
+            chunkSize = self.chunkSize(dataset)
+        return [(start, min(start + chunkSize, dataset.shape[0])) for start in range(0, dataset.shape[0], chunkSize)]
+
+    def iterateChunks(self, dataset, weights):
+        """Iterate over a dataset in chunks of at most ``chunkSize`` records.
+
+        :type dataset: 2-d Numpy array or callable that returns an iterator over chunks
+        :param dataset: an input dataset
+        :type weights: 1-d Numpy array or ``None``
+        :param weights: input weights (``None`` for a chunked dataset, which provides its own)
+        :rtype: generator of (2-d Numpy array, 1-d Numpy array or ``None``)
+        :return: chunks of records and their weights
+        """
+        if callable(dataset):
+            for chunk in dataset():
+                if isinstance(chunk, tuple):
+                    chunk, chunkWeights = chunk
+                else:
+                    chunkWeights = None
+                chunk = numpy.asarray(chunk)
+                chunkSize = self.chunkSize(chunk)
+                for start in range(0, chunk.shape[0], chunkSize):
+                    yield chunk[start:start + chunkSize], (None if chunkWeights is None else chunkWeights[start:start + chunkSize])
+        else:
+            for start, stop in self.chunkBoundaries(dataset):
+                yield dataset[start:stop], (None if weights is None else weights[start:stop])
+
+    def sampleRecords(self, dataset, weights, sampleSize, unique):
+        """Draw a random sample of records in one pass over the dataset, keeping only ``sampleSize`` records in memory.
+
+        Each record gets a random key and the sample consists of the records with the smallest keys.  If ``unique``, the key is a hash of the record's values, so that identical records get the same key and are only sampled once; this is a uniform sample of the unique records, without ever having them all in memory.
+
+        :type dataset: 2-d Numpy array or callable that returns an iterator over chunks
+        :param dataset: an input dataset
+        :type weights: 1-d Numpy array or ``None``
+        :param weights: input weights
+        :type sampleSize: positive integer
+        :param sampleSize: maximum number of records in the sample
+        :type unique: bool
+        :param unique: if ``True``, sample unique records, ignoring duplicates
+        :rtype: (2-d Numpy array, 1-d Numpy array or ``None``, integer)
+        :return: (dataset, weights, number of records in the whole dataset)
+        """
+        seed = random.getrandbits(64)
+        randomState = numpy.random.RandomState(seed % 2**32)
+
+        sampleKeys = None
+        sampleRecords = None
+        sampleWeights = None
+        numberOfRecords = 0
+        for chunk, chunkWeights in self.iterateChunks(dataset, weights):
+            numberOfRecords += chunk.shape[0]
+            if unique:
+                keys = _hashRecords(chunk, seed)
+            else:
+                keys = randomState.randint(0, 2**63 - 1, chunk.shape[0], dtype=numpy.int64).view(numpy.uint64)
+
+            if sampleKeys is None:
+                sampleKeys, sampleRecords, sampleWeights = keys[:0], chunk[:0], (None if chunkWeights is None else chunkWeights[:0])
+            elif sampleKeys.shape[0] >= sampleSize:
+                # only records with keys below the largest in the sample can get in
+                selection = keys < sampleKeys[-1]
+                keys, chunk = keys[selection], chunk[selection]
+                if chunkWeights is not None:
+                    chunkWeights = chunkWeights[selection]
+
+            keys = numpy.concatenate([sampleKeys, keys])
+            if unique:
+                _, order = numpy.unique(keys, return_index=True)
+            else:
+                order = numpy.argsort(keys, kind="mergesort")
+            order = order[:sampleSize]
+
+            sampleKeys = keys[order]
+            sampleRecords = numpy.concatenate([sampleRecords, chunk])[order]
+            if sampleWeights is not None:
+                sampleWeights = numpy.concatenate([sampleWeights, chunkWeights])[order]
+
+        if sampleKeys is None:
+            raise TypeError("dataset is empty")
+
+        return sampleRecords, sampleWeights, numberOfRecords
+
+    def clusterSums(self, dataset, weights):
+        """Assign each point to its closest cluster and sum the points in each, one chunk at a time (see ``chunkBoundaries``).
+
+        If ``dataset`` is the one that the worker processes were started with (see ``startWorkers``), the chunks are divided among them.  Either way, the chunk sums are added in the same order, so the result does not depend on the number of processes.
+
+        :type dataset: 2-d Numpy array or callable that returns an iterator over chunks
+        :param dataset: an input dataset
+        :type weights: 1-d Numpy array or ``None``
+        :param weights: input weights
+        :rtype: (2-d Numpy array, 1-d Numpy array, 1-d Numpy array)
+        :return: (weighted sum of points, sum of weights, number of points) for each cluster; the first has shape ``(numberOfClusters, numberOfDimensions)``
+        """
+
+        sums = numpy.zeros((self.numberOfClusters, self.numberOfDimensions), dtype=numpy.dtype(float))
+        sumOfWeights = numpy.zeros(self.numberOfClusters, dtype=numpy.dtype(float))
+        counts = numpy.zeros(self.numberOfClusters, dtype=numpy.dtype(int))
+
+        if self.workers is not None and self.workers[1] is dataset:
+            boundaries = self.chunkBoundaries(dataset)
+            pool = self.workers[0]
+            shards = [boundaries[i::self.processes] for i in range(self.processes)]
+            shardResults = pool.map(_workerChunkSums, [(self.clusters, shard) for shard in shards if len(shard) > 0])
+            # shards interleave the chunks, so chunk i is item i // len(shardResults) of shard i % len(shardResults)
+            results = [shardResults[i % len(shardResults)][i // len(shardResults)] for i in range(len(boundaries))]
+        else:
+            results = (self.chunkSums(chunk, chunkWeights) for chunk, chunkWeights in self.iterateChunks(dataset, weights))
+
+        for chunkSums, chunkSumOfWeights, chunkCounts in results:
+            sums += chunkSums
+            sumOfWeights += chunkSumOfWeights
+            counts += chunkCounts
+
+        return sums, sumOfWeights, counts
+
+    def startWorkers(self, dataset, weights):
+        """Start ``processes`` worker processes for ``clusterSums`` on a given dataset (does nothing unless ``processes`` is greater than 1).
+
+        The workers are forked after the dataset exists, so they share its memory with this process and it is never sent to them; each iteration only sends the cluster centers and receives the per-chunk sums.
+
+        :type dataset: 2-d Numpy array
+        :param dataset: an input dataset
+        :type weights: 1-d Numpy array or ``None``
+        :param weights: input weights
+        :rtype: ``None``
+        :return: nothing; call ``stopWorkers`` when done
+        """
+        global _workerState
+        if self.processes is not None and self.processes > 1 and not callable(dataset) and not self.triangleInequality:
+            _workerState = (self, dataset, weights)
+            try:
+                pool = multiprocessing.get_context("fork").Pool(self.processes)
+            finally:
+                _workerState = None
+            self.workers = (pool, dataset, weights)
+
+    def stopWorkers(self):
+        """Stop the worker processes started by ``startWorkers``, if any.
+
+        :rtype: ``None``
+        :return: nothing
+        """
+        if self.workers is not None:
+            pool = self.workers[0]
+            self.workers = None
+            pool.terminate()
+            pool.join()
+
+    def boundedClusterSums(self, dataset, weights):
+        """Compute the same sums as ``clusterSums``, but skip distance calculations by keeping bounds on each point's distances from one iteration to the next (Hamerly 2010).
+
+        For each point, ``self.bounds`` keeps its closest cluster, an upper bound on the distance to that cluster, and a lower bound on the distance to any other.  If the upper bound is less than the lower bound, or less than half the distance from its cluster to the nearest other cluster, the point cannot have changed clusters.  ``updateBounds`` loosens the bounds by how far the clusters move.
+
+        :type dataset: 2-d Numpy array or callable that returns an iterator over chunks
+        :param dataset: an input dataset
+        :type weights: 1-d Numpy array or ``None``
+        :param weights: input weights
+        :rtype: (2-d Numpy array, 1-d Numpy array, 1-d Numpy array)
+        :return: (weighted sum of points, sum of weights, number of points) for each cluster; the first has shape ``(numberOfClusters, numberOfDimensions)``
+        """
+
+        if self.bounds is None or self.bounds[0] is not dataset:
+            numberOfRecords = self.numberOfRecords if callable(dataset) else dataset.shape[0]
+            self.bounds = (dataset, numpy.empty(numberOfRecords, dtype=numpy.dtype(int)), numpy.empty(numberOfRecords, dtype=numpy.dtype(float)), numpy.empty(numberOfRecords, dtype=numpy.dtype(float)))
+            initialized = False
+        else:
+            initialized = True
+        _, assignment, upper, lower = self.bounds
+
+        centers = numpy.array(self.clusters)
+        if self.numberOfClusters > 1:
+            separation = numpy.empty((self.numberOfClusters, self.numberOfClusters), dtype=numpy.dtype(float))
+            for clusterIndex, cluster in enumerate(self.clusters):
+                separation[:, clusterIndex] = self.metric.calculate(centers, cluster)
+            numpy.fill_diagonal(separation, numpy.inf)
+            halfSeparation = 0.5 * separation.min(axis=1)
+        else:
+            halfSeparation = numpy.array([numpy.inf])
+
+        sums = numpy.zeros((self.numberOfClusters, self.numberOfDimensions), dtype=numpy.dtype(float))
+        sumOfWeights = numpy.zeros(self.numberOfClusters, dtype=numpy.dtype(float))
+        counts = numpy.zeros(self.numberOfClusters, dtype=numpy.dtype(int))
+
+        start = 0
+        for chunk, chunkWeights in self.iterateChunks(dataset, weights):
+            stop = start + chunk.shape[0]
+            chunkAssignment, chunkUpper, chunkLower = assignment[start:stop], upper[start:stop], lower[start:stop]
+
+            if not initialized:
+                check = numpy.arange(chunk.shape[0])
+            else:
+                bound = numpy.maximum(halfSeparation[chunkAssignment], chunkLower)
+                check = numpy.nonzero(chunkUpper > bound)[0]
+                if check.shape[0] > 0:
+                    # tighten the upper bound to the actual distance, which may be enough
+                    chunkUpper[check] = self.metric.calculate(chunk[check], centers[chunkAssignment[check]])
+                    check = check[chunkUpper[check] > bound[check]]
+
+            if check.shape[0] > 0:
+                # compute all distances for points that might have changed clusters
+                distanceToCenter = numpy.empty((check.shape[0], self.numberOfClusters), dtype=numpy.dtype(float))
+                for clusterIndex, cluster in enumerate(self.clusters):
+                    distanceToCenter[:, clusterIndex] = self.metric.calculate(chunk[check], cluster)
+                closest = numpy.argmin(distanceToCenter, axis=1)
+                rows = numpy.arange(check.shape[0])
+                chunkAssignment[check] = closest
+                chunkUpper[check] = distanceToCenter[rows, closest]
+                distanceToCenter[rows, closest] = numpy.inf
+                chunkLower[check] = distanceToCenter.min(axis=1)
+
+            chunkSums, chunkSumOfWeights, chunkCounts = self.assignedSums(chunk, chunkWeights, chunkAssignment)
+            sums += chunkSums
+            sumOfWeights += chunkSumOfWeights
+            counts += chunkCounts
+            start = stop
+
+        return sums, sumOfWeights, counts
+
+    def updateBounds(self, dataset, oldClusters):
+        """Loosen the bounds kept by ``boundedClusterSums`` by the distance that each cluster moved.
+
+        :type dataset: 2-d Numpy array or callable that returns an iterator over chunks
+        :param dataset: the input dataset that the bounds describe
+        :type oldClusters: list of 1-d Numpy arrays
+        :param oldClusters: cluster centers before they moved
+        :rtype: ``None``
+        :return: nothing; modifies ``self.bounds`` in-place
+        """
+        if self.bounds is None or self.bounds[0] is not dataset:
+            return
+        _, assignment, upper, lower = self.bounds
+
+        movement = self.metric.calculate(numpy.array(self.clusters), numpy.array(oldClusters))
+        upper += movement[assignment]
+
+        # each point's lower bound decreases by the largest movement of any cluster other than its own
+        if self.numberOfClusters > 1:
+            farthest, secondFarthest = numpy.argsort(movement)[::-1][:2]
+            lower -= numpy.where(assignment == farthest, movement[secondFarthest], movement[farthest])
 
     def iterate(self, dataset, weights, iterationNumber, condition):
         """Perform one iteration step (in-place; modifies ``self.clusters``).
@@ -391,29 +877,25 @@ class KMeans(object):
         :return: the result of the stopping condition
         """
 
-        indexOfClosestCluster = self.closestCluster(dataset, weights)
+        if self.triangleInequality:
+            sums, sumOfWeights, counts = self.boundedClusterSums(dataset, weights)
+            oldClusters = [x.copy() for x in self.clusters]
+        else:
+            sums, sumOfWeights, counts = self.clusterSums(dataset, weights)
 
         values = []
         corrections = []
         for clusterIndex, cluster in enumerate(self.clusters):
-            # select by cluster classification
-            selection = (indexOfClosestCluster == clusterIndex)
-            residuals = (dataset - cluster)[selection]
-
-            # weights scale the residuals
-            if weights is not None:
-                residuals *= weights[selection]
-
-            if self.minPointsInCluster is not None and numpy.sum(selection) < self.minPointsInCluster:
+            if self.minPointsInCluster is not None and counts[clusterIndex] < self.minPointsInCluster:
                 # too few points in this cluster; jump to a new random point
                 self.clusters[clusterIndex] = self.newCluster()
                 values.append(None)
                 corrections.append(None)
 
             else:
-                # compute the mean of the displacements of points associated with this cluster
+                # compute the displacement from the cluster to the weighted mean of points associated with it
                 # (note that the similarity metric used here is the trivial one, possibly different from the classification metric)
-                correction = residuals.mean(axis=0)
+                correction = sums[clusterIndex] / sumOfWeights[clusterIndex] - cluster
                 numpy.add(cluster, correction, cluster)
 
                 if not numpy.isfinite(cluster).all():
@@ -426,8 +908,11 @@ class KMeans(object):
                     values.append(cluster)
                     corrections.append(correction)
 
+        if self.triangleInequality:
+            self.updateBounds(dataset, oldClusters)
+
         # call user-supplied test for continuation
-        return condition(iterationNumber, corrections, values, dataset.shape[0])
+        return condition(iterationNumber, corrections, values, int(counts.sum()))
 
     def stepup(self, condition, base=2):
         """Optimize the cluster set in successively larger subsets of the dataset.  (This can be viewed as a cluster seeding technique.)
@@ -454,7 +939,7 @@ class KMeans(object):
             minPointsInCluster = max(self.numberOfClusters, self.minPointsInCluster)
 
         if self.maxPointsForClustering is None:
-            maxPointsForClustering = self.dataset.shape[0]
+            maxPointsForClustering = self.numberOfRecords
         else:
             maxPointsForClustering = self.maxPointsForClustering
 
@@ -462,10 +947,15 @@ class KMeans(object):
 
         for trialSize in trialSizes:
             dataset, weights = self.randomSubset(trialSize)
-            
-            iterationNumber = 0
-            while self.iterate(dataset, weights, iterationNumber, condition):
-                iterationNumber += 1
+
+            self.bounds = None
+            self.startWorkers(dataset, weights)
+            try:
+                iterationNumber = 0
+                while self.iterate(dataset, weights, iterationNumber, condition):
+                    iterationNumber += 1
+            finally:
+                self.stopWorkers()
 
     def optimize(self, condition):
         """Run a standard k-means (Lloyd's algorithm) on the dataset, changing the clusters *in-place*.
@@ -481,8 +971,80 @@ class KMeans(object):
         else:
             dataset, weights = self.randomSubset(self.maxPointsForClustering)
 
+        self.bounds = None
+        self.startWorkers(dataset, weights)
+        try:
+            iterationNumber = 0
+            while self.iterate(dataset, weights, iterationNumber, condition):
+                iterationNumber += 1
+        finally:
+            self.stopWorkers()
+
+    def iterateMiniBatch(self, dataset, weights, seenWeights, iterationNumber, condition):
+        """Perform one mini-batch step (in-place; modifies ``self.clusters`` and ``seenWeights``).
+
+        Each point in the batch moves its closest cluster toward itself with a learning rate of one over the total weight that cluster has seen so far, which makes each cluster the running mean of all points that have been assigned to it.  Clusters with no points in the batch do not move.
+
+        :type dataset: 2-d Numpy array
+        :param dataset: a batch of the dataset
+        :type weights: 1-d Numpy array
+        :param weights: weights of the batch
+        :type seenWeights: 1-d Numpy array
+        :param seenWeights: total weight assigned to each cluster in previous batches
+        :type iterationNumber: non-negative integer
+        :param iterationNumber: the iteration number
+        :type condition: callable that takes iterationNumber, corrections, values, datasetSize as arguments
+        :param condition: the stopping condition
+        :rtype: bool
+        :return: the result of the stopping condition
+        """
+
+        sums, sumOfWeights, counts = self.clusterSums(dataset, weights)
+
+        values = []
+        corrections = []
+        for clusterIndex, cluster in enumerate(self.clusters):
+            if sumOfWeights[clusterIndex] == 0.0:
+                values.append(cluster)
+                corrections.append(numpy.zeros_like(cluster))
+                continue
+
+            seenWeights[clusterIndex] += sumOfWeights[clusterIndex]
+            correction = (sums[clusterIndex] - sumOfWeights[clusterIndex] * cluster) / seenWeights[clusterIndex]
+            numpy.add(cluster, correction, cluster)
+
+            if not numpy.isfinite(cluster).all():
+                self.clusters[clusterIndex] = self.newCluster()
+                seenWeights[clusterIndex] = 0.0
+                values.append(None)
+                corrections.append(None)
+            else:
+                values.append(cluster)
+                corrections.append(correction)
+
+        # call user-supplied test for continuation
+        return condition(iterationNumber, corrections, values, dataset.shape[0])
+
+    def miniBatch(self, condition, batchSize):
+        """Run mini-batch k-means (Sculley 2010) on random batches of the dataset, changing the clusters *in-place*.
+
+        Each iteration draws a new random batch, so the time and memory per iteration depend on ``batchSize``, not the size of the dataset.  Since clusters keep moving by small amounts, stop with ``maxIterations`` or a threshold like ``allChange(1e-3)`` rather than ``moving``.
+
+        :type condition: callable that takes iterationNumber, corrections, values, datasetSize as arguments
+        :param condition: the stopping condition
+        :type batchSize: positive integer
+        :param batchSize: number of records in each batch; must be strictly greater than the numberOfClusters
+        :rtype: ``None``
+        :return: nothing; modifies cluster set in-place
+        """
+
+        seenWeights = numpy.zeros(self.numberOfClusters, dtype=numpy.dtype(float))
+
         iterationNumber = 0
-        while self.iterate(dataset, weights, iterationNumber, condition):
+        while True:
+            dataset, weights = self.randomSubset(min(batchSize, self.numberOfRecords))
+            if not self.iterateMiniBatch(dataset, weights, seenWeights, iterationNumber, condition):
+                break
             iterationNumber += 1
 
     def centers(self, sort=True):
@@ -543,9 +1105,9 @@ class KMeans(object):
         out = [{"center": x} for x in self.centers(sort=False)]
 
         if populations:
-            indexOfClosestCluster = self.closestCluster(self.dataset, self.weights)
+            sums, sumOfWeights, counts = self.clusterSums(self.dataset, self.weights)
             for clusterIndex in range(len(self.clusters)):
-                out[clusterIndex]["population"] = int(numpy.sum(indexOfClosestCluster == clusterIndex))
+                out[clusterIndex]["population"] = int(counts[clusterIndex])
 
         if sort:
             indexes = [i for i, x in sorted(list(enumerate(self.clusters)), lambda a, b: cmp(list(a[1]), list(b[1])))]
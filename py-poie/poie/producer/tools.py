@@ -473,7 +473,10 @@ def look(expr, maxDepth=8, inlineDepth=2, indexWidth=30, dropAt=True, stream=sys
     stream.flush()
 
 def _dropAt(expr, depth):
-    if isinstance(expr, dict):
+    if depth < 0:
+        # deeper than anything look will print
+        return expr
+    elif isinstance(expr, dict):
         return expr.__class__([(k, _dropAt(v, depth - 1)) for k, v in list(expr.items()) if k != "@"])
     elif isinstance(expr, (list, tuple)):
         return [_dropAt(x, depth - 1) for x in expr]
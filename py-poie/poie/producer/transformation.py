@@ -15,6 +15,8 @@
 # limitations under the License.
 
 import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy
 
@@ -155,6 +157,127 @@ class Transformation(object):
         else:
             raise ValueError("No numpy equivalent defined for expression {0}".format(ast.toJson()))
 
+    @staticmethod
+    def toNumpySteps(ast, steps):
+        """Flatten a PFA abstract syntax tree into a sequence of Numpy function calls, for evaluation with ``out`` buffers (see ``evaluateSteps``).
+
+        Subexpressions that depend only on constants are evaluated immediately.
+
+        :type ast: pypoie.pfaast.Ast
+        :param ast: the PFA to convert
+        :type steps: list of (Numpy function, list of operands)
+        :param steps: calls found so far; new calls are appended *in-place*
+        :rtype: ("field", string), ("constant", value), or ("step", integer)
+        :return: the operand that represents the value of ``ast``: a field name, a constant, or the index of a step
+        """
+
+        if isinstance(ast, Call):
+            if ast.name in Transformation.constants and len(ast.args) == 0:
+                return ("constant", eval(Transformation.constants[ast.name], Transformation.namespace))
+            elif ast.name in Transformation.functions:
+                function = eval(Transformation.functions[ast.name], Transformation.namespace)
+                operands = [Transformation.toNumpySteps(x, steps) for x in ast.args]
+                if all(kind == "constant" for kind, value in operands):
+                    return ("constant", function(*[value for kind, value in operands]))
+                steps.append((function, operands))
+                return ("step", len(steps) - 1)
+            else:
+                raise ValueError("No numpy equivalent defined for function {0}".format(ast.name))
+        elif isinstance(ast, Ref):
+            return ("field", ast.name)
+        elif isinstance(ast, LiteralNull):
+            return ("constant", float("nan"))
+        elif isinstance(ast, (LiteralBoolean, LiteralInt, LiteralLong, LiteralFloat, LiteralDouble, LiteralString)):
+            return ("constant", ast.value)
+        else:
+            raise ValueError("No numpy equivalent defined for expression {0}".format(ast.toJson()))
+
+    @staticmethod
+    def stepTypes(steps, result, inputs):
+        """Determine the Numpy dtype of each step and of the result of a flattened expression by evaluating it on the first element of each input.
+
+        :type steps: list of (Numpy function, list of operands)
+        :param steps: calls from ``toNumpySteps``
+        :type result: operand
+        :param result: the operand returned by ``toNumpySteps``
+        :type inputs: dict from field name to 1-d Numpy array
+        :param inputs: input columns
+        :rtype: (list of Numpy dtypes, Numpy dtype)
+        :return: (dtype of each step, dtype of the result)
+        """
+
+        values = []
+        for function, operands in steps:
+            args = []
+            for kind, value in operands:
+                if kind == "field":
+                    args.append(inputs[value][:1])
+                elif kind == "constant":
+                    args.append(value)
+                else:
+                    args.append(values[value])
+            values.append(numpy.asarray(function(*args)))
+
+        kind, value = result
+        if kind == "field":
+            resultType = inputs[value].dtype
+        elif kind == "constant":
+            resultType = numpy.asarray(value).dtype
+        else:
+            resultType = values[value].dtype
+        return [x.dtype for x in values], resultType
+
+    @staticmethod
+    def evaluateSteps(steps, result, types, inputs, out, scratch):
+        """Evaluate a flattened expression on one block of inputs, writing the result into ``out``.
+
+        Intermediate results go into buffers from ``scratch``, which are returned to it as soon as they have been used, so a block needs at most one buffer per dtype per level of nesting, and the buffers can be reused for the next block.
+
+        :type steps: list of (Numpy function, list of operands)
+        :param steps: calls from ``toNumpySteps``
+        :type result: operand
+        :param result: the operand returned by ``toNumpySteps``
+        :type types: list of Numpy dtypes
+        :param types: dtype of each step (see ``stepTypes``)
+        :type inputs: dict from field name to 1-d Numpy array
+        :param inputs: one block of the input columns
+        :type out: 1-d Numpy array
+        :param out: where to put the result; its length is the length of the block
+        :type scratch: dict from Numpy dtype to list of 1-d Numpy arrays
+        :param scratch: unused buffers at least as long as the block (filled in as needed)
+        """
+
+        size = len(out)
+        buffers = {}
+        for index, (function, operands) in enumerate(steps):
+            args = []
+            for kind, value in operands:
+                if kind == "field":
+                    args.append(inputs[value])
+                elif kind == "constant":
+                    args.append(value)
+                else:
+                    # each intermediate is used exactly once, so its buffer can be the output of this very step
+                    buf, view = buffers.pop(value)
+                    args.append(view)
+                    scratch.setdefault(buf.dtype, []).append(buf)
+
+            if result == ("step", index):
+                target = out
+            else:
+                pool = scratch.setdefault(types[index], [])
+                buf = pool.pop() if len(pool) > 0 and len(pool[-1]) >= size else numpy.empty(size, dtype=types[index])
+                target = buf[:size]
+                buffers[index] = (buf, target)
+
+            function(*args, out=target)
+
+        kind, value = result
+        if kind == "field":
+            out[:] = inputs[value]
+        elif kind == "constant":
+            out[:] = value
+
     def __init__(self, *indexed, **named):
         """Create a Transformation either from an ordered list of Python expressions or by keywords.
 
@@ -185,11 +308,17 @@ class Transformation(object):
         # construct lambda functions for transforming Numpy
         self.lambdas = dict((k, eval("lambda " + ", ".join(self.fields) + ": " + Transformation.toNumpyExpr(ppfa(v)), self.namespace)) for k, v in list(self.exprs.items()))
 
-    def transform(self, dataset, fieldNames=None):
+    def transform(self, dataset, fieldNames=None, chunkSize=None, threads=None):
         """Return a transformed Numpy dataset (leaving the original intact).
 
+        By default, each operation is applied to whole columns, which creates a temporary array as large as the dataset for each operation. If ``chunkSize`` or ``threads`` is given, the expressions are evaluated on blocks of ``chunkSize`` rows instead, passing preallocated ``out`` buffers to the Numpy functions (see ``evaluateSteps``), so that temporaries stay small enough to remain in cache and are reused from one block to the next. Results are the same either way.
+
         :type dataset: Numpy record array, dict of 1-D Numpy arrays, or Numpy 2-d table
         :param dataset: input dataset to be transformed; the Numpy record names or dict keys must correspond to the keywords of the arguments used to construct this ``Transformation``, or the column indexes of the 2-d table must correspond to the positions of the arguments used to construct this ``Transformation``.
+        :type chunkSize: positive integer or ``None``
+        :param chunkSize: number of rows in each block; ``None`` for whole columns, unless ``threads`` is given, in which case 65536
+        :type threads: positive integer or ``None``
+        :param threads: number of threads evaluating blocks at the same time (Numpy functions release the global interpreter lock); ``None`` to evaluate blocks in this thread
         :rtype: same as ``dataset``
         :return: transformed dataset (operations are *not* performed in-place)
         """
@@ -224,11 +353,23 @@ class Transformation(object):
         if len(cannotSupply) > 0:
             raise TypeError("expressions need [{0}], which are not supplied".format(", ".join(sorted(cannotSupply))))
 
-        # evaluate the Numpy expressions
         if outType == "array":
-            computed = dict((k, v(*[dataset[:, fieldNames.index(f)] for f in self.fields])) for k, v in list(self.lambdas.items()))
+            columns = dict((f, dataset[:, fieldNames.index(f)]) for f in self.fields)
         else:
-            computed = dict((k, v(*[dataset[f] for f in self.fields])) for k, v in list(self.lambdas.items()))
+            columns = dict((f, dataset[f]) for f in self.fields)
+
+        if chunkSize is None and threads is None:
+            # evaluate the Numpy expressions
+            computed = dict((k, v(*[columns[f] for f in self.fields])) for k, v in list(self.lambdas.items()))
+        else:
+            # evaluate the Numpy expressions block by block
+            if chunkSize is None:
+                chunkSize = 65536
+            if outType == "dict":
+                numRows = max([len(x) for x in dataset.values()] + [0])
+            else:
+                numRows = dataset.shape[0]
+            computed = self.transformBlocks(columns, numRows, chunkSize, threads)
 
         # return the same type you received
         if outType == "recarray":
@@ -238,6 +379,50 @@ class Transformation(object):
         elif outType == "array":
             return numpy.vstack([computed[k] for k in self.order]).T
 
+    def transformBlocks(self, columns, numRows, chunkSize, threads):
+        """Evaluate all of the expressions on blocks of the input columns, writing each block of results directly into the output arrays; normally only called by ``transform``.
+
+        :type columns: dict from field name to 1-d Numpy array
+        :param columns: input columns
+        :type numRows: non-negative integer
+        :param numRows: length of the input columns
+        :type chunkSize: positive integer
+        :param chunkSize: number of rows in each block
+        :type threads: positive integer or ``None``
+        :param threads: number of threads evaluating blocks at the same time; ``None`` to evaluate blocks in this thread
+        :rtype: dict from expression name to 1-d Numpy array
+        :return: transformed columns
+        """
+
+        plans = {}
+        computed = {}
+        for k in self.order:
+            steps = []
+            result = Transformation.toNumpySteps(ppfa(self.exprs[k]), steps)
+            types, resultType = Transformation.stepTypes(steps, result, columns)
+            plans[k] = (steps, result, types)
+            computed[k] = numpy.empty(numRows, dtype=resultType)
+
+        local = threading.local()
+        def evaluateBlock(start):
+            if not hasattr(local, "scratch"):
+                local.scratch = {}
+            stop = min(start + chunkSize, numRows)
+            inputs = dict((f, column[start:stop]) for f, column in columns.items())
+            for k in self.order:
+                steps, result, types = plans[k]
+                Transformation.evaluateSteps(steps, result, types, inputs, computed[k][start:stop], local.scratch)
+
+        starts = range(0, numRows, chunkSize)
+        if threads is None or threads <= 1:
+            for start in starts:
+                evaluateBlock(start)
+        else:
+            with ThreadPoolExecutor(threads) as executor:
+                for x in executor.map(evaluateBlock, starts):
+                    pass
+        return computed
+
     @staticmethod
     def interpret(x):
         """Interpret expression from a PFA abstract syntax tree or PrettyPFA string.
@@ -25,6 +25,7 @@ from avro.io import DatumReader
 
 import poie.util
 from poie.util import pos
+from poie.util import ts
 
 from poie.pfaast import validSymbolName
 from poie.pfaast import validFunctionName
@@ -33,6 +34,7 @@ from poie.pfaast import Method
 from poie.pfaast import EngineConfig
 from poie.pfaast import Cell
 from poie.pfaast import Pool
+from poie.pfaast import DecodedInit
 from poie.pfaast import Argument
 from poie.pfaast import Expression
 from poie.pfaast import LiteralValue
@@ -87,7 +89,25 @@ from poie.pfaast import Error
 from poie.pfaast import Try
 from poie.pfaast import Log
 from poie.errors import PFASyntaxException
+from poie.errors import AvroException
+from poie.errors import SchemaParseException
 from poie.datatype import AvroTypeBuilder
+from poie.datatype import AvroNull
+from poie.datatype import AvroBoolean
+from poie.datatype import AvroInt
+from poie.datatype import AvroLong
+from poie.datatype import AvroFloat
+from poie.datatype import AvroDouble
+from poie.datatype import AvroBytes
+from poie.datatype import AvroFixed
+from poie.datatype import AvroString
+from poie.datatype import AvroEnum
+from poie.datatype import AvroArray
+from poie.datatype import AvroMap
+from poie.datatype import AvroRecord
+from poie.datatype import AvroUnion
+from poie.datatype import compileJsonDecoder
+from poie.datatype import ForwardDeclarationParser
 
 def jsonToAst(jsonInput):
     """Reads PFA from serialized JSON into an abstract syntax tree.
@@ -115,6 +135,363 @@ def jsonToAst(jsonInput):
     avroTypeBuilder.resolveTypes()
     return result
 
+def jsonStreamToAst(inputStream):
+    """Reads PFA from a stream of serialized JSON into an abstract syntax tree, without loading the whole document.
+
+    Code sections (everything other than ``cells`` and ``pools``) are small and are read as usual, but cell and pool ``init`` values are decoded event by event into the form that PFAEngine uses at runtime (poie.pfaast.DecodedInit), so the raw JSON tree and its serialized strings never exist. This only works if a cell or pool's ``type`` comes before its ``init`` and any named types it refers to have already been defined; otherwise, that one ``init`` is held as Pythonized JSON until the end of the document.
+
+    :type inputStream: open JSON file (binary or text)
+    :param inputStream: input JSON
+    :rtype: pypoie.pfaast.EngineConfig
+    :return: a PFA configuration that has passed syntax but not semantics checks
+    """
+    import ijson
+
+    events = iter(ijson.basic_parse(inputStream))
+    avroTypeBuilder = AvroTypeBuilder()
+    probe = _StreamTypeProbe(avroTypeBuilder)
+    pending = []
+
+    event, value = next(events)
+    if event != "start_map":
+        raise PFASyntaxException("PFA engine must be a JSON object, not " + _trunc(repr(_streamJsonNode(event, value, events))), None)
+
+    data = {}
+    _cells = {}
+    _pools = {}
+    for event, key in events:
+        if event == "end_map":
+            break
+        event, value = next(events)
+        if key == "cells":
+            _cells = _streamCells(event, value, events, key, avroTypeBuilder, probe, pending)
+        elif key == "pools":
+            _pools = _streamPools(event, value, events, key, avroTypeBuilder, probe, pending)
+        else:
+            data[key] = _streamJsonNode(event, value, events)
+
+    config = _readEngineConfig(data, avroTypeBuilder)
+    avroTypeBuilder.resolveTypes()
+
+    while len(pending) > 0:
+        ast, decode, node = pending.pop()
+        ast.init = DecodedInit(decode(ast.avroType, node))
+
+    return EngineConfig(config.name, config.method, config.inputPlaceholder, config.outputPlaceholder, config.begin, config.action, config.end, config.fcns, config.zero, config.merge, _cells, _pools, config.randseed, config.doc, config.version, config.metadata, config.options, config.pos)
+
+def _streamJsonNode(event, value, events):
+    """Build Pythonized JSON from ijson events, starting with an (event, value) that has already been taken from ``events``."""
+    if event == "start_map":
+        out = {}
+        for event, key in events:
+            if event == "end_map":
+                return out
+            event, value = next(events)
+            out[key] = _streamJsonNode(event, value, events)
+    elif event == "start_array":
+        out = []
+        for event, value in events:
+            if event == "end_array":
+                return out
+            out.append(_streamJsonNode(event, value, events))
+    elif event == "number" and not isinstance(value, int):
+        return float(value)
+    else:
+        return value
+
+def _streamSkip(event, events):
+    """Discard the rest of one JSON value from ijson events."""
+    if event in ("start_map", "start_array"):
+        depth = 1
+        for event, value in events:
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+                if depth == 0:
+                    return
+
+def _compileEventDecoder(avroType, memo=None):
+    """Build a function that decodes one value of ``avroType`` from ijson events, producing the same result as ``poie.datatype.compileJsonDecoder``.
+
+    :type avroType: pypoie.datatype.AvroType
+    :param avroType: how we want to interpret the JSON
+    :type memo: dict or ``None``
+    :param memo: decoders for records that are already being compiled (used for recursive records)
+    :rtype: callable
+    :return: function from (event, value, events) to an object ready for PFAEngine.action
+    """
+
+    if memo is None:
+        memo = {}
+
+    def fail(event, value, events):
+        if event in ("start_map", "start_array"):
+            value = _streamJsonNode(event, value, events)
+        raise AvroException("{0} does not match schema {1}".format(_trunc(json.dumps(value, default=str)), ts(avroType)))
+
+    if isinstance(avroType, AvroNull):
+        def decode(event, value, events):
+            if event == "null":
+                return None
+            fail(event, value, events)
+
+    elif isinstance(avroType, AvroBoolean):
+        def decode(event, value, events):
+            if event == "boolean":
+                return value
+            fail(event, value, events)
+
+    elif isinstance(avroType, (AvroInt, AvroLong)):
+        def decode(event, value, events):
+            if event == "number":
+                return int(value)
+            fail(event, value, events)
+
+    elif isinstance(avroType, (AvroFloat, AvroDouble)):
+        def decode(event, value, events):
+            if event == "number":
+                return float(value)
+            fail(event, value, events)
+
+    elif isinstance(avroType, AvroBytes):
+        def decode(event, value, events):
+            if event == "string":
+                return bytes(value.encode())
+            fail(event, value, events)
+
+    elif isinstance(avroType, AvroFixed):
+        size = avroType.size
+        def decode(event, value, events):
+            if event == "string":
+                out = bytes(value.encode())
+                if len(out) == size:
+                    return out
+            fail(event, value, events)
+
+    elif isinstance(avroType, AvroString):
+        def decode(event, value, events):
+            if event == "string":
+                return value
+            fail(event, value, events)
+
+    elif isinstance(avroType, AvroEnum):
+        symbols = set(avroType.symbols)
+        def decode(event, value, events):
+            if event == "string" and value in symbols:
+                return value
+            fail(event, value, events)
+
+    elif isinstance(avroType, AvroArray):
+        decodeItem = _compileEventDecoder(avroType.items, memo)
+        def decode(event, value, events):
+            if event == "start_array":
+                out = []
+                for event, value in events:
+                    if event == "end_array":
+                        return out
+                    out.append(decodeItem(event, value, events))
+            fail(event, value, events)
+
+    elif isinstance(avroType, AvroMap):
+        decodeValue = _compileEventDecoder(avroType.values, memo)
+        def decode(event, value, events):
+            if event == "start_map":
+                out = {}
+                for event, key in events:
+                    if event == "end_map":
+                        return out
+                    event, value = next(events)
+                    if key == "@":
+                        _streamSkip(event, events)
+                    else:
+                        out[key] = decodeValue(event, value, events)
+            fail(event, value, events)
+
+    elif isinstance(avroType, AvroRecord):
+        if avroType.fullName in memo:
+            return memo[avroType.fullName]
+        fields = {}
+        missing = []
+        def decode(event, value, events):
+            if event == "start_map":
+                out = {}
+                for event, key in events:
+                    if event == "end_map":
+                        break
+                    event, value = next(events)
+                    if key in fields:
+                        out[key] = fields[key](event, value, events)
+                    else:
+                        _streamSkip(event, events)
+                for name, decodeDefault, default, isNull in missing:
+                    if name not in out:
+                        if default is not None:
+                            out[name] = decodeDefault(default)
+                        elif isNull:
+                            out[name] = None
+                        else:
+                            raise AvroException("record is missing field \"{0}\" of schema {1}".format(name, ts(avroType)))
+                return out
+            fail(event, value, events)
+        memo[avroType.fullName] = decode
+        for field in avroType.fields:
+            fields[field.name] = _compileEventDecoder(field.avroType, memo)
+            missing.append((field.name, compileJsonDecoder(field.avroType), field.default, isinstance(field.avroType, AvroNull)))
+
+    elif isinstance(avroType, AvroUnion):
+        hasNull = any(isinstance(x, AvroNull) for x in avroType.types)
+        decoders = dict((x.name, _compileEventDecoder(x, memo)) for x in avroType.types)
+        def decode(event, value, events):
+            if event == "null" and hasNull:
+                return None
+            elif event == "start_map":
+                out = None
+                for event, tag in events:
+                    if event == "end_map":
+                        if out is not None:
+                            return out
+                        break
+                    event, value = next(events)
+                    if tag == "@":
+                        _streamSkip(event, events)
+                    elif out is None and tag in decoders:
+                        out = {tag: decoders[tag](event, value, events)}
+                    else:
+                        raise AvroException("union value with tag \"{0}\" does not match schema {1}".format(tag, ts(avroType)))
+                raise AvroException("empty union value does not match schema {0}".format(ts(avroType)))
+            fail(event, value, events)
+
+    else:
+        raise Exception
+
+    return decode
+
+class _StreamTypeProbe(object):
+    """Resolves cell and pool types from the types seen so far while streaming, parsing each type string only once.
+
+    Types that refer to names that haven't been defined yet wait until more types have been seen; everything is resolved properly by ``avroTypeBuilder.resolveTypes`` at the end of the document.
+    """
+
+    def __init__(self, avroTypeBuilder):
+        self.avroTypeBuilder = avroTypeBuilder
+        self.parser = ForwardDeclarationParser()
+        self.numSeen = 0
+        self.resolved = {}
+        self.waiting = []
+
+    def resolve(self, avroJsonString):
+        if avroJsonString not in self.resolved:
+            try:
+                self.resolved[avroJsonString] = self.parser.parse([avroJsonString])[avroJsonString]
+            except (SchemaParseException, AvroException):
+                return None
+        return self.resolved[avroJsonString]
+
+    def __call__(self, typeNode):
+        """Resolve a cell or pool type, or return ``None`` if it depends on types that haven't been read yet."""
+        originals = self.avroTypeBuilder.originals
+        if self.numSeen < len(originals):
+            self.waiting.extend(originals[self.numSeen:])
+            self.numSeen = len(originals)
+            progress = True
+            while progress:
+                stillWaiting = [x for x in self.waiting if self.resolve(x) is None]
+                progress = len(stillWaiting) < len(self.waiting)
+                self.waiting = stillWaiting
+        return self.resolve(json.dumps(_stripAtSigns(typeNode)))
+
+def _streamCells(event, value, events, dot, avroTypeBuilder, probe, pending):
+    if event != "start_map":
+        raise PFASyntaxException("expected map of cells, not " + _trunc(repr(_streamJsonNode(event, value, events))), dot)
+    out = {}
+    for event, name in events:
+        if event == "end_map":
+            return out
+        event, value = next(events)
+        if name == "@":
+            _streamSkip(event, events)
+        elif not validSymbolName(name):
+            raise PFASyntaxException("\"{0}\" is not a valid symbol name".format(name), dot)
+        else:
+            out[name] = _streamCellOrPool(event, value, events, dot, avroTypeBuilder, probe, pending, False)
+
+def _streamPools(event, value, events, dot, avroTypeBuilder, probe, pending):
+    if event != "start_map":
+        raise PFASyntaxException("expected map of pools, not " + _trunc(repr(_streamJsonNode(event, value, events))), dot)
+    out = {}
+    for event, name in events:
+        if event == "end_map":
+            return out
+        event, value = next(events)
+        if name == "@":
+            _streamSkip(event, events)
+        elif not validSymbolName(name):
+            raise PFASyntaxException("\"{0}\" is not a valid symbol name".format(name), dot)
+        else:
+            out[name] = _streamCellOrPool(event, value, events, dot, avroTypeBuilder, probe, pending, True)
+
+def _streamCellOrPool(event, value, events, dot, avroTypeBuilder, probe, pending, isPool):
+    """Read one cell or pool, decoding its ``init`` as it streams by; the other fields are small and go through ``_readCell`` or ``_readPool``."""
+    what = "pool" if isPool else "cell"
+    if event != "start_map":
+        raise PFASyntaxException("expected {0}, not {1}".format(what, _trunc(repr(_streamJsonNode(event, value, events)))), None)
+
+    data = {}
+    decoded = None
+    node = None
+    for event, key in events:
+        if event == "end_map":
+            break
+        event, value = next(events)
+        if key != "init" or event not in ("start_map", "start_array"):
+            data[key] = _streamJsonNode(event, value, events)
+            continue
+
+        data["init"] = {} if isPool else None
+        avroType = None
+        if "type" in data and data.get("source", "embedded") == "embedded":
+            avroType = probe(data["type"])
+
+        if avroType is None:
+            node = _stripAtSigns(_streamJsonNode(event, value, events))
+        elif not isPool:
+            decoded = _compileEventDecoder(avroType)(event, value, events)
+        elif event == "start_map":
+            decodeItem = _compileEventDecoder(avroType)
+            decoded = {}
+            for event, itemKey in events:
+                if event == "end_map":
+                    break
+                event, value = next(events)
+                if itemKey == "@":
+                    _streamSkip(event, events)
+                else:
+                    decoded[itemKey] = decodeItem(event, value, events)
+        else:
+            node = _streamJsonNode(event, value, events)
+
+    if isPool:
+        result = _readPool(data, dot, avroTypeBuilder)
+    else:
+        result = _readCell(data, dot, avroTypeBuilder)
+
+    if decoded is not None:
+        result.init = DecodedInit(decoded)
+    elif node is not None:
+        if result.source != "embedded":
+            raise PFASyntaxException("source: {0} requires init to be a string".format(result.source), result.pos)
+        if isPool:
+            if not isinstance(node, dict):
+                raise PFASyntaxException("expected map of JSON objects, not " + _trunc(repr(node)), dot + " -> init")
+            def decode(avroType, node):
+                decodeItem = compileJsonDecoder(avroType)
+                return dict((k, decodeItem(v)) for k, v in node.items())
+        else:
+            decode = lambda avroType, node: compileJsonDecoder(avroType)(node)
+        pending.append((result, decode, node))
+    return result
+
 def yamlToAst(yamlInput):
     """Reads PFA from serialized YAML into an abstract syntax tree.
 
@@ -659,6 +659,65 @@ class Sig(Signature):
         else:
             raise Exception(repr(pat))
 
+class SignatureCache(object):
+    """Memoizes ``Signature.accepts`` for a poie.pfaast.FunctionTable.
+
+    Machine-generated PFA often calls the same function with the same argument types many times, and each match re-runs the full pattern match. Matching depends only on the signature, the argument types, and the PFA version, so the result is looked up by (signature, canonical argument types, version).
+    """
+
+    def __init__(self):
+        self.table = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "<poie.signature.SignatureCache {0} entries, {1} hits, {2} misses at {3}>".format(len(self.table), self.hits, self.misses, "0x%x" % id(self))
+
+    @staticmethod
+    def canonical(t):
+        """Return a hashable key that identifies an argument type (poie.datatype.AvroType or poie.datatype.FcnType) by structure."""
+        if isinstance(t, ExceptionType):
+            return ExceptionType
+        elif isinstance(t, AvroType):
+            return t.canonicalId
+        elif isinstance(t, FcnType):
+            return (FcnType, tuple(SignatureCache.canonical(x) for x in t.params), SignatureCache.canonical(t.ret))
+        else:
+            return repr(t)
+
+    def accepts(self, sig, args, version):
+        """Determine if a signature accepts the given arguments, using previous results when possible.
+
+        :type sig: poie.signature.Signature
+        :param sig: signature to match
+        :type args: list of poie.datatype.Type
+        :param args: argument types
+        :type version: pypoie.signature.PFAVersion
+        :param version: PFA version number in which to interpret the patterns
+        :rtype: (pypoie.signature.Sig, list of poie.datatype.AvroType, AvroType)
+        :return: same as ``sig.accepts(args, version)``
+        """
+        key = (sig, tuple(self.canonical(x) for x in args), version.major, version.minor, version.release)
+        try:
+            result = self.table[key]
+        except KeyError:
+            self.misses += 1
+            result = sig.accepts(args, version)
+            self.table[key] = result
+        else:
+            self.hits += 1
+        if result is None:
+            return None
+        else:
+            matched, paramTypes, retType = result
+            return matched, list(paramTypes), retType
+
+    def clear(self):
+        """Forget all results and reset the statistics."""
+        self.table = {}
+        self.hits = 0
+        self.misses = 0
+
 def toText(p, alreadyLabeled=None):
     """Render a pattern as human-readable text.
 
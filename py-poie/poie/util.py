@@ -394,3 +394,19 @@ def avscToPretty(avsc, indent=0):
 
     else:
         raise TypeError("malformed Avro schema")
+
+def ijsonBackend():
+    """Provide the fastest ijson backend that is installed: the C extension (yajl2_c) if available, then the CFFI and ctypes bindings to the yajl library, and finally the pure-Python parser.
+
+    All backends accept binary input streams and provide the same ``parse``, ``basic_parse``, and ``items`` functions as the ``ijson`` module.
+
+    :rtype: module
+    :return: ijson backend
+    """
+    import importlib
+    for name in "yajl2_c", "yajl2_cffi", "yajl2":
+        try:
+            return importlib.import_module("ijson.backends." + name)
+        except ImportError:
+            pass
+    return importlib.import_module("ijson.backends.python")
@@ -39,7 +39,7 @@ setup(name="poie",
                 "poie.lib.stat",
                 "poie.pmml",
                 "poie.inspector"],
-      scripts = ["scripts/pfainspector", "scripts/pfachain", "scripts/pfaexternalize", "scripts/pfarandom", "scripts/pfasize"],
+      scripts = ["scripts/pfainspector", "scripts/pfachain", "scripts/pfaexternalize", "scripts/pfarandom", "scripts/pfasize", "scripts/pfavalidate"],
       description="Python implementation of Portable Format for Analytics (PFA): producer, converter, and consumer.",
       test_suite="test",
       install_requires=["avro >= 1.7.7", "ply == 3.4"],
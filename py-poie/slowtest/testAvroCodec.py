@@ -0,0 +1,143 @@
+# Copyright (C) 2021 Data Mining Group
+# 
+# 
+# 
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import tempfile
+import time
+import unittest
+
+from avro.datafile import DataFileReader, DataFileWriter
+from avro.io import DatumReader, DatumWriter
+
+from poie.genpy import PFAEngine
+from poie.datatype import checkData
+from poie.datatype import jsonNodeToAvroType
+from poie.errors import *
+
+class TestAvroCodec(unittest.TestCase):
+    pfaDocument = {
+        "input": {"type": "record", "name": "Input", "fields": [
+            {"name": "x", "type": "double"},
+            {"name": "n", "type": "long"},
+            {"name": "label", "type": "string"},
+            {"name": "flag", "type": {"type": "enum", "name": "Flag", "symbols": ["A", "B", "C"]}},
+            {"name": "tags", "type": {"type": "array", "items": "string"}},
+            {"name": "scores", "type": {"type": "map", "values": "float"}},
+            {"name": "maybe", "type": ["null", "int", "string"]}
+            ]},
+        "output": "Input",
+        "action": "input"
+        }
+
+    def makeData(self, numRecords):
+        return [{"x": i * 0.5, "n": i * 1000003, "label": "record {0}".format(i), "flag": "ABC"[i % 3], "tags": ["t{0}".format(j) for j in range(i % 5)],
+                 "scores": {"s{0}".format(j): float(j) for j in range(i % 4)}, "maybe": [None, i, "s{0}".format(i)][i % 3]} for i in range(numRecords)]
+
+    def testReadWrite(self):
+        engine, = PFAEngine.fromJson(self.pfaDocument)
+        data = self.makeData(50000)
+
+        fileName = tempfile.mktemp(suffix=".avro")
+        try:
+            writer = DataFileWriter(open(fileName, "wb"), DatumWriter(), engine.config.input.schema)
+            for datum in data:
+                writer.append(datum)
+            writer.close()
+
+            startTime = time.time()
+            generic = [checkData(x, engine.config.input) for x in engine.avroInputIterator(open(fileName, "rb"), "avro")]
+            print("avro DatumReader + checkData: {0} seconds".format(time.time() - startTime))
+
+            startTime = time.time()
+            compiled = list(engine.avroInputIterator(open(fileName, "rb"), "compiled"))
+            print("compiled decoder: {0} seconds".format(time.time() - startTime))
+
+            self.assertEqual(generic, compiled)
+
+            # the generic DatumWriter does not accept tagged unions, so it gets the original (untagged) data
+            for interpreter, outputs in ("avro", data), ("compiled", compiled):
+                startTime = time.time()
+                writer = engine.avroOutputDataFileWriter(fileName, interpreter)
+                for datum in outputs:
+                    writer.append(datum)
+                writer.close()
+                print("{0} writer: {1} seconds".format(interpreter, time.time() - startTime))
+                self.assertEqual(list(engine.avroInputIterator(open(fileName, "rb"), "compiled")), compiled)
+
+        finally:
+            if os.path.exists(fileName):
+                os.remove(fileName)
+
+    def writeFile(self, writerSchema, data):
+        stream = io.BytesIO()
+        writer = DataFileWriter(stream, DatumWriter(), jsonNodeToAvroType(writerSchema).schema)
+        for datum in data:
+            writer.append(datum)
+        writer.flush()
+        return io.BytesIO(stream.getvalue())
+
+    def testSchemaResolution(self):
+        readerDocument = {
+            "input": {"type": "record", "name": "Input", "fields": [
+                {"name": "x", "type": "double"},
+                {"name": "n", "type": "long"},
+                {"name": "label", "type": "string"},
+                {"name": "flag", "type": {"type": "enum", "name": "Flag", "symbols": ["A", "B", "C"]}},
+                {"name": "maybe", "type": ["null", "double", "string"]},
+                {"name": "added", "type": ["null", "int"], "default": None},
+                {"name": "size", "type": "int", "default": 7}
+                ]},
+            "output": "Input",
+            "action": "input"
+            }
+        # fields in another order, with narrower numbers, bytes for a string, a smaller enum, an extra field, and two missing fields
+        writerSchema = {"type": "record", "name": "Input", "fields": [
+            {"name": "extra", "type": {"type": "array", "items": {"type": "map", "values": "string"}}},
+            {"name": "maybe", "type": ["null", "int", "string"]},
+            {"name": "flag", "type": {"type": "enum", "name": "Flag", "symbols": ["C", "A"]}},
+            {"name": "label", "type": "bytes"},
+            {"name": "n", "type": "int"},
+            {"name": "x", "type": "float"}
+            ]}
+        data = [{"extra": [{"a": "b"}] * (i % 3), "maybe": [None, i, "s"][i % 3], "flag": "CA"[i % 2], "label": "record {0}".format(i).encode("utf-8"), "n": -i, "x": i * 0.5} for i in range(1000)]
+        expected = [{"x": i * 0.5, "n": -i, "label": "record {0}".format(i), "flag": "CA"[i % 2], "maybe": [None, {"double": float(i)}, {"string": "s"}][i % 3], "added": None, "size": 7} for i in range(1000)]
+
+        engine, = PFAEngine.fromJson(readerDocument)
+        resolved = list(engine.avroInputIterator(self.writeFile(writerSchema, data), "compiled"))
+        self.assertEqual(resolved, expected)
+        self.assertEqual([engine.action(x) for x in resolved[:3]], expected[:3])
+
+        # incompatible schemas are rejected before anything is decoded
+        for field, writerFieldType in ("n", "string"), ("flag", {"type": "enum", "name": "Other", "symbols": ["A"]}), ("label", "double"):
+            schema = {"type": "record", "name": "Input", "fields": [dict(f, type=writerFieldType) if f["name"] == field else f for f in writerSchema["fields"]]}
+            datum = dict(data[0], **{field: {"n": "x", "flag": "A", "label": 1.0}[field]})
+            self.assertRaises(AvroException, lambda: engine.avroInputIterator(self.writeFile(schema, [datum]), "compiled"))
+
+        schema = {"type": "record", "name": "Input", "fields": [f for f in writerSchema["fields"] if f["name"] != "n"]}
+        self.assertRaises(AvroException, lambda: engine.avroInputIterator(self.writeFile(schema, [dict((k, v) for k, v in data[0].items() if k != "n")]), "compiled"))
+
+        # writer enum symbols and union branches that the reader lacks are only errors if they occur
+        schema = {"type": "record", "name": "Input", "fields": [dict(f, type={"type": "enum", "name": "Flag", "symbols": ["A", "D"]}) if f["name"] == "flag" else f for f in writerSchema["fields"]]}
+        iterator = engine.avroInputIterator(self.writeFile(schema, [dict(data[0], flag="A"), dict(data[0], flag="D")]), "compiled")
+        self.assertRaises(AvroException, lambda: list(iterator))
+        schema = {"type": "record", "name": "Input", "fields": [dict(f, type=["null", "int", "string", "boolean"]) if f["name"] == "maybe" else f for f in writerSchema["fields"]]}
+        self.assertEqual(list(engine.avroInputIterator(self.writeFile(schema, data[:3]), "compiled")), expected[:3])
+        self.assertRaises(AvroException, lambda: list(engine.avroInputIterator(self.writeFile(schema, [dict(data[0], maybe=True)]), "compiled")))
+
+if __name__ == "__main__":
+    unittest.main()
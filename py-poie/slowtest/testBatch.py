@@ -0,0 +1,121 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import poie.batch
+
+pmmlDocument = '''<PMML version="4.2">
+    <Header/>
+    <DataDictionary>
+        <DataField name="x" optype="continuous" dataType="double"/>
+    </DataDictionary>
+    <MiningModel functionName="regression">
+        <Segmentation multipleModelMethod="sum">
+            <Segment id="1"><True/><TreeModel functionName="regression" splitCharacteristic="binarySplit">
+                <Node><True/><Node score="1.0"><SimplePredicate field="x" operator="lessThan" value="0.5"/></Node><Node score="2.0"><SimplePredicate field="x" operator="greaterOrEqual" value="0.5"/></Node></Node>
+            </TreeModel></Segment>
+            <Segment id="2"><True/><TreeModel functionName="regression" splitCharacteristic="binarySplit">
+                <Node><True/><Node score="10.0"><SimplePredicate field="x" operator="lessThan" value="0.25"/></Node><Node score="20.0"><SimplePredicate field="x" operator="greaterOrEqual" value="0.25"/></Node></Node>
+            </TreeModel></Segment>
+        </Segmentation>
+    </MiningModel>
+</PMML>'''
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.scripts = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+        self.env = dict(os.environ)
+        self.env["PYTHONPATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+        os.mkdir(os.path.join(self.directory, "sub"))
+        self.write("good.pfa", json.dumps({"input": "double", "output": "double", "action": {"+": ["input", 1]}}))
+        self.write("good.yaml", "input: double\noutput: double\naction: {\"*\": [input, 2]}\n")
+        self.write(os.path.join("sub", "bad.json"), json.dumps({"input": "double", "output": "string", "action": "input"}))
+        self.write(os.path.join("sub", "forest.pmml"), pmmlDocument)
+        self.write("notes.txt", "not a document")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        with open(os.path.join(self.directory, name), "w") as file:
+            file.write(content)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def testFindDocuments(self):
+        self.assertEqual(poie.batch.documentFormat("x.PMML"), "pmml")
+        self.assertEqual(poie.batch.documentFormat("x.txt"), None)
+        self.assertEqual(poie.batch.findDocuments([self.directory]), [self.path("good.pfa"), self.path("good.yaml"), self.path(os.path.join("sub", "bad.json")), self.path(os.path.join("sub", "forest.pmml"))])
+        self.assertEqual(poie.batch.findDocuments([self.path("notes.txt")]), [self.path("notes.txt")])
+
+    def testReaderOptions(self):
+        fileName = self.path(os.path.join("sub", "forest.pmml"))
+        self.assertEqual(poie.batch.readDocument(fileName, "pmml", {"engine.name": "Forest"}).name, "Forest")
+        self.assertNotEqual(poie.batch.readDocument(fileName, "pmml").name, "Forest")
+
+        for readerOptions in None, {"reader.streaming": False}, {"reader.streaming": True}:
+            result = poie.batch.validateDocument(fileName, readerOptions=readerOptions)
+            self.assertTrue(result.success, result.error)
+            self.assertEqual(result.format, "pmml")
+
+    def testValidateDocuments(self):
+        fileNames = poie.batch.findDocuments([self.directory, self.path("notes.txt")])
+        serial = list(poie.batch.validateDocuments(fileNames, processes=1))
+        parallel = list(poie.batch.validateDocuments(fileNames, processes=2, readerOptions={"reader.streaming": True}))
+
+        for results in serial, parallel:
+            self.assertEqual([x.fileName for x in results], fileNames)
+            self.assertEqual([x.success for x in results], [True, True, False, True, False])
+            self.assertTrue(results[2].error.startswith("PFASemanticException"), results[2].error)
+            self.assertEqual(results[2].format, "json")
+            self.assertIsNotNone(results[2].readTime)
+            self.assertIsNone(results[2].compileTime)
+            self.assertTrue(results[4].error.startswith("ValueError: unrecognized document format"), results[4].error)
+            self.assertTrue(results[0].codeSize > 0)
+
+    def testScript(self):
+        command = [sys.executable, os.path.join(self.scripts, "pfavalidate"), self.directory, "--processes", "2", "--json"]
+        process = subprocess.Popen(command, env=self.env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        self.assertEqual(process.returncode, 1)
+        results = [json.loads(line) for line in stdout.decode("utf-8").splitlines()]
+        self.assertEqual([(os.path.basename(x["fileName"]), x["success"]) for x in results], [("good.pfa", True), ("good.yaml", True), ("bad.json", False), ("forest.pmml", True)])
+        self.assertIn("4 files, 1 failed", stderr.decode("utf-8"))
+
+        command = [sys.executable, os.path.join(self.scripts, "pfavalidate"), self.path("good.pfa"), self.path(os.path.join("sub", "forest.pmml")), "--processes", "1", "--stream-pmml", "--errors-only"]
+        process = subprocess.Popen(command, env=self.env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(stdout.decode("utf-8"), "")
+        self.assertIn("2 files, 0 failed", stderr.decode("utf-8"))
+
+        process = subprocess.Popen([sys.executable, os.path.join(self.scripts, "pfavalidate"), self.directory, "--processes", "0"], env=self.env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        process.communicate()
+        self.assertEqual(process.returncode, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import io
+import numbers
+import time
+import unittest
+
+import numpy
+
+from poie.producer.cart import *
+
+class TestCartScaling(unittest.TestCase):
+    def makeDataset(self, numRecords, classification):
+        numpy.random.seed(12345)
+        x = numpy.random.uniform(0, 10, numRecords)
+        y = numpy.random.uniform(0, 10, numRecords)
+        z = numpy.where(x < 4.0, numpy.where(y < 6.0, 5.0, 8.0), numpy.where(y < 2.0, 1.0, 2.0)) + numpy.random.normal(0, 1, numRecords)
+        fields = []
+        for data in x, y:
+            field = Dataset.Field(numbers.Real)
+            field.data = data
+            fields.append(field)
+        if classification:
+            field = Dataset.Field(str)
+            field.data = numpy.clip(z // 3, 0, 3).astype(int)
+            field.intToStr = dict((i, "C" + str(3 * i)) for i in range(4))
+            field.strToInt = dict((v, k) for k, v in field.intToStr.items())
+        else:
+            field = Dataset.Field(numbers.Real)
+            field.data = z
+        fields.append(field)
+        return Dataset(fields, ["x", "y", "z"])
+
+    def build(self, numRecords, classification, maxBins, maxDepth):
+        dataset = self.makeDataset(numRecords, classification)
+        startTime = time.time()
+        tree = TreeNode.fromWholeDataset(dataset, "z", maxBins=maxBins)
+        tree.splitMaxDepth(maxDepth)
+        return tree, time.time() - startTime
+
+    def testHistogramSplits(self):
+        for classification in False, True:
+            for numRecords in 100000, 1000000:
+                exact, exactTime = self.build(numRecords, classification, None, 8)
+                binned, binnedTime = self.build(numRecords, classification, 256, 8)
+                print("{0} with {1} records to depth 8: exact {2:.2f} seconds, 256 bins {3:.2f} seconds".format("classification" if classification else "regression", numRecords, exactTime, binnedTime))
+
+                # the top cuts are well-separated, so binning should find them to within a bin width
+                self.assertEqual(exact.fieldIndex, binned.fieldIndex)
+                self.assertAlmostEqual(exact.split, binned.split, delta=0.1)
+                self.assertEqual(exact.passBranch.fieldIndex, binned.passBranch.fieldIndex)
+                self.assertAlmostEqual(exact.passBranch.split, binned.passBranch.split, delta=0.1)
+
+    def testSharedIndexes(self):
+        tree, buildTime = self.build(1000000, False, None, 12)
+        leaves = [leaf for leaf, depth in tree.walkLeaves()]
+        print("regression with 1000000 records to depth 12: {0:.2f} seconds, {1} leaves".format(buildTime, len(leaves)))
+
+        # every leaf is a view of the root's index array, and together they cover each data point exactly once
+        for leaf in leaves:
+            self.assertTrue(leaf.indexes.base is tree.indexes)
+        self.assertTrue(numpy.array_equal(numpy.sort(numpy.concatenate([leaf.indexes for leaf in leaves])), numpy.arange(1000000)))
+
+    def testNodeLocalData(self):
+        dataset = self.makeDataset(10000, True)
+        tree = TreeNode.fromWholeDataset(dataset, "z")
+        sizes = []
+        def condition(node, depth):
+            predictand = node.nodePredictand()
+            sizes.append((node.datasetSize, len(predictand.data)))
+            self.assertEqual(predictand.intToStr, node.predictand.intToStr)
+            return depth < 3
+        tree.splitUntil(condition)
+        self.assertTrue(len(sizes) > 0)
+        self.assertTrue(all(x == y for x, y in sizes))
+
+        # a branch's data are exactly the root's data that pass (or fail) the root's cut (reordered by the branch's own splits)
+        x = dataset.fields[dataset.names.index(tree.dataset.names[tree.fieldIndex])].data
+        passing = tree.passBranch.nodeDataset()
+        failing = tree.failBranch.nodeDataset()
+        self.assertEqual(passing.names, tree.dataset.names)
+        self.assertTrue(numpy.array_equal(numpy.sort(passing.fields[tree.fieldIndex].data), numpy.sort(x[x <= tree.split])))
+        self.assertTrue(numpy.array_equal(numpy.sort(failing.fields[tree.fieldIndex].data), numpy.sort(x[x > tree.split])))
+        self.assertTrue(numpy.array_equal(numpy.sort(tree.failBranch.nodePredictand().data), numpy.sort(dataset.fields[2].data[x > tree.split])))
+
+        # the shared dataset is still the whole training set
+        self.assertEqual(len(tree.passBranch.dataset.fields[0].data), 10000)
+        self.assertEqual(len(tree.passBranch.predictand.data), 10000)
+
+        # splitting again would reorder indexes that the branches are views of
+        indexes = tree.indexes.copy()
+        self.assertRaises(RuntimeError, tree.splitOnce)
+        self.assertRaises(RuntimeError, tree.partition)
+        self.assertRaises(RuntimeError, lambda: tree.splitUntil(lambda node, depth: True))
+        self.assertTrue(numpy.array_equal(tree.indexes, indexes))
+
+    def testLevelWise(self):
+        def structure(tree):
+            return [(depth, node.datasetSize, node.fieldIndex, node.split) for node, depth in tree.walkNodes() if hasattr(node, "passBranch")]
+
+        for maxBins in None, 256:
+            serial, serialTime = self.build(1000000, True, maxBins, 10)
+            for processes in 1, 4:
+                tree = TreeNode.fromWholeDataset(self.makeDataset(1000000, True), "z", maxBins=maxBins)
+                startTime = time.time()
+                tree.splitLevelWise(lambda node, depth: depth < 10, processes)
+                print("classification with 1000000 records to depth 10 and {0} bins: depth-first {1:.2f} seconds, level-wise with {2} processes {3:.2f} seconds".format(maxBins, serialTime, processes, time.time() - startTime))
+                self.assertEqual(structure(serial), structure(tree))
+
+    def testManyCategories(self):
+        numpy.random.seed(12345)
+        numRecords = 1000000
+        for numCategories in 12, 40:
+            field = Dataset.Field(str)
+            field.data = numpy.random.randint(0, numCategories, numRecords)
+            field.intToStr = dict((i, "L" + str(i)) for i in range(numCategories))
+            field.strToInt = dict((v, k) for k, v in field.intToStr.items())
+            predictand = Dataset.Field(numbers.Real)
+            predictand.data = numpy.random.normal(0, 1, numCategories)[field.data] + numpy.random.normal(0, 1, numRecords)
+
+            startTime = time.time()
+            ordered = TreeNode(Dataset([field], ["x"]), predictand)
+            ordered.splitOnce()
+            orderedTime = time.time() - startTime
+
+            if numCategories <= 12:
+                startTime = time.time()
+                exhaustive = TreeNode(Dataset([field], ["x"]), predictand, categoricalSplits="exhaustive")
+                exhaustive.splitOnce()
+                print("{0} categories, {1} records: ordered {2:.2f} seconds, exhaustive {3:.2f} seconds".format(numCategories, numRecords, orderedTime, time.time() - startTime))
+                self.assertAlmostEqual(ordered.gain, exhaustive.gain, delta=1e-6 * exhaustive.gain)
+            else:
+                print("{0} categories, {1} records: ordered {2:.2f} seconds".format(numCategories, numRecords, orderedTime))
+
+    def testIngestion(self):
+        numpy.random.seed(12345)
+        numRecords = 1000000
+        array = numpy.zeros(numRecords, dtype=[("x", float), ("y", float), ("c", "U4")])
+        array["x"] = numpy.random.uniform(0, 10, numRecords)
+        array["y"] = numpy.random.uniform(0, 10, numRecords)
+        array["c"] = numpy.random.choice(["C0", "C3", "C6", "C9"], numRecords)
+
+        startTime = time.time()
+        fromNumpy = Dataset.fromNumpy(array)
+        print("fromNumpy with {0} records: {1:.2f} seconds".format(numRecords, time.time() - startTime))
+
+        rows = list(zip(array["x"].tolist(), array["y"].tolist(), array["c"].tolist()))
+        startTime = time.time()
+        fromIterable = Dataset.fromIterable(rows, names=["x", "y", "c"])
+        print("fromIterable with {0} records: {1:.2f} seconds".format(numRecords, time.time() - startTime))
+
+        text = io.StringIO("x,y,c\n" + "".join("{0!r},{1!r},{2}\n".format(*row) for row in rows))
+        startTime = time.time()
+        fromCsv = Dataset.fromCsv(text)
+        print("fromCsv with {0} records: {1:.2f} seconds".format(numRecords, time.time() - startTime))
+
+        for dataset in fromIterable, fromCsv:
+            self.assertEqual(dataset.names, fromNumpy.names)
+            for field, expected in zip(dataset.fields, fromNumpy.fields):
+                self.assertTrue(numpy.array_equal(field.data, expected.data))
+            self.assertEqual(dataset.fields[2].intToStr, {0: "C0", 1: "C3", 2: "C6", 3: "C9"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+import unittest
+
+from poie.datatype import jsonNodeToAvroType
+from poie.producer import chain
+from poie.producer.chain import PFAChainError
+from poie.producer.chain import matchTypes
+
+class TestChainedEngines(unittest.TestCase):
+    def makeDocuments(self):
+        first = {"input": "double", "output": {"type": "record", "name": "A", "fields": [{"name": "x", "type": "double"}, {"name": "y", "type": "double"}]},
+                 "action": [{"new": {"x": {"*": ["input", 2]}, "y": {"m.sqrt": {"m.abs": "input"}}}, "type": "A"}]}
+        second = {"input": {"type": "record", "name": "B", "fields": [{"name": "x", "type": "double"}, {"name": "y", "type": "double"}]}, "output": "double",
+                  "action": [{"+": ["input.x", "input.y"]}]}
+        third = {"input": "double", "output": "double", "method": "emit",
+                 "action": [{"if": {">": ["input", 10]}, "then": [{"emit": "input"}, {"emit": {"u-": "input"}}]}]}
+        return [json.dumps(x) for x in (first, second, third)]
+
+    def testAgainstMergedEngine(self):
+        documents = self.makeDocuments()
+        inputs = [float(i % 97) for i in range(100000)]
+
+        merged, = chain.engine(documents)
+        expected = []
+        merged.emit = expected.append
+        startTime = time.time()
+        for x in inputs:
+            merged.action(x)
+        print("merged document: {0} seconds".format(time.time() - startTime))
+
+        engines = chain.engines(documents)
+        startTime = time.time()
+        result = list(engines.run(inputs, batchSize=1000))
+        print("chained engines: {0} seconds, per stage {1}".format(time.time() - startTime, engines.latencies()))
+
+        self.assertEqual(result, expected)
+
+    def testReusedRecordTypes(self):
+        first = jsonNodeToAvroType({"type": "record", "name": "X", "fields": [
+            {"name": "a", "type": {"type": "record", "name": "Y", "fields": [{"name": "v", "type": "int"}]}},
+            {"name": "b", "type": "Y"}]})
+        good = jsonNodeToAvroType({"type": "record", "name": "X2", "fields": [
+            {"name": "a", "type": {"type": "record", "name": "Z1", "fields": [{"name": "v", "type": "int"}]}},
+            {"name": "b", "type": {"type": "record", "name": "Z2", "fields": [{"name": "v", "type": "int"}]}}]})
+        bad = jsonNodeToAvroType({"type": "record", "name": "X3", "fields": [
+            {"name": "a", "type": {"type": "record", "name": "Z3", "fields": [{"name": "v", "type": "int"}]}},
+            {"name": "b", "type": {"type": "record", "name": "Z4", "fields": [{"name": "v", "type": "string"}]}}]})
+        self.assertTrue(matchTypes(first, good))
+        self.assertFalse(matchTypes(first, bad))
+
+        output = {"type": "record", "name": "X", "fields": [
+            {"name": "a", "type": {"type": "record", "name": "Y", "fields": [{"name": "v", "type": "int"}]}},
+            {"name": "b", "type": "Y"}]}
+        input = {"type": "record", "name": "X3", "fields": [
+            {"name": "a", "type": {"type": "record", "name": "Z3", "fields": [{"name": "v", "type": "int"}]}},
+            {"name": "b", "type": {"type": "record", "name": "Z4", "fields": [{"name": "v", "type": "string"}]}}]}
+        documents = [json.dumps({"input": "int", "output": output, "action": [{"new": {"a": {"new": {"v": "input"}, "type": "Y"}, "b": {"new": {"v": "input"}, "type": "Y"}}, "type": "X"}]}),
+                     json.dumps({"input": input, "output": "string", "action": [{"s.concat": ["input.b.v", "input.b.v"]}]})]
+        self.assertRaises(PFAChainError, lambda: chain.engines(documents))
+        self.assertRaises(PFAChainError, lambda: chain.ast(documents))
+
+    def testRecursiveRecordTypes(self):
+        first = jsonNodeToAvroType({"type": "record", "name": "L1", "fields": [{"name": "v", "type": "int"}, {"name": "next", "type": ["null", "L1"]}]})
+        good = jsonNodeToAvroType({"type": "record", "name": "L2", "fields": [{"name": "v", "type": "int"}, {"name": "next", "type": ["null", "L2"]}]})
+        # same as L1 at the top level, but a different type one level down
+        bad = jsonNodeToAvroType({"type": "record", "name": "L3", "fields": [{"name": "v", "type": "int"}, {"name": "next", "type": ["null",
+                                  {"type": "record", "name": "L4", "fields": [{"name": "v", "type": "string"}, {"name": "next", "type": ["null", "L4"]}]}]}]})
+        matchedNames = []
+        self.assertTrue(matchTypes(first, good, matchedNames))
+        self.assertEqual(matchedNames, [("L1", "L2")])
+        self.assertFalse(matchTypes(first, bad))
+
+        # a failed attempt to match one union branch (A against B) must not count as a match when the same pair is seen again
+        unionFirst = jsonNodeToAvroType({"type": "record", "name": "R", "fields": [
+            {"name": "p", "type": [{"type": "record", "name": "A", "fields": [{"name": "v", "type": "int"}]}]},
+            {"name": "q", "type": "A"}]})
+        unionSecond = jsonNodeToAvroType({"type": "record", "name": "S", "fields": [
+            {"name": "p", "type": [{"type": "record", "name": "B", "fields": [{"name": "v", "type": "string"}]}, {"type": "record", "name": "D", "fields": [{"name": "v", "type": "int"}]}]},
+            {"name": "q", "type": "B"}]})
+        self.assertFalse(matchTypes(unionFirst, unionSecond))
+
+    def testUnionWidth(self):
+        narrow = jsonNodeToAvroType(["null", "string"])
+        wide = jsonNodeToAvroType(["null", "string", "int"])
+        # the consumer may accept more than the producer emits, but not less
+        self.assertTrue(matchTypes(narrow, wide))
+        self.assertFalse(matchTypes(wide, narrow))
+
+        producer = json.dumps({"input": "int", "output": ["null", "string", "int"], "action": ["input"]})
+        consumer = json.dumps({"input": ["null", "string"], "output": "int", "action": [{"cast": "input", "cases": [{"as": "null", "named": "x", "do": 0}, {"as": "string", "named": "x", "do": {"s.len": "x"}}]}]})
+        self.assertRaises(PFAChainError, lambda: chain.engines([producer, consumer]))
+        self.assertRaises(PFAChainError, lambda: chain.ast([producer, consumer]))
+
+        producer = json.dumps({"input": "string", "output": ["null", "string"], "action": ["input"]})
+        consumer = json.dumps({"input": ["null", "string", "int"], "output": "int", "action": [{"cast": "input", "cases": [{"as": "null", "named": "x", "do": 0}, {"as": "string", "named": "x", "do": {"s.len": "x"}}, {"as": "int", "named": "x", "do": "x"}]}]})
+        self.assertEqual(chain.engines([producer, consumer]).action("hello"), 5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import decimal
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+class TestExternalize(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.scripts = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+        self.env = dict(os.environ)
+        self.env["PYTHONPATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+        random.seed(12345)
+        cells = dict(("c{0}".format(i), {"type": {"type": "array", "items": "double"}, "init": [random.random() for j in range(100000)]}) for i in range(20))
+        self.document = {"input": "double", "output": "double", "cells": cells, "action": {"+": ["input", {"cell": "c0", "path": [0]}]}}
+        self.fileName = os.path.join(self.directory, "model.pfa")
+        with open(self.fileName, "w") as file:
+            json.dump(self.document, file)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testSize(self):
+        startTime = time.time()
+        subprocess.check_output([sys.executable, os.path.join(self.scripts, "pfasize"), self.fileName], env=self.env, stderr=subprocess.STDOUT)
+        print("pfasize on {0} bytes: {1} seconds".format(os.path.getsize(self.fileName), time.time() - startTime))
+
+    def testExternalize(self):
+        for processes in 1, 4:
+            outputName = os.path.join(self.directory, "out{0}.pfa".format(processes))
+            extract = ["--cell-{0}={1}".format(name, os.path.join(self.directory, "{0}-{1}.json".format(name, processes))) for name in self.document["cells"]]
+
+            startTime = time.time()
+            subprocess.check_call([sys.executable, os.path.join(self.scripts, "pfaexternalize"), self.fileName, outputName, "--processes", str(processes)] + extract, env=self.env)
+            print("pfaexternalize of {0} cells with {1} processes: {2} seconds".format(len(extract), processes, time.time() - startTime))
+
+            with open(outputName) as file:
+                output = json.load(file)
+            self.assertEqual(output["action"], self.document["action"])
+            for name, cell in self.document["cells"].items():
+                self.assertEqual(output["cells"][name]["source"], "json")
+                with open(output["cells"][name]["init"]) as file:
+                    self.assertEqual(json.load(file), cell["init"])
+
+    def testNestedValues(self):
+        pool = {"type": {"type": "map", "values": ["null", "boolean", "string", {"type": "array", "items": "double"}]},
+                "init": dict(("item{0}".format(i), [None, {"boolean": i % 2 == 0}, {"string": "\"quoted\" {0}".format(i)}, {"array": [random.random() for j in range(i % 100)]}][i % 4]) for i in range(100000))}
+        document = {"input": "double", "output": "double", "cells": {"empty": {"type": {"type": "array", "items": "int"}, "init": []}, "scalar": {"type": "double", "init": 3.5}},
+                    "pools": {"p": pool}, "action": "input"}
+        with open(self.fileName, "w") as file:
+            json.dump(document, file)
+
+        for processes in 1, 4:
+            outputName = os.path.join(self.directory, "nested{0}.pfa".format(processes))
+            extract = ["--pool-p={0}".format(os.path.join(self.directory, "p-{0}.json".format(processes))),
+                       "--cell-empty={0}".format(os.path.join(self.directory, "empty-{0}.json".format(processes))),
+                       "--cell-scalar={0}".format(os.path.join(self.directory, "scalar-{0}.json".format(processes)))]
+            subprocess.check_call([sys.executable, os.path.join(self.scripts, "pfaexternalize"), self.fileName, outputName, "--processes", str(processes)] + extract, env=self.env)
+
+            with open(outputName) as file:
+                output = json.load(file)
+            for section, name in ("pools", "p"), ("cells", "empty"), ("cells", "scalar"):
+                self.assertEqual(output[section][name]["source"], "json")
+                with open(output[section][name]["init"]) as file:
+                    self.assertEqual(json.load(file), document[section][name]["init"])
+
+    def testNumbersOutOfDoubleRange(self):
+        numbers = "[1e400, -1e400, 1e-400, 123456789012345678901234567890, 0.1, -0, 2.5E+3]"
+        with open(self.fileName, "w") as file:
+            file.write('{"input": "double", "output": "double", "cells": {"big": {"type": {"type": "array", "items": "double"}, "init": ' + numbers + '}}, "action": {"+": ["input", 1e400]}}')
+
+        for processes in 1, 2:
+            outputName = os.path.join(self.directory, "numbers{0}.pfa".format(processes))
+            bigName = os.path.join(self.directory, "big-{0}.json".format(processes))
+            subprocess.check_call([sys.executable, os.path.join(self.scripts, "pfaexternalize"), self.fileName, outputName, "--processes", str(processes), "--cell-big={0}".format(bigName)], env=self.env)
+
+            # the output must be valid JSON (no inf or nan) with every number as written in the input
+            with open(outputName) as file:
+                output = json.load(file, parse_float=decimal.Decimal, parse_constant=self.fail)
+            self.assertEqual(output["action"], {"+": ["input", decimal.Decimal("1e400")]})
+            with open(bigName) as file:
+                self.assertEqual(json.load(file, parse_float=decimal.Decimal, parse_constant=self.fail), json.loads(numbers, parse_float=decimal.Decimal))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import json
+import unittest
+
+import avro.schema
+
+from poie.datatype import *
+from poie.errors import *
+
+class TestForwardDeclarations(unittest.TestCase):
+    def countFailures(self, parser, jsonStrings):
+        """Parse, counting the attempts that avro rejected (each one is a wasted pass over a type)."""
+        original = avro.schema.make_avsc_object
+        failures = [0]
+        def counting(*args, **kwds):
+            try:
+                return original(*args, **kwds)
+            except avro.schema.SchemaParseException:
+                failures[0] += 1
+                raise
+        avro.schema.make_avsc_object = counting
+        try:
+            return parser.parse(jsonStrings), failures[0]
+        finally:
+            avro.schema.make_avsc_object = original
+
+    def testMapAndArrayDescriptions(self):
+        parser = ForwardDeclarationParser()
+        parser.parse([json.dumps({"type": "record", "name": "P", "namespace": "com.example", "fields": [{"name": "x", "type": "double"}]})])
+
+        for description in {"type": "map", "values": "double"}, '{"type": "map", "values": "double"}', {"values": "double", "type": "map"}:
+            self.assertEqual(parser.getAvroType(description), AvroMap(AvroDouble()))
+        for description in {"type": "array", "items": "double"}, '{"type": "array", "items": "double"}':
+            self.assertEqual(parser.getAvroType(description), AvroArray(AvroDouble()))
+
+        mapOfArrays = parser.getAvroType({"type": "map", "values": {"type": "array", "items": "com.example.P"}})
+        self.assertTrue(isinstance(mapOfArrays, AvroMap))
+        self.assertTrue(isinstance(mapOfArrays.values, AvroArray))
+        self.assertEqual(mapOfArrays.values.items.fullName, "com.example.P")
+        arrayOfMaps = parser.getAvroType({"type": "array", "items": {"type": "map", "values": ["null", "com.example.P"]}})
+        self.assertTrue(isinstance(arrayOfMaps.items, AvroMap))
+        self.assertTrue(isinstance(arrayOfMaps.items.values, AvroUnion))
+
+        # the same description as a string, as Pythonized JSON, and with its keys in another order are one cache entry
+        self.assertTrue(parser.getAvroType({"type": "map", "values": "com.example.P"}) is parser.getAvroType({"values": "com.example.P", "type": "map"}))
+        self.assertEqual(parser.getAvroType("Unknown"), None)
+        self.assertFalse("Unknown" in parser.avroTypeCache)
+        self.assertRaises(AvroException, lambda: parser.getAvroType({"type": "record", "name": "New", "fields": []}))
+
+    def testCacheSeesLaterNames(self):
+        parser = ForwardDeclarationParser()
+        parser.parse([json.dumps({"type": "enum", "name": "E", "symbols": ["A", "B"]})])
+        self.assertEqual(parser.getAvroType({"type": "map", "values": "E"}), AvroMap(parser.getAvroType("E")))
+        self.assertEqual(parser.getAvroType("F"), None)
+
+        parser.parse([json.dumps({"type": "fixed", "name": "F", "size": 4})])
+        self.assertEqual(parser.getAvroType("F").size, 4)
+        self.assertEqual(parser.getAvroType({"type": "array", "items": "F"}).items.size, 4)
+
+    def testForwardReferences(self):
+        # a chain in which each record refers to the next, listed so that every reference is forward
+        chain = [json.dumps({"type": "record", "name": "R{0}".format(i), "fields": [{"name": "next", "type": ["null", "R{0}".format(i + 1)]}]}) for i in range(100)]
+        chain.append(json.dumps({"type": "record", "name": "R100", "fields": [{"name": "x", "type": "int"}]}))
+        chain.append(json.dumps({"type": "map", "values": {"type": "array", "items": "R50"}}))
+
+        result, failures = self.countFailures(ForwardDeclarationParser(), chain)
+        self.assertEqual(failures, 0)
+        self.assertEqual(result[chain[0]].field("next").avroType.types[1].fullName, "R1")
+        self.assertEqual(result[chain[-1]].values.items.fullName, "R50")
+
+        # names are resolved in the namespace of the enclosing type, and types defined inside fields can be used elsewhere
+        namespaced = [
+            json.dumps({"type": "array", "items": "com.example.Inner"}),
+            json.dumps({"type": "record", "name": "Outer", "namespace": "com.example", "fields": [
+                {"name": "a", "type": "Middle"},
+                {"name": "b", "type": {"type": "map", "values": "other.Thing"}}]}),
+            json.dumps({"type": "record", "name": "com.example.Middle", "fields": [
+                {"name": "inner", "type": {"type": "record", "name": "Inner", "fields": [{"name": "e", "type": {"type": "enum", "name": "Color", "symbols": ["RED"]}}]}}]}),
+            json.dumps({"type": "fixed", "name": "Thing", "namespace": "other", "size": 2}),
+            json.dumps({"type": "map", "values": "com.example.Color"}),
+            ]
+
+        expected = None
+        for permutation in itertools.permutations(namespaced):
+            result, failures = self.countFailures(ForwardDeclarationParser(), list(permutation))
+            self.assertEqual(failures, 0)
+            types = dict((x, repr(result[x])) for x in namespaced)
+            if expected is None:
+                expected = types
+            self.assertEqual(types, expected)
+
+        parser = ForwardDeclarationParser()
+        result = parser.parse(namespaced)
+        self.assertEqual(result[namespaced[0]].items.fullName, "com.example.Inner")
+        self.assertEqual(result[namespaced[1]].field("b").avroType.values.size, 2)
+        self.assertEqual(parser.getAvroType({"type": "map", "values": "com.example.Color"}), result[namespaced[4]])
+
+    def testDeepChainsAreInterned(self):
+        # deep enough that avro.schema's recursive to_json would exceed the recursion limit
+        chain = [json.dumps({"type": "record", "name": "D{0}".format(i), "fields": [{"name": "next", "type": ["null", "D{0}".format(i + 1)]}]}) for i in range(1000)]
+        chain.append(json.dumps({"type": "record", "name": "D1000", "fields": [{"name": "self", "type": ["null", "D1000"]}]}))
+        result = ForwardDeclarationParser().parse(chain)
+
+        head = result[chain[0]]
+        self.assertTrue(head._interned)
+        self.assertTrue(head.canonicalId.startswith('{"fields": [{"name": "next", "type": ["null", {"fields": '))
+        self.assertEqual(head.canonicalId.count('"type": "record"'), 1001)
+        self.assertTrue(result[chain[-1]].canonicalId.endswith('"type": ["null", "D1000"]}], "name": "D1000", "type": "record"}'))
+
+        # the same chain parsed again is the same (interned) type
+        self.assertTrue(ForwardDeclarationParser().parse(chain)[chain[0]] is head)
+
+    def testUnresolvedTypes(self):
+        parser = ForwardDeclarationParser()
+        good = json.dumps({"type": "record", "name": "Good", "fields": [{"name": "x", "type": "int"}]})
+        bad = json.dumps({"type": "record", "name": "Bad", "fields": [{"name": "y", "type": "Missing"}]})
+        try:
+            parser.parse([bad, good])
+        except SchemaParseException as err:
+            self.assertTrue("Bad" in str(err))
+            self.assertFalse("Good" in str(err))
+        else:
+            self.fail("expected a SchemaParseException")
+
+        # the failed attempt must not leave "Bad" behind, so it can be defined properly later
+        self.assertFalse(parser.names.has_name("Bad", None))
+        result = parser.parse([bad, json.dumps({"type": "enum", "name": "Missing", "symbols": ["M"]})])
+        self.assertEqual(result[bad].field("y").avroType.symbols, ["M"])
+
+if __name__ == "__main__":
+    unittest.main()
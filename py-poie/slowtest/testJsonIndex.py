@@ -0,0 +1,136 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import poie.producer.tools as t
+from poie.inspector.jsongadget import depthGreaterThan
+from poie.inspector.jsonindex import JsonIndex
+
+class TestJsonIndex(unittest.TestCase):
+    def document(self, numFunctions):
+        fcns = {}
+        for i in range(numFunctions):
+            fcns["f{0}".format(i)] = {"params": [{"x": "double"}, {"y": {"type": "array", "items": "double"}}],
+                                     "ret": "double",
+                                     "do": [{"let": {"z": {"+": ["x", i]}}},
+                                            {"if": {">": ["z", {"a.len": "y"}]}, "then": [{"u.f{0}".format((i + 1) % numFunctions): ["z", "y"]}], "else": [[], {}, "z"]}]}
+        return {"input": "double", "output": "double", "fcns": fcns, "action": [{"u.f0": ["input", {"value": [1, 2, 3], "type": {"type": "array", "items": "double"}}]}]}
+
+    def depth(self, node):
+        out = 0
+        while depthGreaterThan(node, out):
+            out += 1
+        return out
+
+    def patterns(self):
+        return ["z",
+                t.RegEx("u\\.f1"),
+                t.Or("x", t.RegEx("^a\\.")),
+                {"let": t.Any()},
+                [],
+                {},
+                3,
+                t.Any(dict)]
+
+    def checkAgainstTools(self, index, obj):
+        for path in (), ("fcns",), ("fcns", "f7", "do"), ("fcns", "f7", "do", 1, "else"):
+            node = t.get(obj, list(path))
+            for pattern in self.patterns():
+                expected = list(t.search(pattern, node))
+                found = list(index.search(pattern, path))
+                self.assertEqual([x[0] for x in found], [x[0] for x in expected])
+                self.assertEqual([x[1].modified for x in found], [x[1].modified for x in expected])
+                self.assertEqual(index.count(pattern, path), len(expected))
+                self.assertEqual(list(index.depthsOfMatches(pattern, path)), [(p, self.depth(t.get(node, list(p)))) for p, m in expected])
+            self.assertEqual(index.depth(path), self.depth(node))
+            self.assertEqual(index.size(path), sum(1 for x in t.search(t.Any(), node)))
+
+    def testSearchAndDepth(self):
+        obj = self.document(20)
+        self.checkAgainstTools(JsonIndex.build(obj), obj)
+
+        for scalar in 3, "z", None:
+            index = JsonIndex.build(scalar)
+            self.assertEqual(list(index.indexes(t.Any())), [()])
+            self.assertEqual(index.depth(), 0)
+
+        with self.assertRaises(KeyError):
+            JsonIndex.build(obj).ordinal(["fcns", "nonexistent"])
+
+    def testSaveAndLoad(self):
+        directory = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join(directory, "document.pfa")
+            obj = self.document(20)
+            with open(fileName, "w") as stream:
+                json.dump(obj, stream)
+
+            self.assertIsNone(JsonIndex.load(fileName, obj))
+            built = JsonIndex.build(obj)
+            built.save(fileName)
+            loaded = JsonIndex.load(fileName, obj)
+            self.assertIsNotNone(loaded)
+            self.assertEqual(list(loaded.parents), list(built.parents))
+            self.assertEqual(list(loaded.sizes), list(built.sizes))
+            self.assertEqual(list(loaded.depths), list(built.depths))
+            self.assertEqual(loaded.keys, built.keys)
+            self.assertEqual(dict((k, list(v)) for k, v in loaded.children.items()), dict((k, list(v)) for k, v in built.children.items()))
+            self.assertEqual(loaded.objectKeys, built.objectKeys)
+            self.assertEqual(dict((k, list(v)) for k, v in loaded.signatures.items()), dict((k, list(v)) for k, v in built.signatures.items()))
+            self.checkAgainstTools(loaded, obj)
+
+            indexFileName = JsonIndex.indexFileName(fileName)
+            with open(indexFileName) as stream:
+                saved = stream.read()
+
+            # corrupt: not JSON, wrong version, or tables that don't fit together
+            for corrupt in saved[:len(saved) // 2], "[]", saved.replace('"version": 3', '"version": 2'), saved.replace('"objectKeys": [[', '"objectKeys": [[0, ["x"]], ['):
+                self.assertNotEqual(corrupt, saved)
+                with open(indexFileName, "w") as stream:
+                    stream.write(corrupt)
+                self.assertIsNone(JsonIndex.load(fileName, obj))
+
+            # stale: the document changed after the index was saved
+            with open(indexFileName, "w") as stream:
+                stream.write(saved)
+            self.assertIsNotNone(JsonIndex.load(fileName, obj))
+            time.sleep(0.01)
+            obj["fcns"]["f0"]["ret"] = "int"
+            with open(fileName, "w") as stream:
+                json.dump(obj, stream)
+            self.assertIsNone(JsonIndex.load(fileName, obj))
+
+        finally:
+            shutil.rmtree(directory)
+
+    def testOrdinalScalesWithWideObjects(self):
+        obj = {"fcns": dict(("f{0}".format(i), i) for i in range(100000))}
+        index = JsonIndex.build(obj)
+        startTime = time.time()
+        for i in range(0, 100000, 100):
+            self.assertEqual(index.keys[index.ordinal(["fcns", "f{0}".format(i)])], "f{0}".format(i))
+        print("1000 lookups in an object with 100000 keys: {0} seconds".format(time.time() - startTime))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+import unittest
+
+import numpy
+
+from poie.producer.kmeans import *
+
+class TestKMeansScaling(unittest.TestCase):
+    def makeDataset(self, numRecords, numDimensions, numCenters):
+        rnd = numpy.random.RandomState(12345)
+        centers = rnd.uniform(-10.0, 10.0, (numCenters, numDimensions))
+        return centers[rnd.randint(0, numCenters, numRecords)] + rnd.normal(0.0, 1.0, (numRecords, numDimensions))
+
+    def train(self, label, kmeans, method, *args):
+        tracemalloc.start()
+        startTime = time.time()
+        method(*args)
+        elapsed = time.time() - startTime
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("{0}: {1} seconds, peak {2} MB".format(label, elapsed, peak / 1e6))
+
+    def testChunkedAndMiniBatch(self):
+        dataset = self.makeDataset(1000000, 10, 100)
+
+        random.seed(12345)
+        kmeans = KMeans(100, dataset)
+        self.train("Lloyd, whole dataset at once", kmeans, kmeans.optimize, maxIterations(5))
+        whole = kmeans.centers()
+
+        random.seed(12345)
+        kmeans = KMeans(100, dataset, maxMemory=10000000)
+        self.train("Lloyd, 10 MB chunks", kmeans, kmeans.optimize, maxIterations(5))
+        for x, y in zip(whole, kmeans.centers()):
+            self.assertTrue(numpy.allclose(x, y))
+
+        random.seed(12345)
+        kmeans = KMeans(100, dataset, maxMemory=10000000)
+        self.train("mini-batch, 100 batches of 10000", kmeans, kmeans.miniBatch, maxIterations(100), 10000)
+
+    def testParallel(self):
+        dataset = self.makeDataset(1000000, 10, 100)
+
+        random.seed(12345)
+        kmeans = KMeans(100, dataset, maxMemory=10000000)
+        self.train("Lloyd, 1 process", kmeans, kmeans.optimize, maxIterations(5))
+        serial = kmeans.centers()
+
+        for processes in 2, 4:
+            random.seed(12345)
+            kmeans = KMeans(100, dataset, maxMemory=10000000, processes=processes)
+            self.train("Lloyd, {0} processes".format(processes), kmeans, kmeans.optimize, maxIterations(5))
+            self.assertEqual(kmeans.centers(), serial)
+
+    def testParallelWithoutMaxMemory(self):
+        dataset = self.makeDataset(200000, 5, 20)
+
+        random.seed(12345)
+        kmeans = KMeans(20, dataset)
+        self.train("Lloyd, no maxMemory, 1 process", kmeans, kmeans.optimize, maxIterations(5))
+        serial = kmeans.centers()
+
+        for processes in 2, 3:
+            random.seed(12345)
+            kmeans = KMeans(20, dataset, processes=processes)
+            self.train("Lloyd, no maxMemory, {0} processes".format(processes), kmeans, kmeans.optimize, maxIterations(5))
+            self.assertEqual(kmeans.centers(), serial)
+
+    def testOutOfCore(self):
+        directory = tempfile.mkdtemp()
+        try:
+            fileName = os.path.join(directory, "dataset.dat")
+            dataset = numpy.memmap(fileName, dtype=numpy.dtype(float), mode="w+", shape=(1000000, 10))
+            for start in range(0, dataset.shape[0], 100000):
+                dataset[start:start + 100000] = self.makeDataset(100000, 10, 100)
+            dataset.flush()
+            del dataset
+
+            random.seed(12345)
+            tracemalloc.start()
+            kmeans = KMeans(100, numpy.memmap(fileName, dtype=numpy.dtype(float), mode="r", shape=(1000000, 10)), maxMemory=10000000)
+            print("memory-mapped: sampled unique records with peak {0} MB".format(tracemalloc.get_traced_memory()[1] / 1e6))
+            tracemalloc.stop()
+            self.train("memory-mapped Lloyd, 10 MB chunks", kmeans, kmeans.optimize, maxIterations(5))
+
+            def chunks():
+                with open(fileName, "rb") as file:
+                    while True:
+                        block = numpy.fromfile(file, dtype=numpy.dtype(float), count=100000 * 10)
+                        if block.shape[0] == 0:
+                            break
+                        yield block.reshape(-1, 10)
+
+            random.seed(12345)
+            kmeans = KMeans(100, chunks, maxMemory=10000000)
+            self.assertEqual(kmeans.numberOfRecords, 1000000)
+            self.train("file read in blocks, Lloyd, 10 MB chunks", kmeans, kmeans.optimize, maxIterations(5))
+        finally:
+            shutil.rmtree(directory)
+
+    def testSeedingAndBounds(self):
+        dataset = self.makeDataset(100000, 5, 50)
+        numIterations = {}
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            for seeding in "random", "kmeans++", "kmeans||":
+                centers = []
+                assignments = []
+                distances = []
+                for triangleInequality in False, True:
+                    iterations = [0]
+                    def countIterations(*args):
+                        iterations[0] += 1
+                        return True
+
+                    # count point-to-center distance calculations by the number of points handed to the metric
+                    metric = Euclidean(AbsDiff())
+                    calculate = metric.calculate
+                    numDistances = [0]
+                    def countDistances(points, center):
+                        numDistances[0] += points.shape[0]
+                        return calculate(points, center)
+                    metric.calculate = countDistances
+
+                    random.seed(12345)
+                    startTime = time.time()
+                    kmeans = KMeans(50, dataset, metric=metric, seeding=seeding, triangleInequality=triangleInequality)
+                    seedTime = time.time() - startTime
+                    kmeans.optimize(whileall(countIterations, moving(), maxIterations(1000)))
+                    print("{0} seeding{1}: {2} seconds to seed, {3} iterations, {4} distance calculations, {5} seconds in all".format(seeding, " with bounds" if triangleInequality else "", seedTime, iterations[0], numDistances[0], time.time() - startTime))
+
+                    centers.append(kmeans.centers(sort=False))
+                    distances.append(numDistances[0])
+                    metric.calculate = calculate
+                    assignments.append(kmeans.closestCluster())
+                numIterations[seeding] = iterations[0]
+
+                # the bounds only skip calculations that can't change a point's cluster, so the clustering is the same up to rounding
+                self.assertTrue(numpy.array_equal(assignments[0], assignments[1]))
+                for x, y in zip(centers[0], centers[1]):
+                    self.assertTrue(numpy.allclose(x, y, rtol=1e-9, atol=1e-9))
+                self.assertTrue(distances[1] < distances[0])
+                print("{0} seeding: bounds reduce distance calculations from {1} to {2} ({3:.1f}% fewer)".format(seeding, distances[0], distances[1], 100.0 * (1.0 - distances[1] / distances[0])))
+
+        for seeding in "kmeans++", "kmeans||":
+            print("{0} seeding: {1} iterations to converge, versus {2} with random seeding ({3:.1f}% fewer)".format(seeding, numIterations[seeding], numIterations["random"], 100.0 * (1.0 - numIterations[seeding] / numIterations["random"])))
+
+if __name__ == "__main__":
+    unittest.main()
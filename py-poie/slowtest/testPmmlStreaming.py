@@ -0,0 +1,107 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import time
+import tracemalloc
+import unittest
+
+from poie.datatype import AvroTypeBuilder
+from poie.genpy import PFAEngine
+from poie.pmml.reader import loadPMML
+from poie.pmml.reader import pmmlToAst
+from poie.pmml.version_independent import Context
+
+class TestPmmlStreaming(unittest.TestCase):
+    def makeNode(self, rnd, predicate, depth, functionName):
+        if depth == 0:
+            score = rnd.choice(["a", "b", "c"]) if functionName == "classification" else rnd.random()
+            return '<Node score="{0}">{1}</Node>'.format(score, predicate)
+        field = rnd.choice(["x", "y"])
+        value = round(rnd.random(), 3)
+        left = self.makeNode(rnd, '<SimplePredicate field="{0}" operator="lessThan" value="{1}"/>'.format(field, value), depth - 1, functionName)
+        right = self.makeNode(rnd, '<SimplePredicate field="{0}" operator="greaterOrEqual" value="{1}"/>'.format(field, value), depth - 1, functionName)
+        return "<Node>{0}{1}{2}</Node>".format(predicate, left, right)
+
+    def makeForest(self, numTrees, depth, functionName, multipleModelMethod, segmentFunctionNames=None):
+        rnd = random.Random(12345)
+        if segmentFunctionNames is None:
+            segmentFunctionNames = [functionName] * numTrees
+        segments = "".join('<Segment id="{0}"><True/><TreeModel functionName="{1}" splitCharacteristic="binarySplit">{2}</TreeModel></Segment>\n'.format(i, segmentFunctionNames[i], self.makeNode(rnd, "<True/>", depth, segmentFunctionNames[i])) for i in range(numTrees))
+        return '''<PMML version="4.2">
+    <Header/>
+    <DataDictionary>
+        <DataField name="x" optype="continuous" dataType="double"/>
+        <DataField name="y" optype="continuous" dataType="double"/>
+    </DataDictionary>
+    <MiningModel functionName="{0}">
+        <Segmentation multipleModelMethod="{1}">
+{2}        </Segmentation>
+    </MiningModel>
+</PMML>'''.format(functionName, multipleModelMethod, segments)
+
+    def convert(self, document, streaming):
+        tracemalloc.start()
+        startTime = time.time()
+        config = pmmlToAst(document, {"reader.streaming": streaming})
+        elapsed = time.time() - startTime
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("{0}: {1} seconds, peak {2} MB".format("streaming" if streaming else "whole document", elapsed, peak / 1e6))
+        engine, = PFAEngine.fromAst(config)
+        return [engine.action({"x": i / 10.0, "y": 1.0 - i / 10.0}) for i in range(10)]
+
+    def testRegressionForest(self):
+        document = self.makeForest(1000, 6, "regression", "average")
+        self.assertEqual(self.convert(document, False), self.convert(document, True))
+
+    def testClassificationForest(self):
+        document = self.makeForest(1000, 6, "classification", "majorityVote")
+        self.assertEqual(self.convert(document, False), self.convert(document, True))
+
+    def testPoolStorage(self):
+        document = self.makeForest(50, 4, "classification", "majorityVote")
+        context = Context()
+        context.avroTypeBuilder = AvroTypeBuilder()
+        context.pendingInits = []
+        context.storageType = "pool"
+        context.storageName = ("forests", "trees", None)
+        config = loadPMML(document).toPFA({}, context)
+        context.avroTypeBuilder.resolveTypes()
+        for decodeInit in context.pendingInits:
+            decodeInit()
+
+        self.assertEqual(config.cells, {})
+        self.assertEqual(list(config.pools.keys()), ["forests"])
+        self.assertEqual(len(config.pools["forests"].init.value["trees"]), 50)
+
+        engine, = PFAEngine.fromAst(config)
+        inputs = [{"x": i / 10.0, "y": 1.0 - i / 10.0} for i in range(10)]
+        self.assertEqual([engine.action(x) for x in inputs], self.convert(document, True))
+
+    def testMismatchedSegments(self):
+        for streaming in False, True:
+            document = self.makeForest(3, 2, "classification", "majorityVote", ["classification", "regression", "classification"])
+            with self.assertRaisesRegex(TypeError, "Segment 1 .* all segments of a Segmentation must have the same type"):
+                pmmlToAst(document, {"reader.streaming": streaming})
+
+            document = self.makeForest(3, 2, "classification", "majorityVote", ["regression"] * 3)
+            with self.assertRaisesRegex(TypeError, "MiningModel with functionName \"classification\" has segments whose trees produce double"):
+                pmmlToAst(document, {"reader.streaming": streaming})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import unittest
+
+from poie.genpy import PFAEngine
+from poie.genpy import SharedState
+from poie.pfaast import DecodedInit
+from poie.reader import jsonStreamToAst
+
+class TestPoolInit(unittest.TestCase):
+    items = dict(("k{0}".format(i), {"x": i, "y": [float(i)] * 3}) for i in range(1000))
+    itemType = {"type": "record", "name": "Item", "fields": [{"name": "x", "type": "int"}, {"name": "y", "type": {"type": "array", "items": "double"}}]}
+
+    def readOnly(self):
+        return {"input": "string", "output": "int",
+                "cells": {"c": {"type": {"type": "array", "items": "int"}, "init": list(range(100))}},
+                "pools": {"p": {"type": self.itemType, "init": self.items}},
+                "action": [{"+": [{"pool": "p", "path": ["input", {"string": "x"}]}, {"attr": {"cell": "c"}, "path": [1]}]}]}
+
+    def readWrite(self):
+        return {"input": "string", "output": "int",
+                "pools": {"p": {"type": self.itemType, "init": self.items}},
+                "action": [
+                    {"pool": "p", "path": ["input"], "to": {"params": [{"old": "Item"}], "ret": "Item", "do": {"attr": "old", "path": [{"string": "x"}], "to": {"+": ["old.x", 1000]}}}, "init": {"type": "Item", "value": {"x": 0, "y": []}}},
+                    {"if": {"==": ["input", {"string": "k0"}]}, "then": [{"pool": "p", "del": {"string": "k1"}}]},
+                    {"pool": "p", "path": ["input", {"string": "x"}]}]}
+
+    def testLazyMatchesEager(self):
+        for document in self.readOnly(), self.readWrite():
+            eager, = PFAEngine.fromJson(document)
+            lazy, = PFAEngine.fromJson(document, options={"pool.init.lazy": True})
+            self.assertEqual(lazy.pools["p"].value, {})
+            for key in "k0", "k5", "k999", "k5", "k1", "k1":
+                try:
+                    expected = eager.action(key)
+                except Exception as err:
+                    self.assertRaises(err.__class__, lambda: lazy.action(key))
+                else:
+                    self.assertEqual(lazy.action(key), expected)
+            # only the keys that were touched have been decoded
+            self.assertLessEqual(len(lazy.pools["p"].value), 4)
+            self.assertEqual(json.loads(lazy.snapshot().toJson(lineNumbers=False))["pools"], json.loads(eager.snapshot().toJson(lineNumbers=False))["pools"])
+
+    def checkIndependent(self, engines, engineConfig):
+        initial = engines[1].action("k7")
+        stream = io.StringIO()
+        stream.write(json.dumps({"snapshot": "delta"}) + "\n")
+        stream.write(json.dumps({"pool": "p", "key": "k7", "value": {"x": -1, "y": []}}) + "\n")
+        stream.write(json.dumps({"pool": "p", "key": "k8", "delete": True}) + "\n")
+        stream.seek(0)
+        engines[0].restoreSnapshot(stream)
+
+        self.assertEqual(engines[0].action("k7"), -1 + 1)
+        self.assertRaises(Exception, lambda: engines[0].action("k8"))
+        # the other instance and the engine configuration keep the original items
+        self.assertEqual(engines[1].action("k7"), initial)
+        self.assertEqual(engines[1].action("k8"), 9)
+        again, = PFAEngine.fromAst(engineConfig)
+        self.assertEqual(again.action("k7"), initial)
+        self.assertEqual(again.action("k8"), 9)
+
+    def testBorrowedInitsAreCopiedBeforeRestoring(self):
+        for options in {}, {"pool.init.lazy": True}:
+            engines = PFAEngine.fromJson(self.readOnly(), options=options, multiplicity=2)
+            self.assertTrue(engines[0].pools["p"].borrowed)
+            self.checkIndependent(engines, engines[0].config)
+
+    def testDecodedInitsAreCopiedBeforeRestoring(self):
+        engineConfig = jsonStreamToAst(io.BytesIO(json.dumps(self.readOnly()).encode("utf-8")))
+        self.assertTrue(isinstance(engineConfig.pools["p"].init, DecodedInit))
+        engines = PFAEngine.fromAst(engineConfig, multiplicity=2)
+        self.assertTrue(engines[0].pools["p"].value is engines[1].pools["p"].value)
+        self.checkIndependent(engines, engineConfig)
+
+    def testSharedPoolWrittenByAnotherEngine(self):
+        reader = self.readOnly()
+        writer = self.readWrite()
+        for document in reader, writer:
+            document["pools"]["p"]["shared"] = True
+        engineConfig = jsonStreamToAst(io.BytesIO(json.dumps(reader).encode("utf-8")))
+        sharedState = SharedState()
+        readerEngine, = PFAEngine.fromAst(engineConfig, sharedState=sharedState)
+        writerEngine, = PFAEngine.fromJson(writer, sharedState=sharedState)
+        self.assertEqual(writerEngine.action("k3"), 1003)
+        self.assertEqual(readerEngine.action("k3"), 1004)
+        self.assertEqual(engineConfig.pools["p"].init.value["k3"]["x"], 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+class TestPrettyPfaStartup(unittest.TestCase):
+    # a fresh interpreter for each measurement, so that only the on-disk table cache carries over
+    script = """
+import time
+import poie.prettypfa
+startTime = time.time()
+poie.prettypfa.parser.ensureInitialized()
+poie.prettypfa.exprParser.ensureInitialized()
+print(time.time() - startTime)
+"""
+
+    def measure(self, cacheDirectory):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+        env["POIE_CACHE_DIR"] = cacheDirectory
+        return float(subprocess.check_output([sys.executable, "-c", self.script], env=env))
+
+    def testParserInitialization(self):
+        cacheDirectory = tempfile.mkdtemp()
+        try:
+            print("no table cache: {0} seconds".format(self.measure("")))
+            print("first run, writing table cache: {0} seconds".format(self.measure(cacheDirectory)))
+            print("later run, reading table cache: {0} seconds".format(self.measure(cacheDirectory)))
+            self.assertEqual(len(os.listdir(cacheDirectory)), 2)
+        finally:
+            shutil.rmtree(cacheDirectory)
+
+if __name__ == "__main__":
+    unittest.main()
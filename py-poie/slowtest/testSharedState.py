@@ -0,0 +1,66 @@
+# Copyright (C) 2021 Data Mining Group
+# 
+# 
+# 
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from poie.genpy import PFAEngine
+from poie.genpy import SharedState
+from poie.errors import *
+
+class TestSharedState(unittest.TestCase):
+    pfaDocument = {
+        "input": "string",
+        "output": "null",
+        "cells": {"total": {"type": "long", "init": 0, "shared": True}},
+        "pools": {"counts": {"type": "long", "init": {}, "shared": True}},
+        "action": [
+            {"pool": "counts", "path": ["input"], "to": {"params": [{"x": "long"}], "ret": "long", "do": {"+": ["x", 1]}}, "init": 0},
+            {"cell": "total", "to": {"params": [{"x": "long"}], "ret": "long", "do": {"+": ["x", 1]}}},
+            {"pool": "counts", "path": ["input"]},
+            None
+            ]
+        }
+
+    def runThreads(self, sharedState, numThreads, numKeys, numRecords):
+        engines = PFAEngine.fromJson(self.pfaDocument, sharedState=sharedState, multiplicity=numThreads)
+
+        def work(engine):
+            for i in range(numRecords):
+                engine.action("key{0}".format((i * 7919 + engine.instance) % numKeys))
+
+        threads = [threading.Thread(target=work, args=(engine,)) for engine in engines]
+        startTime = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - startTime
+
+        self.assertEqual(sharedState.cells["total"].value, numThreads * numRecords)
+        self.assertEqual(sum(sharedState.pools["counts"].value.values()), numThreads * numRecords)
+        return elapsed
+
+    def testManyThreadsManyKeys(self):
+        for numStripes in 1, 16, 256:
+            for readerWriter in False, True:
+                elapsed = self.runThreads(SharedState(numStripes, readerWriter), 32, 100000, 2000)
+                print("{0} stripes, readerWriter={1}: {2} seconds".format(numStripes, readerWriter, elapsed))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import random
+import time
+import unittest
+
+import poie.genpy
+import poie.options
+import poie.pfaast
+import poie.signature
+import poie.version
+from poie.errors import PFASemanticException
+from poie.reader import jsonToAst
+
+class UncachedSignatures(poie.signature.SignatureCache):
+    """Matches every call site from scratch, as before the cache existed."""
+    def accepts(self, sig, args, version):
+        self.misses += 1
+        return sig.accepts(args, version)
+
+class TestSignatureCache(unittest.TestCase):
+    inputType = {"type": "record", "name": "Input", "fields": [
+        {"name": "i", "type": "int"},
+        {"name": "l", "type": "long"},
+        {"name": "f", "type": "float"},
+        {"name": "d", "type": "double"},
+        {"name": "s", "type": "string"},
+        {"name": "ai", "type": {"type": "array", "items": "int"}},
+        {"name": "ad", "type": {"type": "array", "items": "double"}},
+        {"name": "ms", "type": {"type": "map", "values": "string"}},
+        {"name": "u", "type": ["null", "double"]},
+        {"name": "rec", "type": {"type": "record", "name": "Point", "fields": [{"name": "x", "type": "double"}, {"name": "y", "type": "double"}]}}
+        ]}
+
+    def makeDocument(self, numExpressions, seed):
+        rnd = random.Random(seed)
+        numbers = ["input.i", "input.l", "input.f", "input.d", {"int": 3}, {"long": 4}, {"float": 0.5}, {"double": 1.5}]
+        templates = [
+            lambda: {rnd.choice(["+", "-", "*", "max", "min"]): [rnd.choice(numbers), rnd.choice(numbers)]},
+            lambda: {"/": [rnd.choice(numbers), rnd.choice(numbers)]},
+            lambda: {"==": [rnd.choice(numbers), rnd.choice(numbers)]},
+            lambda: {"a.map": [rnd.choice(["input.ai", "input.ad"]), {"fcn": "u.twice"}]},
+            lambda: {"a.sum": [rnd.choice(["input.ai", "input.ad"])]},
+            lambda: {"a.len": [rnd.choice(["input.ai", "input.ad", {"map.keys": ["input.ms"]}])]},
+            lambda: {"a.sort": [rnd.choice(["input.ai", "input.ad"])]},
+            lambda: {"map.containsKey": ["input.ms", "input.s"]},
+            lambda: {"s.concat": ["input.s", {"s.int": [{"a.len": ["input.ai"]}]}]},
+            lambda: {"ifnotnull": {"x": "input.u"}, "then": {"m.sqrt": ["x"]}, "else": rnd.choice(numbers)},
+            lambda: {"==": ["input.rec", {"new": {"x": rnd.choice(numbers[2:]), "y": {"double": 0}}, "type": "Point"}]},
+            lambda: {"u.twice": [rnd.choice(numbers)]},
+            lambda: {"a.argmax": [rnd.choice(["input.ai", "input.ad"])]},
+            lambda: {"m.round": [rnd.choice(numbers)]},
+            ]
+        action = [{"let": {"v{0}".format(i): rnd.choice(templates)()}} for i in range(numExpressions)]
+        action.append({"a.len": ["input.ai"]})
+        return {"name": "SignatureHeavy", "input": self.inputType, "output": "int", "action": action,
+                "fcns": {"twice": {"params": [{"x": "double"}], "ret": "double", "do": {"*": ["x", 2]}}}}
+
+    def compile(self, document, signatureCache):
+        engineConfig = jsonToAst(json.dumps(document))
+        functionTable = poie.pfaast.FunctionTable(poie.pfaast.LibraryFunctions(), signatureCache)
+        engineOptions = poie.options.EngineOptions(engineConfig.options, None)
+        pfaVersion = poie.signature.PFAVersion.fromString(poie.version.defaultPFAVersion)
+        startTime = time.time()
+        context, code = engineConfig.walk(poie.genpy.GeneratePython.makeTask("pure"), poie.pfaast.SymbolTable.blank(), functionTable, engineOptions, pfaVersion)
+        return context, code, time.time() - startTime
+
+    def testSameResults(self):
+        document = self.makeDocument(3000, 12345)
+
+        cache = poie.signature.SignatureCache()
+        cachedContext, cachedCode, cachedTime = self.compile(document, cache)
+        uncached = UncachedSignatures()
+        uncachedContext, uncachedCode, uncachedTime = self.compile(document, uncached)
+        print("type-check and generate: {0} seconds with the cache ({1} hits, {2} misses), {3} seconds without ({4} matches)".format(cachedTime, cache.hits, cache.misses, uncachedTime, uncached.misses))
+
+        self.assertEqual(cachedCode, uncachedCode)
+        # types of the let-bound variables
+        self.assertEqual(cachedContext.action[1], uncachedContext.action[1])
+        self.assertEqual(cache.hits + cache.misses, uncached.misses)
+        self.assertTrue(cache.hits > cache.misses)
+
+    def testSameErrors(self):
+        for expression in {"+": ["input.s", 1]}, {"a.map": ["input.ai", {"fcn": "u.twice"}, 3]}, {"m.sqrt": ["input.u"]}, {"map.containsKey": ["input.ai", "input.s"]}:
+            document = self.makeDocument(50, 54321)
+            document["action"].insert(25, expression)
+
+            messages = []
+            for signatureCache in poie.signature.SignatureCache(), UncachedSignatures():
+                with self.assertRaises(PFASemanticException) as context:
+                    self.compile(document, signatureCache)
+                messages.append(str(context.exception))
+            self.assertEqual(messages[0], messages[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import io
+import json
+import threading
+import time
+import unittest
+
+from poie.genpy import PFAEngine
+from poie.genpy import SharedState
+
+class TestSnapshots(unittest.TestCase):
+    def document(self, shared=False):
+        return {"input": "string", "output": "long",
+                "cells": {"total": {"type": "long", "init": 0, "shared": shared},
+                          "last": {"type": ["null", "string"], "init": None, "shared": shared}},
+                "pools": {"counts": {"type": "long", "init": {"start": 100}, "shared": shared}},
+                "action": [
+                    {"cell": "total", "to": {"params": [{"x": "long"}], "ret": "long", "do": {"+": ["x", 1]}}},
+                    {"cell": "last", "to": {"upcast": "input", "as": ["null", "string"]}},
+                    {"if": {"s.startswith": ["input", {"string": "del-"}]},
+                     "then": [{"pool": "counts", "del": {"s.substr": ["input", 4, 100]}}, -1],
+                     "else": [{"pool": "counts", "path": ["input"], "to": {"params": [{"x": "long"}], "ret": "long", "do": {"+": ["x", 1]}}, "init": 0}]}]}
+
+    def state(self, engine):
+        engine.pools["counts"].decodeAll()
+        return dict((k, v.value) for k, v in engine.cells.items()), dict(engine.pools["counts"].value)
+
+    def write(self, engine, delta):
+        stream = io.StringIO()
+        count = engine.writeSnapshot(stream, delta)
+        return stream.getvalue(), count
+
+    def testFullRoundTrip(self):
+        engine, = PFAEngine.fromJson(self.document())
+        for x in "a", "b", "a", "c", "del-start":
+            engine.action(x)
+        text, count = self.write(engine, False)
+        self.assertEqual(count, 2 + 3)
+
+        restored, = PFAEngine.fromJson(self.document())
+        self.assertEqual(restored.restoreSnapshot(io.StringIO(text)), count)
+        self.assertEqual(self.state(restored), self.state(engine))
+        self.assertEqual(restored.action("a"), engine.action("a"))
+
+    def testDeltaRoundTrip(self):
+        engine, = PFAEngine.fromJson(self.document())
+        engine.action("a")
+        full, count = self.write(engine, False)
+        self.assertEqual(self.write(engine, True)[1], 0)
+
+        for x in "b", "b", "del-a", "del-start":
+            engine.action(x)
+        delta1, count = self.write(engine, True)
+        self.assertEqual(count, 2 + 3)
+        self.assertEqual(sum(1 for line in delta1.splitlines() if json.loads(line).get("delete", False)), 2)
+
+        engine.action("c")
+        delta2, count = self.write(engine, True)
+        self.assertEqual(count, 2 + 1)
+
+        restored, = PFAEngine.fromJson(self.document())
+        restored.restoreSnapshot(io.StringIO(full + delta1 + delta2))
+        self.assertEqual(self.state(restored), self.state(engine))
+        # restoring is a checkpoint for the restored instance
+        self.assertEqual(self.write(restored, True)[1], 0)
+
+    def testSharedPoolDeltas(self):
+        sharedState = SharedState()
+        first, second = PFAEngine.fromJson(self.document(shared=True), sharedState=sharedState, multiplicity=2)
+        fullFirst = self.write(first, False)[0]
+        fullSecond = self.write(second, False)[0]
+
+        first.action("a")
+        second.action("b")
+        deltaFirst = self.write(first, True)[0]
+        # first's checkpoint must not hide the shared changes from second's delta
+        deltaSecond = self.write(second, True)[0]
+        self.assertEqual(deltaFirst.splitlines()[1:], deltaSecond.splitlines()[1:])
+
+        for full, delta in (fullFirst, deltaFirst), (fullSecond, deltaSecond):
+            restored, = PFAEngine.fromJson(self.document(shared=True), sharedState=SharedState())
+            restored.restoreSnapshot(io.StringIO(full + delta))
+            self.assertEqual(self.state(restored), self.state(first))
+
+    def testChangeLogsArePruned(self):
+        sharedState = SharedState()
+        first, second = PFAEngine.fromJson(self.document(shared=True), sharedState=sharedState, multiplicity=2)
+        pool = first.pools["counts"]
+        logged = lambda: sum(len(changes) for changes in pool.changes)
+
+        for i in range(10000):
+            first.action("key{0}".format(i))
+        for i in range(10000):
+            first.action("del-key{0}".format(i))
+        self.assertEqual(logged(), 10000)
+
+        # second has not checkpointed past the changes yet, so the tombstones must stay
+        self.assertEqual(self.write(first, True)[1], 2 + 10000)
+        self.assertEqual(logged(), 10000)
+
+        delta = self.write(second, True)[0]
+        self.assertEqual(sum(1 for line in delta.splitlines() if json.loads(line).get("delete", False)), 10000)
+        self.assertEqual(logged(), 0)
+
+        first.action("a")
+        self.assertEqual(logged(), 1)
+        # an instance that no longer exists does not hold back the logs
+        del second
+        gc.collect()
+        self.write(first, True)
+        self.assertEqual(logged(), 0)
+
+    def testConcurrentUpdatesAreNotLost(self):
+        sharedState = SharedState()
+        engines = PFAEngine.fromJson(self.document(shared=True), sharedState=sharedState, multiplicity=5)
+        checkpointer = engines[0]
+        snapshots = [self.write(checkpointer, False)[0]]
+
+        def work(engine):
+            for i in range(5000):
+                engine.action("key{0}".format((i * 7919 + engine.instance) % 300))
+
+        threads = [threading.Thread(target=work, args=(engine,)) for engine in engines[1:]]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            snapshots.append(self.write(checkpointer, True)[0])
+            time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        snapshots.append(self.write(checkpointer, True)[0])
+
+        restored, = PFAEngine.fromJson(self.document(shared=True), sharedState=SharedState())
+        restored.restoreSnapshot(io.StringIO("".join(snapshots)))
+        self.assertEqual(self.state(restored), self.state(checkpointer))
+        self.assertEqual(restored.cells["total"].value, 4 * 5000)
+        print("{0} deltas written while 4 threads updated a shared pool".format(len(snapshots) - 1))
+
+if __name__ == "__main__":
+    unittest.main()
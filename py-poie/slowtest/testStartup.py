@@ -0,0 +1,58 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+class TestStartup(unittest.TestCase):
+    # a fresh interpreter for each measurement, like a short-lived CLI or serverless invocation
+    script = """
+import json
+import sys
+import time
+startTime = time.time()
+from poie.genpy import PFAEngine
+importTime = time.time() - startTime
+afterImport = sorted(x for x in sys.modules if x.startswith("poie.lib.") or x.startswith("poie.pmml"))
+engine, = PFAEngine.fromJson('''{"input": "double", "output": "double", "action": {"m.sqrt": {"+": ["input", 1]}}}''')
+assert engine.action(3.0) == 2.0
+totalTime = time.time() - startTime
+afterRun = sorted(x for x in sys.modules if x.startswith("poie.lib.") or x.startswith("poie.pmml"))
+print(json.dumps([importTime, totalTime, afterImport, afterRun]))
+"""
+
+    def measure(self, repetitions):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+        results = []
+        for i in range(repetitions):
+            results.append(json.loads(subprocess.check_output([sys.executable, "-c", self.script], env=env)))
+        return sorted(results)[repetitions // 2]
+
+    def testColdStart(self):
+        importTime, totalTime, afterImport, afterRun = self.measure(7)
+        print("import poie.genpy: {0} seconds; import, load, and run a small engine: {1} seconds".format(importTime, totalTime))
+
+        # no library modules or PMML reader until an engine needs them, and then only the ones it uses
+        self.assertEqual(afterImport, [])
+        self.assertEqual(afterRun, ["poie.lib.core", "poie.lib.pfamath"])
+
+if __name__ == "__main__":
+    unittest.main()
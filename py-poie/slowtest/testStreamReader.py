@@ -0,0 +1,99 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import os
+import time
+import unittest
+
+from poie.genpy import PFAEngine
+from poie.pfaast import DecodedInit
+from poie.reader import jsonToAst
+from poie.reader import jsonStreamToAst
+
+class TestStreamReader(unittest.TestCase):
+    hipparcos = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "py2-poie", "test", "hipparcos_numerical_10.pfa")
+
+    def compare(self, document, inputs=()):
+        text = json.dumps(document) if isinstance(document, dict) else document
+        expected = jsonToAst(text)
+        result = jsonStreamToAst(io.BytesIO(text.encode("utf-8")))
+        resultJson = json.loads(result.toJson(lineNumbers=False))
+        expectedJson = json.loads(expected.toJson(lineNumbers=False))
+        # engine names are generated when absent
+        del resultJson["name"], expectedJson["name"]
+        self.assertEqual(resultJson, expectedJson)
+
+        expectedEngine, = PFAEngine.fromAst(expected)
+        resultEngine, = PFAEngine.fromAst(result)
+        for name in expected.cells:
+            self.assertEqual(resultEngine.cells[name].value, expectedEngine.cells[name].value)
+        for name in expected.pools:
+            resultEngine.pools[name].decodeAll()
+            expectedEngine.pools[name].decodeAll()
+            self.assertEqual(resultEngine.pools[name].value, expectedEngine.pools[name].value)
+        for x in inputs:
+            self.assertEqual(resultEngine.action(x), expectedEngine.action(x))
+        return result
+
+    def testExistingDocument(self):
+        if not os.path.exists(self.hipparcos):
+            self.skipTest("{0} not found".format(self.hipparcos))
+        document = open(self.hipparcos).read()
+        fields = json.loads(document)["input"]["fields"]
+        self.compare(document, [dict((f["name"], 0.5 * i) for f in fields) for i in range(10)])
+
+    def testForwardReferences(self):
+        item = {"type": "record", "name": "Item", "fields": [{"name": "x", "type": "int"}, {"name": "next", "type": ["null", "Item"]}]}
+        document = {"cells": {"before": {"type": "Item", "init": {"x": 1, "next": {"Item": {"x": 2, "next": None}}}},
+                              "defines": {"type": item, "init": {"x": 3, "next": None}},
+                              "after": {"type": {"type": "map", "values": "Item"}, "init": {"a": {"x": 4, "next": None}}}},
+                    "pools": {"laterType": {"type": "Later", "init": {"k": {"y": "one"}}}},
+                    "input": "int",
+                    "output": "int",
+                    "action": [{"+": ["input", {"cell": "before", "path": [{"string": "x"}]}]}],
+                    "fcns": {"f": {"params": [{"x": {"type": "record", "name": "Later", "fields": [{"name": "y", "type": "string"}]}}], "ret": "string", "do": "x.y"}}}
+        result = self.compare(document, [1, 2, 3])
+        self.assertTrue(isinstance(result.cells["defines"].init, DecodedInit))
+        self.assertTrue(isinstance(result.cells["after"].init, DecodedInit))
+
+    def testLargeInits(self):
+        itemType = {"type": "record", "name": "Item", "fields": [{"name": "x", "type": "double"}, {"name": "v", "type": {"type": "array", "items": "double"}}, {"name": "s", "type": "string"}]}
+        items = dict(("k{0}".format(i), {"x": i * 0.5, "v": [i * 0.25, -i * 1.5, 1e-3 * i], "s": "item {0}".format(i)}) for i in range(50000))
+        document = {"input": "string", "output": "double",
+                    "cells": {"big": {"type": {"type": "array", "items": "Item"}, "init": list(items.values())[:20000]}},
+                    "pools": {"items": {"type": itemType, "init": items}},
+                    "action": [{"pool": "items", "path": ["input", {"string": "x"}]}]}
+        result = self.compare(document, ["k0", "k12345", "k49999"])
+        self.assertTrue(isinstance(result.pools["items"].init, DecodedInit))
+
+    def testManyNamedTypes(self):
+        # each pool defines its own record type, so the types seen so far grow with every pool
+        document = {"input": "string", "output": "string", "action": ["input"], "pools": {}}
+        for i in range(1500):
+            document["pools"]["p{0}".format(i)] = {"type": {"type": "record", "name": "R{0}".format(i), "fields": [{"name": "x", "type": "int"}, {"name": "prev", "type": ["null", "R0" if i > 0 else "int"]}]},
+                                                   "init": {"k": {"x": i, "prev": None}}}
+        text = json.dumps(document)
+        startTime = time.time()
+        result = jsonStreamToAst(io.BytesIO(text.encode("utf-8")))
+        print("streamed 1500 pools with their own named types: {0} seconds".format(time.time() - startTime))
+        self.assertTrue(all(isinstance(x.init, DecodedInit) for x in result.pools.values()))
+        self.compare(text)
+
+if __name__ == "__main__":
+    unittest.main()
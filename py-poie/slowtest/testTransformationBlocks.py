@@ -0,0 +1,46 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import time
+import unittest
+
+import numpy
+
+from poie.producer.transformation import Transformation
+
+class TestTransformationBlocks(unittest.TestCase):
+    def testBlocks(self):
+        numpy.random.seed(12345)
+        numRows = 20000000
+        dataset = {"x": numpy.random.uniform(0, 1, numRows), "y": numpy.random.uniform(0, 1, numRows), "z": numpy.random.uniform(0, 1, numRows)}
+        transformation = Transformation("m.sqrt(x**2 + y**2) / (1 + m.abs(z)) + m.exp(-x*y)", "x > y && z < 0.5", "m.atan2(y, x) - m.ln(z + 1)")
+
+        startTime = time.time()
+        expected = transformation.transform(dataset)
+        print("whole columns: {0:.2f} seconds".format(time.time() - startTime))
+
+        for chunkSize, threads in (65536, None), (65536, 4):
+            startTime = time.time()
+            result = transformation.transform(dataset, chunkSize=chunkSize, threads=threads)
+            print("blocks of {0} with {1} threads: {2:.2f} seconds".format(chunkSize, threads, time.time() - startTime))
+            for name in expected:
+                self.assertEqual(result[name].dtype, expected[name].dtype)
+                self.assertTrue(numpy.array_equal(result[name], expected[name]))
+
+if __name__ == "__main__":
+    unittest.main()
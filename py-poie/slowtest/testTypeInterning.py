@@ -0,0 +1,98 @@
+# Copyright (C) 2021 Data Mining Group
+#
+#
+#
+# This file is part of PFA Open Inference Engine (POIE)
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+import unittest
+
+from poie.genpy import PFAEngine
+from poie.reader import jsonToAst
+from poie.datatype import *
+from poie.errors import *
+
+class TestTypeInterning(unittest.TestCase):
+    def makeDocument(self, numFields, numExpressions):
+        fields = [{"name": "f{0}".format(i), "type": ["double", {"type": "array", "items": "double"}, "string"][i % 3]} for i in range(numFields)]
+        inner = {"type": "record", "name": "Inner", "fields": fields}
+        outer = {"type": "record", "name": "Outer", "fields": [{"name": "a", "type": inner}, {"name": "b", "type": {"type": "array", "items": "Inner"}}]}
+        action = []
+        for i in range(numExpressions):
+            field = "f{0}".format(3 * (i % (numFields // 3)))
+            action.append({"let": {"v{0}".format(i): {"+": [{"attr": "input.a", "path": [{"string": field}]},
+                                                            {"attr": "input.b", "path": [i % 10, {"string": field}]}]}}})
+        action.append({"attr": "input", "path": [{"string": "a"}]})
+        return {"input": outer, "output": "Inner", "action": action}
+
+    def testEquality(self):
+        x = jsonNodeToAvroType({"type": "record", "name": "R", "fields": [{"name": "x", "type": "int"}]})
+        y = jsonNodeToAvroType({"type": "record", "name": "R", "fields": [{"name": "x", "type": "int"}]})
+        z = jsonNodeToAvroType({"type": "record", "name": "R", "fields": [{"name": "x", "type": "long"}]})
+        self.assertTrue(x is y)
+        self.assertEqual(x, y)
+        self.assertNotEqual(x, z)
+        self.assertEqual(hash(x), hash(y))
+        self.assertEqual(AvroArray(AvroDouble()), jsonNodeToAvroType({"type": "array", "items": "double"}))
+
+    def testFrozenTypes(self):
+        record = jsonNodeToAvroType({"type": "record", "name": "Node", "fields": [
+            {"name": "label", "type": {"type": "enum", "name": "Label", "symbols": ["A", "B"]}},
+            {"name": "children", "type": {"type": "array", "items": "Node"}},
+            {"name": "weight", "type": ["null", "double"]}]})
+        canonicalId = record.canonicalId
+
+        other = jsonNodeToAvroType({"type": "record", "name": "Other", "fields": []})
+        self.assertRaises(TypeError, lambda: setattr(record, "_schema", other.schema))
+        self.assertRaises(TypeError, lambda: setattr(AvroDouble(), "_schema", AvroFloat().schema))
+        self.assertEqual(record.canonicalId, canonicalId)
+        self.assertEqual(record.field("label").avroType.symbols, ["A", "B"])
+
+        # the avro.schema objects are left alone
+        self.assertEqual(type(record.schema.props), dict)
+        self.assertEqual(type(record.schema.fields), list)
+
+        # types built by constructors can be finished before anything looks at their canonicalId
+        array = AvroArray(AvroInt())
+        array.schema.set_prop("items", AvroLong().schema)
+        self.assertEqual(array, AvroArray(AvroLong()))
+        self.assertRaises(TypeError, lambda: setattr(array, "_schema", AvroArray(AvroInt()).schema))
+
+    def testRecordHeavyDocument(self):
+        document = json.dumps(self.makeDocument(300, 3000))
+
+        startTime = time.time()
+        ast = jsonToAst(document)
+        print("read: {0} seconds".format(time.time() - startTime))
+
+        startTime = time.time()
+        engine, = PFAEngine.fromAst(ast)
+        print("type-check and compile: {0} seconds".format(time.time() - startTime))
+
+        inputType = engine.config.input
+        startTime = time.time()
+        for i in range(100000):
+            inputType.field("a").avroType == inputType.field("b").avroType.items
+        print("100000 field-type comparisons: {0} seconds".format(time.time() - startTime))
+
+        startTime = time.time()
+        types = set()
+        for i in range(100000):
+            types.add(inputType.field("a").avroType)
+        print("100000 field-type hashes: {0} seconds".format(time.time() - startTime))
+        self.assertEqual(len(types), 1)
+
+if __name__ == "__main__":
+    unittest.main()